@@ -0,0 +1,115 @@
+"""
+Deterministic Answer Mapper
+Maps obvious conversational replies to 'Yes' / 'No' / 'Unsure' without an LLM call.
+Anything ambiguous returns None and is left to the model.
+"""
+
+import re
+import threading
+from typing import Dict, List, Optional
+
+ANSWERS = ("Yes", "No", "Unsure")
+
+YES_PHRASES = {
+    "yes", "y", "yeah", "yea", "yep", "yup", "ya", "sure", "correct", "right", "true", "affirmative",
+    "absolutely", "definitely", "certainly", "indeed", "of course", "ok", "okay",
+    "yes we do", "yes it does", "yes we are", "yes it is", "we do", "it does", "it is", "we are",
+}
+NO_PHRASES = {
+    "no", "n", "nope", "nah", "never", "none", "negative", "false", "not at all", "not really",
+    "no we don't", "no it doesn't", "no we aren't", "no it isn't", "no it's not",
+    "we don't", "it doesn't", "we do not", "it does not", "it isn't", "it's not", "we aren't",
+}
+UNSURE_PHRASES = {
+    "unsure", "not sure", "i'm not sure", "im not sure", "i am not sure", "not certain", "uncertain",
+    "don't know", "dont know", "i don't know", "i dont know", "idk", "no idea", "no clue",
+    "maybe", "perhaps", "possibly", "unclear", "it depends", "depends", "hard to say",
+}
+PHRASES = {"Yes": YES_PHRASES, "No": NO_PHRASES, "Unsure": UNSURE_PHRASES}
+
+# A leading yes/no is only trusted if nothing after it hedges or contradicts it
+LEADING_YES = {"yes", "yeah", "yep", "yup", "sure", "correct", "absolutely", "definitely"}
+LEADING_NO = {"no", "nope", "nah", "never"}
+HEDGE_WORDS = {
+    "no", "not", "yes", "but", "maybe", "unsure", "sure", "don't", "dont", "doesn't", "isn't", "except",
+    "although", "though", "however", "partly", "partially", "sometimes", "depends", "unless", "or",
+}
+
+_PUNCTUATION = re.compile(r"[^\w\s']+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, unify apostrophes, drop punctuation and collapse whitespace."""
+    text = text.lower().replace("’", "'")
+    return _SPACES.sub(" ", _PUNCTUATION.sub(" ", text)).strip()
+
+
+def _phrase_answer(normalized: str) -> Optional[str]:
+    for answer in ANSWERS:
+        if normalized in PHRASES[answer]:
+            return answer
+    return None
+
+
+def map_answer_locally(reply: str, options: List[str]) -> Optional[str]:
+    """
+    'Yes', 'No' or 'Unsure' for an unambiguous reply to a question with the given options,
+    or None if the reply needs the model.
+    """
+    normalized = normalize(reply)
+    if not normalized:
+        return None
+
+    answer = _phrase_answer(normalized)
+    if answer is not None:
+        return answer
+
+    words = normalized.split(" ")
+
+    # The reply repeats one of the question's option labels, e.g. "Yes, but low impact":
+    # the user picked that option, so its leading word decides even if it hedges
+    if any(normalize(option) == normalized for option in options):
+        if words[0] in LEADING_YES:
+            return "Yes"
+        if words[0] in LEADING_NO:
+            return "No"
+        if normalized.startswith(("not sure", "unsure", "don't know")):
+            return "Unsure"
+
+    rest = set(words[1:])
+    if words[0] in LEADING_YES and not rest & HEDGE_WORDS:
+        return "Yes"
+    # "No" only leads a whole negative answer ("no, not at all", "nope we don't"); idioms
+    # such as "no problem" or "no doubt" start with it but mean the opposite
+    if words[0] in LEADING_NO and " ".join(words[1:]) in NO_PHRASES:
+        return "No"
+    return None
+
+
+class MapperStats:
+    """How many replies were resolved locally versus sent to the model."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.local = 0
+        self.model = 0
+
+    def record(self, resolved_locally: bool) -> None:
+        with self._lock:
+            if resolved_locally:
+                self.local += 1
+            else:
+                self.model += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.local + self.model
+            return {
+                "resolved_locally": self.local,
+                "sent_to_model": self.model,
+                "local_fraction": self.local / total if total else 0.0,
+            }
+
+
+stats = MapperStats()
@@ -0,0 +1,156 @@
+"""
+Memoized classification results.
+Single-choice answers have a small answer space, so most calls repeat earlier work.
+Roadmaps need no cache here: roadmap_generator shares a precomputed plan per signature.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from questions import QUESTIONS, QUESTION_SET_VERSION
+from rules_engine import ClassificationState, CompiledRules, build_classification, classify_assessment, classify_state, get_compiled_rules, reclassify
+
+CACHE_SIZE = int(os.getenv("CLASSIFICATION_CACHE_SIZE", "10000"))
+
+# Only single-choice answers feed the key; free text (q11/q12) never changes the outcome
+KEY_QUESTION_IDS = tuple(q["id"] for q in QUESTIONS if q["type"] == "single")
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe bounded LRU map with hit, miss and eviction counters."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Any, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Any) -> Any:
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return _MISSING
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Any, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+classification_cache = LRUCache(CACHE_SIZE)
+state_cache = LRUCache(CACHE_SIZE)
+
+
+def answers_key(answers: Dict[str, Any], compiled: Optional[CompiledRules] = None) -> Optional[Tuple]:
+    """
+    Canonical cache key for a set of answers, or None if it cannot be hashed.
+
+    The rule set is identified by its digest, so a hot-swapped rule pack never
+    sees results of the previous one.
+    Besides the single-choice values, the key keeps the order of all "not_sure"
+    answers: it drives not_sure_count and the order of missing_info.
+    """
+    key = (
+        (compiled or get_compiled_rules()).digest,
+        QUESTION_SET_VERSION,
+        tuple(answers.get(qid, _MISSING) for qid in KEY_QUESTION_IDS),
+        tuple(qid for qid, answer in answers.items() if answer == "not_sure"),
+    )
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def cached_classify(answers: Dict[str, Any], compiled: Optional[CompiledRules] = None) -> Dict[str, Any]:
+    """
+    classify_assessment with memoization, under the live rules or the given rule set.
+    The returned dict is shared between callers and must not be mutated.
+    """
+    compiled = compiled or get_compiled_rules()
+    key = answers_key(answers, compiled)
+    if key is None:
+        return classify_assessment(answers, compiled)
+
+    result = classification_cache.get(key)
+    if result is _MISSING:
+        result = classify_assessment(answers, compiled)
+        classification_cache.put(key, result)
+    return result
+
+
+def cached_state(answers: Dict[str, Any]) -> ClassificationState:
+    """classify_state with memoization; states are shared and must not be mutated."""
+    key = answers_key(answers)
+    if key is None:
+        return classify_state(answers)
+
+    state = state_cache.get(key)
+    if state is _MISSING or state.compiled is not get_compiled_rules():
+        state = classify_state(answers)
+        state_cache.put(key, state)
+    return state
+
+
+def cached_reclassify(answers: Dict[str, Any], question_id: str, answer: Any) -> Tuple[ClassificationState, Dict[str, Any]]:
+    """
+    reclassify starting from the memoized state for ``answers``, applied to the caller's own dict.
+    The new state is memoized too, so consecutive edits each cost one incremental step.
+    """
+    state = cached_state(answers)
+    if state.answers != answers or list(state.answers) != list(answers):
+        # Cached for another request with the same key: same condition bits, but its key order
+        # (and free text) would leak into missing_info and the returned answers
+        state = ClassificationState(state.compiled, dict(answers), state.met, state.uncertain, state.rule_states,
+                                    build_classification(state.compiled, dict(answers),
+                                                         [entry.copy() for entry in state.result["rule_trace"]]))
+    state, diff = reclassify(state, question_id, answer)
+    key = answers_key(state.answers)
+    if key is not None:
+        state_cache.put(key, state)
+    return state, diff
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    """Counters for each cache."""
+    return {
+        "classification": classification_cache.stats(),
+        "state": state_cache.stats(),
+    }
+
+
+def clear_caches() -> None:
+    """Drop all memoized results, e.g. after rules or templates changed."""
+    classification_cache.clear()
+    state_cache.clear()
@@ -0,0 +1,336 @@
+"""
+Benchmark Suite
+Micro-benchmarks of the engine over a generated answer corpus, macro-benchmarks that drive
+the app in-process (in-memory MongoDB stand-in, local OpenAI stub), and the response
+serialization comparison from bench_serialization. Results can be written as JSON and
+compared with an earlier run to catch regressions between commits.
+
+Usage:
+    python bench.py [micro] [macro] [serialization] [--seconds N] [--repeat N] [--corpus N]
+                    [--seed N] [--concurrency N] [--llm-latency-ms N]
+                    [--out results.json] [--compare baseline.json] [--threshold PCT]
+
+Without group names, runs micro and macro. With --compare, exits 1 if any benchmark is more
+than --threshold percent (default 10) worse than in the baseline.
+"""
+
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from bench_support import free_port, percentile
+from questions import QUESTIONS
+
+GROUPS = ("micro", "macro", "serialization")
+
+
+# --- Corpus ---
+def answer_corpus(size: int, seed: int) -> List[Dict[str, Any]]:
+    """Answer sets with some questions left unanswered, as partially completed assessments are."""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        answers: Dict[str, Any] = {}
+        for q in QUESTIONS:
+            if q["type"] == "single" and rng.random() < 0.85:
+                answers[q["id"]] = rng.choice(q["options"])["value"]
+            elif q["type"] == "text" and rng.random() < 0.3:
+                answers[q["id"]] = "Screens incoming applications and ranks candidates"
+        corpus.append(answers)
+    return corpus
+
+
+# --- Micro-benchmarks ---
+def measure(call: Callable[[Any], Any], items: Sequence[Any], seconds: float, repeat: int,
+            ops_per_item: int = 1) -> Dict[str, Any]:
+    """Calls ``call`` on each item in turn, in ``repeat`` runs of about ``seconds`` each."""
+    rates = []
+    for _ in range(repeat):
+        count, started = 0, time.perf_counter()
+        deadline = started + seconds
+        while True:
+            for item in items:
+                call(item)
+            count += len(items) * ops_per_item
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+        rates.append(count / (now - started))
+    rate = statistics.median(rates)
+    return {
+        "value": round(rate, 1),
+        "unit": "ops/s",
+        "better": "higher",
+        "us_per_op": round(1e6 / rate, 3),
+        "runs": [round(r, 1) for r in rates],
+    }
+
+
+def micro_benchmarks(corpus: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """name -> (call, items, ops per item); built up front so setup is not timed."""
+    from roadmap_generator import DEPENDENCIES, TASK_TEMPLATES, generate_roadmap, get_applicable_tasks, prioritize_tasks
+    from rules_engine import classify_assessment, classify_many, evaluate_rule, get_compiled_rules
+
+    rules = get_compiled_rules().rules
+    classified = [(classify_assessment(answers), answers) for answers in corpus]
+
+    unsorted_plans = []
+    for classification, answers in classified:
+        bucket = classification["bucket"]
+        tasks = [dict(TASK_TEMPLATES[task_id], dependencies=DEPENDENCIES.get(task_id, []))
+                 for task_id in get_applicable_tasks(bucket, answers)]
+        unsorted_plans.append((tasks, bucket))
+
+    batch = corpus[:1000]
+    return {
+        "evaluate_rule": (lambda pair: evaluate_rule(*pair), [(rule, answers) for answers in corpus for rule in rules], 1),
+        "classify_assessment": (classify_assessment, corpus, 1),
+        # Batches of 100; one op is one answer set, so the rate compares directly with classify_assessment
+        "classify_many": (classify_many, [batch[i:i + 100] for i in range(0, len(batch) - 99, 100)], 100),
+        "generate_roadmap": (lambda pair: generate_roadmap(*pair), classified, 1),
+        "prioritize_tasks": (lambda pair: prioritize_tasks(*pair), unsorted_plans, 1),
+    }
+
+
+def run_micro(corpus: List[Dict[str, Any]], seconds: float, repeat: int) -> List[Dict[str, Any]]:
+    results = []
+    for name, (call, items, ops_per_item) in micro_benchmarks(corpus).items():
+        results.append({"group": "micro", "name": name, **measure(call, items, seconds, repeat, ops_per_item)})
+    return results
+
+
+# --- Macro-benchmarks ---
+def use_stub_environment(llm_port: int, llm_latency_ms: float) -> None:
+    """Point the server at the in-memory database and the local OpenAI stub (before importing it)."""
+    os.environ.update({
+        "MONGODB_URI": "memory://",
+        "JOB_STORE": "memory",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{llm_port}/v1",
+        "OPENAI_API_KEY": "stub",
+        "STUB_OPENAI_LATENCY_MS": str(llm_latency_ms),
+    })
+
+
+def start_openai_stub(port: int):
+    """Serve openai_stub on a background thread; returns the uvicorn server to stop it."""
+    import uvicorn
+    import openai_stub
+
+    server = uvicorn.Server(uvicorn.Config(openai_stub.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="openai-stub", daemon=True).start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("OpenAI stub did not start")
+        time.sleep(0.01)
+    return server
+
+
+def macro_scenarios(corpus: List[Dict[str, Any]]) -> Dict[str, Callable[[int], Dict[str, Any]]]:
+    """name -> request for the i-th call (method, path and JSON body)."""
+    conversation = {
+        "messages": [{"role": "assistant", "content": "Does the system make decisions about people?"},
+                     {"role": "user", "content": "Yes, it ranks job applicants"}],
+        "answered_questions": [],
+        "current_question_index": 1,
+    }
+    return {
+        "GET /api/questions": lambda i: {"method": "GET", "url": "/api/questions"},
+        "GET /api/questions/wizard": lambda i: {"method": "GET", "url": "/api/questions/wizard"},
+        "POST /api/classify": lambda i: {"method": "POST", "url": "/api/classify",
+                                         "json": {"answers_json": corpus[i % len(corpus)]}},
+        "POST /api/classify/what-if": lambda i: {"method": "POST", "url": "/api/classify/what-if",
+                                                 "json": {"answers_json": corpus[i % len(corpus)],
+                                                          "question_id": "q6_biometric", "answer": "yes"}},
+        "POST /api/classify/sensitivity": lambda i: {"method": "POST", "url": "/api/classify/sensitivity",
+                                                     "json": {"answers_json": corpus[i % len(corpus)]}},
+        "POST /api/classify/batch (100)": lambda i: {"method": "POST", "url": "/api/classify/batch",
+                                                     "json": {"answers_list": [corpus[(i * 100 + j) % len(corpus)] for j in range(100)]}},
+        "POST /api/conversation": lambda i: {"method": "POST", "url": "/api/conversation",
+                                             "json": dict(conversation, current_question_index=1 + i % 10)},
+    }
+
+
+async def drive(client, request: Callable[[int], Dict[str, Any]], seconds: float, concurrency: int) -> Dict[str, Any]:
+    """``concurrency`` closed-loop clients issuing requests for ``seconds``."""
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(sys.maxsize))
+    deadline = time.perf_counter() + seconds
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = await client.request(**request(next(counter)))
+                await response.aread()
+                failed = response.status_code >= 400
+            except Exception:
+                failed = True
+            latencies.append(time.perf_counter() - started)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "value": round(len(latencies) / elapsed, 1),
+        "unit": "req/s",
+        "better": "higher",
+        "requests": len(latencies),
+        "errors": errors,
+        "concurrency": concurrency,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+async def run_macro_async(corpus: List[Dict[str, Any]], seconds: float, concurrency: int) -> List[Dict[str, Any]]:
+    import httpx
+    import server
+
+    results = []
+    async with server.app.router.lifespan_context(server.app):
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name, request in macro_scenarios(corpus).items():
+                await drive(client, request, min(seconds, 0.2), concurrency)  # warm caches and pools
+                results.append({"group": "macro", "name": name, **await drive(client, request, seconds, concurrency)})
+    return results
+
+
+def run_macro(corpus: List[Dict[str, Any]], seconds: float, concurrency: int, llm_port: int) -> List[Dict[str, Any]]:
+    stub = start_openai_stub(llm_port)
+    try:
+        return asyncio.run(run_macro_async(corpus, seconds, concurrency))
+    finally:
+        stub.should_exit = True
+
+
+# --- Serialization (bench_serialization) ---
+def run_serialization(seconds: float) -> List[Dict[str, Any]]:
+    import bench_serialization
+
+    return [
+        {"group": "serialization", "name": row["payload"], "value": row["fast_per_second"], "unit": "ops/s",
+         "better": "higher", "bytes": row["bytes"], "default_per_second": row["default_per_second"],
+         "speedup": row["speedup"]}
+        for row in bench_serialization.run(seconds)
+    ]
+
+
+# --- Results ---
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Change of each benchmark's headline value against the baseline run (positive is better)."""
+    before = {(row["group"], row["name"]): row for row in baseline["results"]}
+    changes = []
+    for row in results:
+        old = before.get((row["group"], row["name"]))
+        if old is None or not old["value"]:
+            continue
+        change = (row["value"] - old["value"]) / old["value"] * 100
+        if row["better"] == "lower":
+            change = -change
+        changes.append({"group": row["group"], "name": row["name"], "before": old["value"], "after": row["value"],
+                        "change_pct": round(change, 1), "regression": change < -threshold})
+    return changes
+
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    for group in GROUPS:
+        rows = [row for row in results if row["group"] == group]
+        if not rows:
+            continue
+        print(f"\n{group}")
+        for row in rows:
+            extra = ""
+            if "p95_ms" in row:
+                extra = f"  p50 {row['p50_ms']:.2f}ms  p95 {row['p95_ms']:.2f}ms  p99 {row['p99_ms']:.2f}ms  errors {row['errors']}"
+            elif "us_per_op" in row:
+                extra = f"  {row['us_per_op']:.3f}us/op"
+            elif "speedup" in row:
+                extra = f"  {row['speedup']:.2f}x over jsonable_encoder"
+            print(f"  {row['name']:<34}{row['value']:>14.1f} {row['unit']:<6}{extra}")
+
+
+def _option(argv: List[str], name: str, default: Any, cast: Callable[[str], Any] = str) -> Any:
+    return cast(argv[argv.index(name) + 1]) if name in argv else default
+
+
+def main(argv: List[str]) -> int:
+    if "--help" in argv or "-h" in argv:
+        print(__doc__)
+        return 0
+    groups = [arg for arg in argv if arg in GROUPS] or ["micro", "macro"]
+    seconds = _option(argv, "--seconds", 1.0, float)
+    repeat = _option(argv, "--repeat", 3, int)
+    corpus_size = _option(argv, "--corpus", 1000, int)
+    seed = _option(argv, "--seed", 0, int)
+    concurrency = _option(argv, "--concurrency", 16, int)
+    llm_latency_ms = _option(argv, "--llm-latency-ms", 50.0, float)
+    threshold = _option(argv, "--threshold", 10.0, float)
+
+    llm_port = free_port()
+    use_stub_environment(llm_port, llm_latency_ms)
+    corpus = answer_corpus(corpus_size, seed)
+
+    results: List[Dict[str, Any]] = []
+    if "micro" in groups:
+        results += run_micro(corpus, seconds, repeat)
+    if "macro" in groups:
+        results += run_macro(corpus, seconds, concurrency, llm_port)
+    if "serialization" in groups:
+        results += run_serialization(seconds)
+    print_results(results)
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"groups": groups, "seconds": seconds, "repeat": repeat, "corpus": corpus_size, "seed": seed,
+                   "concurrency": concurrency, "llm_latency_ms": llm_latency_ms},
+        "results": results,
+    }
+    out = _option(argv, "--out", None)
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {out}")
+
+    baseline_path = _option(argv, "--compare", None)
+    if baseline_path is None:
+        return 0
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    changes = compare(results, baseline, threshold)
+    print(f"\nagainst {baseline_path} (commit {baseline.get('commit')}), threshold {threshold}%")
+    for change in changes:
+        flag = "  REGRESSION" if change["regression"] else ""
+        print(f"  {change['group']:<14}{change['name']:<34}{change['before']:>12.1f} -> {change['after']:>12.1f}"
+              f"  {change['change_pct']:+6.1f}%{flag}")
+    return 1 if any(change["regression"] for change in changes) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
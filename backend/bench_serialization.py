@@ -0,0 +1,103 @@
+"""
+Response Serialization Benchmark
+Compares FastAPI's default encoding (jsonable_encoder + json.dumps, as JSONResponse does)
+with fast_json.dumps on the payloads the API serves most: classifications, classify batches,
+roadmaps and conversation turns.
+
+Usage:
+    python bench_serialization.py [--seconds N] [--json]
+
+Imports server for the conversation models, so it needs the server environment (OPENAI_API_KEY).
+"""
+
+import json
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+
+import fast_json
+from questions import QUESTIONS
+from roadmap_generator import generate_roadmap
+from rules_engine import classify_assessment, classify_many
+from server import AnsweredQuestion, ChatMessage, ConversationResponse, ConversationState
+
+
+def default_encode(content: Any) -> bytes:
+    """What JSONResponse does with an endpoint's return value."""
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False,
+                      indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def sample_answers(rng: random.Random) -> Dict[str, Any]:
+    return {
+        q["id"]: rng.choice(q["options"])["value"]
+        for q in QUESTIONS if q["type"] == "single" and rng.random() < 0.8
+    }
+
+
+def payloads() -> Dict[str, Any]:
+    rng = random.Random(0)
+    answers = {"q2_deployment": "external", "q3_domain": "hiring_hr", "q4_decision_impact": "significant_impact"}
+    classification = classify_assessment(answers)
+    batch = [sample_answers(rng) for _ in range(1000)]
+    state = ConversationState(
+        messages=[ChatMessage(role="assistant" if i % 2 else "user", content=f"Message {i} about the AI system") for i in range(24)],
+        answered_questions=[AnsweredQuestion(question_text=f"Question {i}?", answer="Yes") for i in range(12)],
+        current_question_index=12,
+    )
+    return {
+        "classification": classification,
+        "classify_batch_1000": {"rules_version": "bench", "count": len(batch), "results": classify_many(batch)},
+        "roadmap": generate_roadmap(classification, answers),
+        "conversation_turn": ConversationResponse(ai_message="Thanks!", updated_state=state, is_complete=False),
+    }
+
+
+def rate(encode: Callable[[Any], bytes], content: Any, seconds: float) -> float:
+    """Encodes per second over roughly ``seconds``."""
+    count, started = 0, time.perf_counter()
+    deadline = started + seconds
+    while True:
+        encode(content)
+        count += 1
+        now = time.perf_counter()
+        if now >= deadline:
+            return count / (now - started)
+
+
+def run(seconds: float) -> List[Dict[str, Any]]:
+    results = []
+    for name, content in payloads().items():
+        assert json.loads(default_encode(content)) == json.loads(fast_json.dumps(content)), name
+        default_rate = rate(default_encode, content, seconds)
+        fast_rate = rate(fast_json.dumps, content, seconds)
+        results.append({
+            "payload": name,
+            "bytes": len(fast_json.dumps(content)),
+            "default_per_second": round(default_rate, 1),
+            "fast_per_second": round(fast_rate, 1),
+            "speedup": round(fast_rate / default_rate, 2),
+        })
+    return results
+
+
+def main(argv: List[str]) -> int:
+    seconds = float(argv[argv.index("--seconds") + 1]) if "--seconds" in argv else 1.0
+    results = run(seconds)
+    if "--json" in argv:
+        print(json.dumps({"encoder": "orjson" if fast_json.orjson else "json", "results": results}, indent=2))
+        return 0
+
+    print(f"fast_json encoder: {'orjson' if fast_json.orjson else 'stdlib json'}")
+    print(f"{'payload':<22}{'bytes':>10}{'default/s':>14}{'fast/s':>14}{'speedup':>10}")
+    for row in results:
+        print(f"{row['payload']:<22}{row['bytes']:>10}{row['default_per_second']:>14.1f}"
+              f"{row['fast_per_second']:>14.1f}{row['speedup']:>9.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
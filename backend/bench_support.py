@@ -0,0 +1,23 @@
+"""
+Benchmark Helpers
+Shared by bench.py and the load mode of backend_test.py, so both report latency
+percentiles the same way.
+"""
+
+import math
+import socket
+from typing import Sequence
+
+
+def percentile(ordered: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence: the value at rank ceil(q/100 * n)."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered), max(1, math.ceil(q / 100 * len(ordered)))) - 1]
+
+
+def free_port() -> int:
+    """A TCP port on 127.0.0.1 that was free a moment ago."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
@@ -0,0 +1,170 @@
+"""
+Bulk Assessment Ingestion
+Classifies whole AI inventories uploaded as NDJSON or CSV. Rows are read, validated,
+classified and serialized one chunk at a time, so memory use depends on the chunk size,
+not on the size of the upload.
+"""
+
+import csv
+import io
+import itertools
+import json
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from fast_json import dumps
+from metrics import fired_rule_ids, record_rule_fires, stage
+from questions import QUESTIONS
+from roadmap_generator import get_plan, plan_signature
+from rules_engine import CompiledRules, classify_many
+
+# Columns that identify a row and are echoed back instead of being treated as answers
+ROW_ID_FIELDS = ("id", "name")
+
+SINGLE_CHOICE_OPTIONS = {
+    q["id"]: {o["value"] for o in q["options"]}
+    for q in QUESTIONS if q["type"] == "single"
+}
+TEXT_QUESTIONS = {q["id"] for q in QUESTIONS if q["type"] == "text"}
+
+# Serialized roadmaps by plan signature (bucket plus which context triggers fire)
+_roadmap_json: Dict[Tuple, bytes] = {}
+
+# (line number, row id fields, answers or None, errors)
+Row = Tuple[int, Dict[str, Any], Optional[Dict[str, Any]], List[str]]
+
+
+def validate_row(fields: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any], List[str]]:
+    """Split a raw row into (id fields, answers, errors); empty cells count as unanswered."""
+    ids, answers, errors = {}, {}, []
+    for key, value in fields.items():
+        if key in ROW_ID_FIELDS:
+            ids[key] = value
+            continue
+        if value is None or value == "":
+            continue
+        if key in SINGLE_CHOICE_OPTIONS:
+            if isinstance(value, str):
+                value = value.strip()
+            # Lists and objects are unhashable, so test the type before the set lookup
+            if not isinstance(value, str) or value not in SINGLE_CHOICE_OPTIONS[key]:
+                errors.append(f"'{value}' is not an option of {key}")
+                continue
+        elif key in TEXT_QUESTIONS:
+            if not isinstance(value, str):
+                errors.append(f"{key} must be text")
+                continue
+        else:
+            errors.append(f"Unknown question '{key}'")
+            continue
+        answers[key] = value
+    return ids, answers, errors
+
+
+def roadmap_json(bucket: str, answers: Dict[str, Any]) -> bytes:
+    """JSON of generate_roadmap's output, serialized once per plan signature."""
+    signature = plan_signature(bucket, answers)
+    body = _roadmap_json.get(signature)
+    if body is None:
+        tasks = get_plan(bucket, answers).task_dicts()
+        body = _roadmap_json.setdefault(signature, dumps(tasks))
+    return body
+
+
+def iter_ndjson_rows(stream: io.TextIOBase) -> Iterator[Row]:
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            fields = json.loads(line)
+        except ValueError as e:
+            yield line_number, {}, None, [f"Invalid JSON: {e}"]
+            continue
+        if not isinstance(fields, dict):
+            yield line_number, {}, None, ["Each line must be a JSON object"]
+            continue
+        ids, answers, errors = validate_row(fields)
+        yield line_number, ids, None if errors else answers, errors
+
+
+def iter_csv_rows(stream: io.TextIOBase) -> Iterator[Row]:
+    """CSV with a header row of question ids (plus optional id/name columns)."""
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if header is None:
+        return
+    header = [column.strip() for column in header]
+    for cells in reader:
+        line_number = reader.line_num
+        if not any(cell.strip() for cell in cells):
+            continue
+        if len(cells) > len(header):
+            yield line_number, {}, None, [f"Expected {len(header)} columns, got {len(cells)}"]
+            continue
+        ids, answers, errors = validate_row(dict(zip(header, cells)))
+        yield line_number, ids, None if errors else answers, errors
+
+
+def open_rows(upload: io.IOBase, fmt: str) -> Iterator[Row]:
+    """Row iterator over an uploaded binary file; ``fmt`` is "csv" or "ndjson"."""
+    stream = io.TextIOWrapper(upload, encoding="utf-8-sig", errors="replace", newline="")
+    return iter_csv_rows(stream) if fmt == "csv" else iter_ndjson_rows(stream)
+
+
+class BulkIngestion:
+    """Turns a row iterator into NDJSON output, one chunk of rows per ``next_chunk`` call."""
+
+    def __init__(self, rows: Iterator[Row], compiled: CompiledRules, chunk_rows: int = 1000,
+                 include_roadmap: bool = True):
+        self.rows = rows
+        self.compiled = compiled
+        self.chunk_rows = chunk_rows
+        self.include_roadmap = include_roadmap
+        self.total = 0
+        self.errors = 0
+        self.buckets: Counter = Counter()
+
+    def next_chunk(self) -> Optional[bytes]:
+        """NDJSON lines for the next chunk of rows, or None when the input is exhausted."""
+        chunk = list(itertools.islice(self.rows, self.chunk_rows))
+        if not chunk:
+            return None
+
+        valid = [row for row in chunk if row[2] is not None]
+        with stage("classify"):
+            classifications = classify_many([answers for _, _, answers, _ in valid], self.compiled)
+        for classification in classifications:
+            record_rule_fires(fired_rule_ids(classification))
+
+        roadmaps = [None] * len(valid)
+        if self.include_roadmap:
+            # Same output as generate_roadmap, from the per-plan cache
+            with stage("roadmap"):
+                roadmaps = [roadmap_json(c["bucket"], answers) for c, (_, _, answers, _) in zip(classifications, valid)]
+
+        results = zip(classifications, roadmaps)
+        lines = []
+        with stage("serialization"):
+            for line_number, ids, answers, errors in chunk:
+                self.total += 1
+                if answers is None:
+                    self.errors += 1
+                    lines.append(dumps({"type": "error", "line": line_number, **ids, "errors": errors}))
+                    continue
+                classification, roadmap = next(results)
+                self.buckets[classification["bucket"]] += 1
+                line = dumps({"type": "result", "line": line_number, **ids, "classification": classification})
+                if roadmap is not None:
+                    line = line[:-1] + b',"roadmap":' + roadmap + b"}"
+                lines.append(line)
+        return b"\n".join(lines) + b"\n"
+
+    def summary(self) -> bytes:
+        return dumps({
+            "type": "summary",
+            "rules_version": self.compiled.version,
+            "rows": self.total,
+            "classified": self.total - self.errors,
+            "errors": self.errors,
+            "buckets": dict(self.buckets),
+        }) + b"\n"
@@ -0,0 +1,350 @@
+"""
+Precomputed Classification Table
+Every combination of single-choice answers is classified once at build time and
+written to a compact binary file. Servers mmap the file read-only, so all workers
+share one page-cached copy and /api/classify becomes an offset lookup.
+Roadmaps are not stored: roadmap_generator already shares one precomputed plan per
+signature.
+
+Usage:
+    python classification_table.py build [path]
+    python classification_table.py verify [path] [--all]
+"""
+
+import hashlib
+import itertools
+import json
+import logging
+import mmap
+import os
+import random
+import struct
+import sys
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+import rules_engine
+from questions import QUESTIONS, QUESTION_SET_VERSION
+from rules_engine import CompiledRules, build_classification, get_compiled_rules
+
+logger = logging.getLogger(__name__)
+
+TABLE_PATH = os.getenv("CLASSIFICATION_TABLE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "classification_table.bin"))
+VERIFY_SAMPLES = int(os.getenv("CLASSIFICATION_TABLE_VERIFY_SAMPLES", "256"))
+
+MAGIC = b"KDXCLS02"
+BUILD_CHUNK = 20000
+
+# File layout: MAGIC, uint32 header length, JSON header, padding to 8 bytes,
+# then the sections listed in the header as [offset, length] from the data start.
+#   head_ids        uint32 per record: classification without rule_trace
+#   states          uint8 per record and rule: CompiledRules.trace_templates index
+#   head_offsets    uint64, heads blob boundaries
+#   heads           concatenated JSON fragments
+
+
+def dumps(value: Any) -> bytes:
+    """JSON bytes exactly as FastAPI's JSONResponse renders them."""
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def answer_layout() -> List[Tuple[str, List[str]]]:
+    """Mixed-radix digits: single-choice questions in catalog order and their option values."""
+    return [(q["id"], [o["value"] for o in q["options"]]) for q in QUESTIONS if q["type"] == "single"]
+
+
+def engine_fingerprint(compiled: CompiledRules) -> str:
+    """Hash of everything a table entry depends on."""
+    digest = hashlib.sha256()
+    digest.update(dumps({
+        "rules_version": compiled.version,
+        "rules": list(compiled.rules),
+        "uncertainty_questions": sorted(compiled.uncertainty_questions),
+        "question_set_version": QUESTION_SET_VERSION,
+        "questions": QUESTIONS,
+    }))
+    with open(rules_engine.__file__, "rb") as f:
+        digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _trace_segments(compiled: CompiledRules) -> List[List[bytes]]:
+    return [[dumps(entry) for entry in templates] for templates in compiled.trace_templates]
+
+
+def build_table(path: str = TABLE_PATH, compiled: Optional[CompiledRules] = None) -> Dict[str, Any]:
+    """Classify every single-choice answer combination and write the table to ``path``."""
+    compiled = compiled or get_compiled_rules()
+    layout = answer_layout()
+    question_ids = [qid for qid, _ in layout]
+    record_count = 1
+    for _, values in layout:
+        record_count *= len(values)
+    rule_count = len(compiled.rules)
+
+    if any(len(templates) > 256 for templates in compiled.trace_templates):
+        raise ValueError("Rule has too many conditions for the table format")
+
+    head_ids = np.empty(record_count, dtype="<u4")
+    states = np.empty((record_count, rule_count), dtype=np.uint8)
+    heads: Dict[bytes, int] = {}
+
+    # itertools.product varies the last question fastest, matching the mixed-radix index
+    combos = itertools.product(*(values for _, values in layout))
+    row = 0
+    while True:
+        chunk = [dict(zip(question_ids, combo)) for combo in itertools.islice(combos, BUILD_CHUNK)]
+        if not chunk:
+            break
+
+        chunk_states = compiled.evaluate_states(chunk)
+        states[row:row + len(chunk)] = chunk_states
+
+        for answers, row_states in zip(chunk, chunk_states.tolist()):
+            trace = [templates[state] for templates, state in zip(compiled.trace_templates, row_states)]
+            classification = build_classification(compiled, answers, trace)
+            if list(classification)[-1] != "rule_trace":
+                raise ValueError("rule_trace must be the last classification field")
+            del classification["rule_trace"]
+            head_ids[row] = heads.setdefault(dumps(classification), len(heads))
+            row += 1
+
+    ordered_heads = sorted(heads, key=heads.get)
+    head_offsets = np.zeros(len(ordered_heads) + 1, dtype="<u8")
+    np.cumsum([len(head) for head in ordered_heads], out=head_offsets[1:])
+    sections = [
+        ("head_ids", head_ids.tobytes()),
+        ("states", states.tobytes()),
+        ("head_offsets", head_offsets.tobytes()),
+        ("heads", b"".join(ordered_heads)),
+    ]
+
+    header = {
+        "rules_version": compiled.version,
+        "question_set_version": QUESTION_SET_VERSION,
+        "fingerprint": engine_fingerprint(compiled),
+        "layout": layout,
+        "rule_ids": [rule["id"] for rule in compiled.rules],
+        "record_count": record_count,
+        "distinct_heads": len(heads),
+        "sections": {},
+    }
+    offset = 0
+    for name, data in sections:
+        header["sections"][name] = [offset, len(data)]
+        offset += _padded(len(data))
+
+    header_bytes = dumps(header)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b"\0" * (_padded(12 + len(header_bytes)) - 12 - len(header_bytes)))
+        for _, data in sections:
+            f.write(data)
+            f.write(b"\0" * (_padded(len(data)) - len(data)))
+    # Atomic replace: running workers keep their mapping of the old file
+    os.replace(tmp_path, path)
+
+    return {key: value for key, value in header.items() if key != "sections"}
+
+
+def _padded(length: int) -> int:
+    return (length + 7) & ~7
+
+
+class ClassificationTable:
+    """Read-only, mmap-backed view of a table written by ``build_table``."""
+
+    def __init__(self, path: str = TABLE_PATH):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap[:8] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a classification table")
+
+        header_length = struct.unpack_from("<I", self._mmap, 8)[0]
+        self.header = json.loads(self._mmap[12:12 + header_length])
+        self.rules_version = self.header["rules_version"]
+        data_start = _padded(12 + header_length)
+        view = memoryview(self._mmap)
+
+        def section(name: str, fmt: str) -> memoryview:
+            offset, length = self.header["sections"][name]
+            return view[data_start + offset:data_start + offset + length].cast(fmt)
+
+        self._head_ids = section("head_ids", "I")
+        self._states = section("states", "B")
+        self._head_offsets = section("head_offsets", "Q")
+        self._heads = section("heads", "B")
+
+        self._layout = [
+            (qid, {value: digit for digit, value in enumerate(values)}, len(values))
+            for qid, values in self.header["layout"]
+        ]
+        self._rule_count = len(self.header["rule_ids"])
+        self._compiled: Optional[CompiledRules] = None
+        self._trace_segments: List[List[bytes]] = []
+        self._fired_states: Tuple[int, ...] = ()
+        self._rejected: Optional[CompiledRules] = None
+
+    def close(self) -> None:
+        for name in ("_head_ids", "_states", "_head_offsets", "_heads"):
+            view = getattr(self, name, None)
+            if view is not None:
+                view.release()
+        self._mmap.close()
+
+    def check(self, compiled: Optional[CompiledRules] = None, samples: int = VERIFY_SAMPLES, full: bool = False) -> None:
+        """
+        Raise ValueError unless the table matches the given (default: live) engine.
+        Compares versions and the engine fingerprint, then re-classifies a sample of records.
+        """
+        compiled = compiled or get_compiled_rules()
+        header = self.header
+
+        if header["rules_version"] != compiled.version:
+            raise ValueError(f"Table built for rules {header['rules_version']}, engine runs {compiled.version}")
+        if header["question_set_version"] != QUESTION_SET_VERSION:
+            raise ValueError(f"Table built for question set {header['question_set_version']}, engine runs {QUESTION_SET_VERSION}")
+        if [[qid, values] for qid, values in answer_layout()] != header["layout"]:
+            raise ValueError("Table answer layout differs from questions.QUESTIONS")
+        if header["rule_ids"] != [rule["id"] for rule in compiled.rules]:
+            raise ValueError("Table rule order differs from the engine")
+        if header["fingerprint"] != engine_fingerprint(compiled):
+            raise ValueError("Table fingerprint differs from the engine; rebuild it")
+
+        segments = _trace_segments(compiled)
+        record_count = header["record_count"]
+        if full:
+            indexes = range(record_count)
+        else:
+            rng = random.Random(header["fingerprint"])
+            indexes = [rng.randrange(record_count) for _ in range(min(samples, record_count))]
+
+        for index in indexes:
+            answers = self.decode_index(index)
+            expected = build_classification(compiled, answers, compiled.evaluate(answers))
+            if json.loads(self._classification_at(index, segments)) != expected:
+                raise ValueError(f"Record {index} disagrees with the engine for {answers}")
+
+        self._compiled = compiled
+        self._trace_segments = segments
+        # A rule fired when all its conditions are met and none is uncertain
+        self._fired_states = tuple(count * 2 for count in compiled.condition_counts)
+
+    def is_current(self) -> bool:
+        """True if the table matches the rule set ``classify_assessment`` uses right now."""
+        compiled = get_compiled_rules()
+        if compiled is self._compiled:
+            return True
+        if compiled is self._rejected:
+            return False
+        try:
+            self.check(compiled)
+        except ValueError as e:
+            logger.warning("Classification table %s not used: %s", self.path, e)
+            self._rejected = compiled
+            return False
+        return True
+
+    def index_of(self, answers: Dict[str, Any]) -> Optional[int]:
+        """Mixed-radix record index for a set of answers, or None if the table cannot serve them."""
+        index = 0
+        for qid, digits, radix in self._layout:
+            try:
+                digit = digits[answers.get(qid)]
+            except (KeyError, TypeError):
+                return None
+            index = index * radix + digit
+
+        # Records were built with answers in catalog order; "not_sure" answers
+        # elsewhere, or in a different order, change the result.
+        not_sure = [qid for qid, answer in answers.items() if answer == "not_sure"]
+        if not_sure and not_sure != [qid for qid, _, _ in self._layout if answers[qid] == "not_sure"]:
+            return None
+        return index
+
+    def decode_index(self, index: int) -> Dict[str, Any]:
+        """Answers of a record, in catalog order."""
+        digits = []
+        for _, _, radix in reversed(self._layout):
+            index, digit = divmod(index, radix)
+            digits.append(digit)
+        return {
+            qid: values[digit]
+            for (qid, values), digit in zip(self.header["layout"], reversed(digits))
+        }
+
+    def _classification_at(self, index: int, segments: List[List[bytes]]) -> bytes:
+        head_id = self._head_ids[index]
+        head = bytes(self._heads[self._head_offsets[head_id]:self._head_offsets[head_id + 1]])
+        start = index * self._rule_count
+        states = self._states[start:start + self._rule_count]
+        trace = b",".join(rule_segments[state] for rule_segments, state in zip(segments, states))
+        return b"".join((head[:-1], b',"rule_trace":[', trace, b"]}"))
+
+    def find(self, answers: Dict[str, Any]) -> Optional[int]:
+        """Record index for the answers, or None to fall back to the live engine."""
+        if not self.is_current():
+            return None
+        return self.index_of(answers)
+
+    def classification_at(self, index: int) -> bytes:
+        """Classification JSON of a record returned by ``find``."""
+        return self._classification_at(index, self._trace_segments)
+
+    def fired_rule_ids(self, index: int) -> List[str]:
+        """Ids of the rules that fired for a record returned by ``find``."""
+        start = index * self._rule_count
+        states = self._states[start:start + self._rule_count]
+        return [rule_id for rule_id, state, fired in zip(self.header["rule_ids"], states, self._fired_states) if state == fired]
+
+
+def load_table(path: str = TABLE_PATH) -> Optional[ClassificationTable]:
+    """Open and check the table; None if it does not exist or does not match the engine."""
+    if not os.path.exists(path):
+        return None
+    try:
+        table = ClassificationTable(path)
+    except (OSError, ValueError) as e:
+        logger.warning("Classification table %s not loaded: %s", path, e)
+        return None
+    if not table.is_current():
+        table.close()
+        return None
+    return table
+
+
+def main(argv: List[str]) -> int:
+    if not argv or argv[0] not in ("build", "verify"):
+        print(__doc__)
+        return 2
+
+    paths = [arg for arg in argv[1:] if not arg.startswith("--")]
+    path = paths[0] if paths else TABLE_PATH
+
+    if argv[0] == "build":
+        summary = build_table(path)
+        print(f"Wrote {path}: {summary['record_count']} records, {summary['distinct_heads']} distinct results "
+              f"(rules {summary['rules_version']}, {os.path.getsize(path)} bytes)")
+        return 0
+
+    table = ClassificationTable(path)
+    try:
+        table.check(full="--all" in argv)
+    except ValueError as e:
+        print(f"Table {path} is inconsistent: {e}")
+        return 1
+    finally:
+        table.close()
+    print(f"Table {path} matches the live engine (rules {table.rules_version})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,186 @@
+"""
+Server-side Conversation Sessions
+Conversation state lives on the server, addressed by a session id, so clients only send the
+new message and receive the delta. Sessions are kept in an in-memory write-back cache and
+persisted to MongoDB by a background flusher.
+
+Every worker caches its own copies, so writes are compare-and-set on the revision the worker
+loaded or last wrote: a copy that another worker has moved past is never written back, and is
+dropped from the cache instead.
+"""
+
+import asyncio
+import logging
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+from fastapi.encoders import jsonable_encoder
+from pymongo import ReplaceOne, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+
+class StaleSessionError(Exception):
+    """The client has seen a newer revision than this worker can load yet."""
+
+
+class SessionEntry:
+    """
+    A cached session. ``state`` is live and changes while a turn runs under ``lock``;
+    ``snapshot`` is its encoded form as of the last completed turn, which is what gets
+    flushed. ``snapshot_id`` tells that snapshot apart from another worker's one of the same
+    revision. ``stored_revision`` is the revision MongoDB holds (None until first written).
+    """
+    __slots__ = ("state", "revision", "lock", "dirty", "snapshot", "snapshot_id", "stored_revision")
+
+    def __init__(self, state: Any, revision: int, stored_revision: Optional[int] = None):
+        self.state = state
+        self.revision = revision
+        self.lock = asyncio.Lock()
+        self.dirty = False
+        self.snapshot: Optional[dict] = None
+        self.snapshot_id: Optional[str] = None
+        self.stored_revision = stored_revision
+
+
+class SessionStore:
+    """Write-back cache of conversation sessions in front of a MongoDB collection."""
+
+    def __init__(self, collection: Any, parse: Callable[[dict], Any], max_cached: int = 10000,
+                 flush_interval: float = 0.5, ttl_seconds: int = 7 * 24 * 3600):
+        self.collection = collection
+        self.parse = parse
+        self.max_cached = max_cached
+        self.flush_interval = flush_interval
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, SessionEntry]" = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+
+    async def create(self, state: Any, revision: int = 0) -> str:
+        session_id = uuid.uuid4().hex
+        entry = SessionEntry(state, revision)
+        self._take_snapshot(entry)
+        self._remember(session_id, entry)
+        return session_id
+
+    async def get(self, session_id: str, min_revision: Optional[int] = None) -> Optional[SessionEntry]:
+        """
+        Cached session, loaded from MongoDB on a miss.
+        ``min_revision`` is the last revision the client saw; a cached copy older than that
+        was advanced by another worker and is reloaded.
+        """
+        entry = self._entries.get(session_id)
+        if entry is not None and (min_revision is None or entry.revision >= min_revision):
+            self._entries.move_to_end(session_id)
+            return entry
+
+        doc = await self.collection.find_one({"_id": session_id})
+        if doc is None:
+            return None
+        if min_revision is not None and doc["revision"] < min_revision:
+            raise StaleSessionError(session_id)
+
+        entry = SessionEntry(self.parse(doc["state"]), doc["revision"], stored_revision=doc["revision"])
+        self._remember(session_id, entry)
+        return entry
+
+    def mark_dirty(self, entry: SessionEntry) -> None:
+        """Record a completed turn; call while holding ``entry.lock``, once the state is consistent."""
+        entry.revision += 1
+        self._take_snapshot(entry)
+
+    def _take_snapshot(self, entry: SessionEntry) -> None:
+        entry.snapshot = jsonable_encoder(entry.state)
+        entry.snapshot_id = uuid.uuid4().hex
+        entry.dirty = True
+
+    def _remember(self, session_id: str, entry: SessionEntry) -> None:
+        self._entries[session_id] = entry
+        self._entries.move_to_end(session_id)
+        # Only clean entries may be dropped; dirty ones go after the next flush
+        if len(self._entries) > self.max_cached:
+            for old_id in list(self._entries):
+                if len(self._entries) <= self.max_cached:
+                    break
+                old = self._entries[old_id]
+                if not old.dirty and not old.lock.locked():
+                    del self._entries[old_id]
+
+    async def flush(self) -> int:
+        """
+        Persist all dirty sessions in one bulk write; returns how many were written.
+        Sessions another worker has moved past are not written, and leave the cache.
+        """
+        dirty = [(session_id, entry, entry.revision, entry.snapshot, entry.snapshot_id)
+                 for session_id, entry in self._entries.items() if entry.dirty]
+        if not dirty:
+            return 0
+
+        now = datetime.now(timezone.utc)
+        operations = []
+        for session_id, entry, revision, snapshot, snapshot_id in dirty:
+            entry.dirty = False
+            doc = {"state": snapshot, "revision": revision, "snapshot_id": snapshot_id, "updated_at": now}
+            if entry.stored_revision is None:
+                # New session: insert, or leave alone if a retried flush already did
+                operations.append(UpdateOne({"_id": session_id}, {"$setOnInsert": doc}, upsert=True))
+            else:
+                operations.append(ReplaceOne({"_id": session_id, "revision": entry.stored_revision}, doc))
+        try:
+            result = await self.collection.bulk_write(operations, ordered=False)
+        except Exception:
+            for _, entry, _, _, _ in dirty:
+                entry.dirty = True
+            raise
+
+        stale = set()
+        if result.modified_count + result.upserted_count < len(operations):
+            # Some writes matched nothing; the ones whose snapshot MongoDB does not hold lost the race
+            written = {session_id: snapshot_id for session_id, _, _, _, snapshot_id in dirty}
+            async for doc in self.collection.find({"_id": {"$in": list(written)}}, {"snapshot_id": 1}):
+                if doc.get("snapshot_id") != written[doc["_id"]]:
+                    stale.add(doc["_id"])
+        for session_id, entry, revision, _, _ in dirty:
+            if session_id not in stale:
+                entry.stored_revision = revision
+                continue
+            logger.warning("Session %s was advanced by another worker; dropping revision %d", session_id, revision)
+            if self._entries.get(session_id) is entry:
+                del self._entries[session_id]
+        return len(operations) - len(stale)
+
+    async def start(self) -> None:
+        try:
+            await self.collection.create_index("updated_at", expireAfterSeconds=self.ttl_seconds)
+        except Exception as e:
+            logger.warning("Session TTL index not created: %s", e)
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error("Final session flush failed: %s", e)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning("Session flush failed: %s", e)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "cached": len(self._entries),
+            "dirty": sum(1 for entry in self._entries.values() if entry.dirty),
+        }
@@ -0,0 +1,53 @@
+"""
+Fast JSON Encoding
+Classification results are deep dicts (a rule trace entry per rule), and FastAPI's
+jsonable_encoder walks every node before json.dumps walks them again. Responses built
+here go straight to bytes with orjson, or with stdlib json when orjson is not installed.
+"""
+
+import json
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from starlette.responses import Response
+
+from metrics import stage
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; stdlib json gives the same output, slower
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    # Only reached for types neither encoder handles natively (pydantic models, sets, ObjectId)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    try:
+        return jsonable_encoder(obj)
+    except ValueError:
+        return str(obj)
+
+
+if orjson is not None:
+    # Non-string dict keys are stringified, as stdlib json does
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any) -> bytes:
+        """Compact UTF-8 JSON bytes."""
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+else:
+    def dumps(obj: Any) -> bytes:
+        """Compact UTF-8 JSON bytes."""
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """JSON response rendered with ``dumps``; returning one from an endpoint skips jsonable_encoder."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        with stage("serialization"):
+            return dumps(content)
@@ -0,0 +1,569 @@
+"""
+Background Jobs
+A queue plus worker pool for heavy assessment work: batch classification, roadmap
+generation and export rendering. Jobs are stored in MongoDB (or in memory for tests
+and single-process setups), CPU-bound chunks run in a process pool, and handlers
+report progress, honour cancellation and are retried when they fail.
+
+Large inputs (batch answer sets) are stored in numbered chunks next to the job, like
+its results, so no single document approaches MongoDB's 16 MB limit.
+
+A claim's attempt number is its lease token: heartbeats, result chunks and the final
+status only count for the attempt that currently holds the job, so a runner that stalled
+past its lease and was overtaken cannot interleave with the new run.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+from roadmap_generator import generate_roadmap
+from rules_engine import CompiledRules, classify_many, compile_rules
+
+logger = logging.getLogger(__name__)
+
+JOB_KINDS = ("classify", "roadmap", "export")
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+EXPORT_DISCLAIMER = (
+    "This export is generated from self-assessment answers and is not legal advice. "
+    "Classification under the EU AI Act depends on the full context of the system; "
+    "consult qualified legal counsel before relying on it."
+)
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler once cancellation of its job was requested."""
+
+
+class JobLeaseLost(Exception):
+    """Raised inside a handler whose job was claimed by another runner after its lease expired."""
+
+
+class JobFailed(Exception):
+    """Raised by a handler for a failure retrying cannot fix (e.g. a missing project); the job fails at once."""
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def new_job(kind: str, params: Dict[str, Any], max_attempts: int) -> Dict[str, Any]:
+    now = _now()
+    return {
+        "id": uuid.uuid4().hex,
+        "kind": kind,
+        "params": params,
+        "status": "queued",
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "progress": {"done": 0, "total": None},
+        "summary": None,
+        "error": None,
+        "cancel_requested": False,
+        "created_at": now,
+        "updated_at": now,
+        "lease_expires_at": None,
+        "finished_at": None,
+    }
+
+
+def job_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Public form of a job: everything except its (possibly large) parameters."""
+    return {key: value for key, value in job.items() if key not in ("_id", "params")}
+
+
+# --- Stores ---
+class MemoryJobStore:
+    """In-process job store with the same interface as MongoJobStore."""
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._inputs: Dict[str, Dict[int, List[Any]]] = {}
+        self._results: Dict[str, Dict[int, List[Any]]] = {}
+
+    async def start(self) -> None:
+        pass
+
+    async def create(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        self._jobs[job["id"]] = job
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._jobs.get(job_id)
+
+    async def claim(self, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        """Oldest queued job (or running job whose lease expired), marked running."""
+        now = _now()
+        for job in sorted(self._jobs.values(), key=lambda j: j["created_at"]):
+            stale = job["status"] == "running" and job["lease_expires_at"] < now
+            if job["status"] == "queued" or stale:
+                job.update(status="running", attempts=job["attempts"] + 1, updated_at=now,
+                           lease_expires_at=now + timedelta(seconds=lease_seconds))
+                return dict(job)
+        return None
+
+    def _held(self, job_id: str, attempt: int) -> bool:
+        job = self._jobs.get(job_id)
+        return job is not None and job["status"] == "running" and job["attempts"] == attempt
+
+    async def heartbeat(self, job_id: str, attempt: int, done: int, total: Optional[int],
+                        lease_seconds: float) -> Optional[bool]:
+        """
+        Record progress and extend the lease; False if cancellation was requested,
+        None if ``attempt`` no longer holds the job.
+        """
+        if not self._held(job_id, attempt):
+            return None
+        job = self._jobs[job_id]
+        now = _now()
+        job.update(progress={"done": done, "total": total}, updated_at=now,
+                   lease_expires_at=now + timedelta(seconds=lease_seconds))
+        return not job["cancel_requested"]
+
+    async def add_inputs(self, job_id: str, chunk: int, items: List[Any]) -> None:
+        self._inputs.setdefault(job_id, {})[chunk] = items
+
+    async def clear_inputs(self, job_id: str) -> None:
+        self._inputs.pop(job_id, None)
+
+    async def iter_inputs(self, job_id: str) -> AsyncIterator[List[Any]]:
+        chunks = self._inputs.get(job_id, {})
+        for chunk in sorted(chunks):
+            yield chunks[chunk]
+
+    async def add_results(self, job_id: str, attempt: int, chunk: int, items: List[Any]) -> None:
+        self._results.setdefault(job_id, {})[(attempt, chunk)] = items
+
+    async def clear_results(self, job_id: str) -> None:
+        self._results.pop(job_id, None)
+
+    async def iter_results(self, job_id: str, attempt: int) -> AsyncIterator[List[Any]]:
+        chunks = self._results.get(job_id, {})
+        for key in sorted(key for key in chunks if key[0] == attempt):
+            yield chunks[key]
+
+    async def finish(self, job_id: str, status: str, summary: Any = None, error: Optional[str] = None,
+                     attempt: Optional[int] = None) -> bool:
+        """Set the final status, if ``attempt`` (when given) still holds the job; returns whether it did."""
+        if attempt is not None and not self._held(job_id, attempt):
+            return False
+        now = _now()
+        self._jobs[job_id].update(status=status, summary=summary, error=error, updated_at=now,
+                                  finished_at=now, lease_expires_at=None)
+        return True
+
+    async def requeue(self, job_id: str, attempt: int, error: str) -> bool:
+        if not self._held(job_id, attempt):
+            return False
+        self._jobs[job_id].update(status="queued", error=error, updated_at=_now(), lease_expires_at=None)
+        return True
+
+    async def request_cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancel a queued job now, or flag a running one; returns the updated job."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        if job["status"] == "queued":
+            await self.finish(job_id, "cancelled")
+            await self.clear_inputs(job_id)
+        elif job["status"] == "running":
+            job.update(cancel_requested=True, updated_at=_now())
+        return job
+
+
+class MongoJobStore:
+    """Job store on three collections: jobs, and their inputs and results in numbered chunks."""
+
+    def __init__(self, jobs: Any, results: Any, inputs: Any, ttl_seconds: int = 7 * 24 * 3600):
+        self.jobs = jobs
+        self.results = results
+        self.inputs = inputs
+        self.ttl_seconds = ttl_seconds
+
+    async def start(self) -> None:
+        try:
+            await self.jobs.create_index("id", unique=True)
+            await self.jobs.create_index([("status", 1), ("created_at", 1)])
+            await self.jobs.create_index("finished_at", expireAfterSeconds=self.ttl_seconds)
+            await self.results.create_index([("job_id", 1), ("attempt", 1), ("chunk", 1)])
+            await self.inputs.create_index([("job_id", 1), ("chunk", 1)])
+            for chunks in (self.results, self.inputs):
+                await chunks.create_index("created_at", expireAfterSeconds=self.ttl_seconds)
+        except Exception as e:
+            logger.warning("Job indexes not created: %s", e)
+
+    async def create(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        await self.jobs.insert_one(dict(job))
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.jobs.find_one({"id": job_id}, {"_id": 0})
+
+    async def claim(self, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        now = _now()
+        return await self.jobs.find_one_and_update(
+            {"$or": [{"status": "queued"}, {"status": "running", "lease_expires_at": {"$lt": now}}]},
+            {
+                "$set": {"status": "running", "updated_at": now, "lease_expires_at": now + timedelta(seconds=lease_seconds)},
+                "$inc": {"attempts": 1},
+            },
+            sort=[("created_at", 1)],
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def heartbeat(self, job_id: str, attempt: int, done: int, total: Optional[int],
+                        lease_seconds: float) -> Optional[bool]:
+        now = _now()
+        job = await self.jobs.find_one_and_update(
+            {"id": job_id, "status": "running", "attempts": attempt},
+            {"$set": {"progress": {"done": done, "total": total}, "updated_at": now,
+                      "lease_expires_at": now + timedelta(seconds=lease_seconds)}},
+            projection={"cancel_requested": 1},
+        )
+        if job is None:
+            return None
+        return not job.get("cancel_requested")
+
+    async def add_inputs(self, job_id: str, chunk: int, items: List[Any]) -> None:
+        await self.inputs.replace_one(
+            {"job_id": job_id, "chunk": chunk},
+            {"job_id": job_id, "chunk": chunk, "items": items, "created_at": _now()},
+            upsert=True,
+        )
+
+    async def clear_inputs(self, job_id: str) -> None:
+        await self.inputs.delete_many({"job_id": job_id})
+
+    async def iter_inputs(self, job_id: str) -> AsyncIterator[List[Any]]:
+        async for doc in self.inputs.find({"job_id": job_id}, {"_id": 0, "items": 1}).sort("chunk", 1):
+            yield doc["items"]
+
+    async def add_results(self, job_id: str, attempt: int, chunk: int, items: List[Any]) -> None:
+        await self.results.replace_one(
+            {"job_id": job_id, "attempt": attempt, "chunk": chunk},
+            {"job_id": job_id, "attempt": attempt, "chunk": chunk, "items": items, "created_at": _now()},
+            upsert=True,
+        )
+
+    async def clear_results(self, job_id: str) -> None:
+        await self.results.delete_many({"job_id": job_id})
+
+    async def iter_results(self, job_id: str, attempt: int) -> AsyncIterator[List[Any]]:
+        cursor = self.results.find({"job_id": job_id, "attempt": attempt}, {"_id": 0, "items": 1}).sort("chunk", 1)
+        async for doc in cursor:
+            yield doc["items"]
+
+    def _held(self, job_id: str, attempt: Optional[int]) -> Dict[str, Any]:
+        if attempt is None:
+            return {"id": job_id}
+        return {"id": job_id, "status": "running", "attempts": attempt}
+
+    async def finish(self, job_id: str, status: str, summary: Any = None, error: Optional[str] = None,
+                     attempt: Optional[int] = None) -> bool:
+        now = _now()
+        result = await self.jobs.update_one(self._held(job_id, attempt), {"$set": {
+            "status": status, "summary": summary, "error": error,
+            "updated_at": now, "finished_at": now, "lease_expires_at": None,
+        }})
+        return result.matched_count == 1
+
+    async def requeue(self, job_id: str, attempt: int, error: str) -> bool:
+        result = await self.jobs.update_one(self._held(job_id, attempt), {"$set": {
+            "status": "queued", "error": error, "updated_at": _now(), "lease_expires_at": None,
+        }})
+        return result.matched_count == 1
+
+    async def request_cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        now = _now()
+        job = await self.jobs.find_one_and_update(
+            {"id": job_id, "status": "queued"},
+            {"$set": {"status": "cancelled", "updated_at": now, "finished_at": now}},
+            projection={"_id": 0}, return_document=ReturnDocument.AFTER,
+        )
+        if job is not None:
+            await self.clear_inputs(job_id)
+        else:
+            job = await self.jobs.find_one_and_update(
+                {"id": job_id, "status": "running"},
+                {"$set": {"cancel_requested": True, "updated_at": now}},
+                projection={"_id": 0}, return_document=ReturnDocument.AFTER,
+            )
+        return job or await self.get(job_id)
+
+
+# --- Process-pool tasks (module level so they can be pickled) ---
+_worker_rules: Dict[str, CompiledRules] = {}
+
+
+def rules_payload(compiled: CompiledRules) -> Dict[str, Any]:
+    """What a pool process needs to rebuild ``compiled``."""
+    return {
+        "version": compiled.version,
+        "digest": compiled.digest,
+        "rules": list(compiled.rules),
+        "uncertainty_questions": sorted(compiled.uncertainty_questions),
+    }
+
+
+def _rules_from_payload(payload: Dict[str, Any]) -> CompiledRules:
+    compiled = _worker_rules.get(payload["digest"])
+    if compiled is None:
+        compiled = compile_rules(payload["rules"], payload["version"], payload["uncertainty_questions"])
+        _worker_rules[payload["digest"]] = compiled
+    return compiled
+
+
+def classify_task(payload: Dict[str, Any], answers_list: List[Dict[str, Any]], with_roadmap: bool) -> List[Dict[str, Any]]:
+    classifications = classify_many(answers_list, _rules_from_payload(payload))
+    if not with_roadmap:
+        return classifications
+    return [
+        {"classification": classification, "roadmap": generate_roadmap(classification, answers)}
+        for classification, answers in zip(classifications, answers_list)
+    ]
+
+
+def export_task(payload: Dict[str, Any], project: Dict[str, Any], assessments: List[Dict[str, Any]],
+                generated_at: str) -> List[Dict[str, Any]]:
+    """Export documents (same shape as /api/export) for stored assessments, filling in missing results."""
+    compiled = _rules_from_payload(payload)
+    documents = []
+    for assessment in assessments:
+        answers = assessment.get("answers_json") or {}
+        classification = assessment.get("classification_json") or classify_many([answers], compiled)[0]
+        roadmap = assessment.get("roadmap_json") or generate_roadmap(classification, answers)
+        documents.append({
+            "project": project,
+            "assessment": {**assessment, "classification_json": classification, "roadmap_json": roadmap},
+            "disclaimer": EXPORT_DISCLAIMER,
+            "generated_at": generated_at,
+        })
+    return documents
+
+
+# --- Runner ---
+class JobContext:
+    """What a handler uses to run work, report progress and publish results."""
+
+    def __init__(self, runner: "JobRunner", job: Dict[str, Any]):
+        self.runner = runner
+        self.job = job
+        self._chunks = 0
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run a CPU-bound function in the worker pool."""
+        pool = self.runner.pool
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, partial(fn, *args))
+        except BrokenProcessPool:
+            # A worker process died; later attempts get a fresh pool
+            self.runner.replace_pool(pool)
+            raise
+
+    async def progress(self, done: int, total: Optional[int]) -> None:
+        """
+        Record progress; raises JobCancelled if the job was cancelled meanwhile, and
+        JobLeaseLost if another runner has taken it over.
+        """
+        held = await self.runner.store.heartbeat(self.job["id"], self.job["attempts"], done, total,
+                                                 self.runner.lease_seconds)
+        if held is None:
+            raise JobLeaseLost(self.job["id"])
+        if not held:
+            raise JobCancelled(self.job["id"])
+
+    def inputs(self) -> AsyncIterator[List[Any]]:
+        """The job's inputs, chunk by chunk, as submitted."""
+        return self.runner.store.iter_inputs(self.job["id"])
+
+    async def emit(self, items: List[Any]) -> None:
+        """Append a chunk of results."""
+        await self.runner.store.add_results(self.job["id"], self.job["attempts"], self._chunks, items)
+        self._chunks += 1
+
+
+Handler = Callable[[JobContext, Dict[str, Any]], Awaitable[Any]]
+
+
+class JobRunner:
+    """Claims jobs from a store and runs them, ``concurrency`` at a time."""
+
+    def __init__(self, store: Any, handlers: Dict[str, Handler], processes: int = 2, concurrency: int = 2,
+                 lease_seconds: float = 60.0, poll_interval: float = 1.0, input_chunk_size: int = 1000):
+        self.store = store
+        self.handlers = handlers
+        self.input_chunk_size = input_chunk_size
+        self.processes = processes
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.pool: Optional[Executor] = None
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+
+    async def start(self) -> None:
+        await self.store.start()
+        self.pool = self._new_pool()
+        self._tasks = [asyncio.create_task(self._work_loop()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        if self.pool is not None:
+            # Interrupted jobs keep status "running" and are retried once their lease expires
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    def _new_pool(self) -> Optional[Executor]:
+        # Without processes, work runs in the default thread pool (tests, small deployments)
+        if self.processes <= 0:
+            return None
+        return ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context("spawn"))
+
+    def replace_pool(self, broken: Optional[Executor]) -> None:
+        """Swap in a new pool if ``broken`` is still the current one."""
+        if broken is not None and self.pool is broken:
+            self.pool = self._new_pool()
+            broken.shutdown(wait=False, cancel_futures=True)
+
+    def notify(self) -> None:
+        """Wake idle workers, e.g. right after a job was submitted."""
+        self._wakeup.set()
+
+    async def submit(self, kind: str, params: Dict[str, Any], max_attempts: int = 3,
+                     inputs: Optional[List[Any]] = None) -> Dict[str, Any]:
+        """Queue a job; ``inputs`` are stored in chunks (read back with JobContext.inputs) and counted in params["input_count"]."""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind '{kind}'")
+        inputs = inputs or []
+        job = new_job(kind, {**params, "input_count": len(inputs)}, max_attempts)
+        # Inputs first, so a worker never claims a job whose inputs are still being written
+        for chunk, start in enumerate(range(0, len(inputs), self.input_chunk_size)):
+            await self.store.add_inputs(job["id"], chunk, inputs[start:start + self.input_chunk_size])
+        job = await self.store.create(job)
+        self.notify()
+        return job
+
+    async def _work_loop(self) -> None:
+        while True:
+            try:
+                job = await self.store.claim(self.lease_seconds)
+            except Exception as e:
+                logger.warning("Job claim failed: %s", e)
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        job_id, attempt = job["id"], job["attempts"]
+        if attempt > job["max_attempts"]:
+            await self._finish(job, "failed", error=job.get("error") or "Worker lost too many times")
+            return
+
+        await self.store.clear_results(job_id)
+        try:
+            summary = await self.handlers[job["kind"]](JobContext(self, job), job["params"])
+        except JobCancelled:
+            if await self._finish(job, "cancelled"):
+                await self.store.clear_results(job_id)
+        except JobLeaseLost:
+            logger.warning("Job %s (%s) attempt %d was taken over by another runner", job_id, job["kind"], attempt)
+        except JobFailed as e:
+            logger.warning("Job %s (%s) failed: %s", job_id, job["kind"], e)
+            await self._finish(job, "failed", error=str(e))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Job %s (%s) attempt %d failed: %s", job_id, job["kind"], attempt, e)
+            if attempt < job["max_attempts"]:
+                await self.store.requeue(job_id, attempt, str(e))
+            else:
+                await self._finish(job, "failed", error=str(e))
+        else:
+            await self._finish(job, "completed", summary=summary)
+
+    async def _finish(self, job: Dict[str, Any], status: str, summary: Any = None, error: Optional[str] = None) -> bool:
+        """Final status for ``job`` if this attempt still holds it; its inputs are dropped then."""
+        if not await self.store.finish(job["id"], status, summary=summary, error=error, attempt=job["attempts"]):
+            logger.warning("Job %s attempt %d no longer holds its lease; %s status dropped", job["id"], job["attempts"], status)
+            return False
+        await self.store.clear_inputs(job["id"])
+        return True
+
+
+# --- Handlers ---
+def assessment_handlers(db: Any, resolve_rules: Callable[[Optional[str]], Awaitable[CompiledRules]],
+                        chunk_size: int = 1000) -> Dict[str, Handler]:
+    """
+    Handlers for the JOB_KINDS; ``resolve_rules`` maps an optional rules version to a rule set.
+    Classify and roadmap jobs take their answer sets from the job inputs; exports read ``chunk_size``
+    assessments at a time.
+    """
+
+    async def classify(ctx: JobContext, params: Dict[str, Any], with_roadmap: bool = False) -> Dict[str, Any]:
+        compiled = await resolve_rules(params.get("rules_version"))
+        payload = rules_payload(compiled)
+        total = params["input_count"]
+        await ctx.progress(0, total)
+        done = 0
+        # One pool task per stored input chunk (JobRunner.input_chunk_size answer sets)
+        async for answers_list in ctx.inputs():
+            items = await ctx.run(classify_task, payload, answers_list, with_roadmap)
+            await ctx.emit(items)
+            done += len(answers_list)
+            await ctx.progress(done, total)
+        return {"rules_version": compiled.version, "count": done}
+
+    async def roadmap(ctx: JobContext, params: Dict[str, Any]) -> Dict[str, Any]:
+        return await classify(ctx, params, with_roadmap=True)
+
+    async def export(ctx: JobContext, params: Dict[str, Any]) -> Dict[str, Any]:
+        compiled = await resolve_rules(params.get("rules_version"))
+        payload = rules_payload(compiled)
+        project_id = params["project_id"]
+        project = await db.projects.find_one({"id": project_id}, {"_id": 0})
+        if project is None:
+            raise JobFailed(f"Project {project_id} not found")
+        total = await db.assessments.count_documents({"project_id": project_id})
+        generated_at = _now().isoformat()
+        await ctx.progress(0, total)
+
+        done = 0
+        batch: List[Dict[str, Any]] = []
+        cursor = db.assessments.find({"project_id": project_id}, {"_id": 0}).batch_size(chunk_size)
+        async for assessment in cursor:
+            batch.append(assessment)
+            if len(batch) >= chunk_size:
+                await ctx.emit(await ctx.run(export_task, payload, project, batch, generated_at))
+                done += len(batch)
+                batch = []
+                await ctx.progress(done, total)
+        if batch:
+            await ctx.emit(await ctx.run(export_task, payload, project, batch, generated_at))
+            done += len(batch)
+            await ctx.progress(done, total)
+        return {"project_id": project_id, "count": done}
+
+    return {"classify": classify, "roadmap": roadmap, "export": export}
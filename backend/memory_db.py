@@ -0,0 +1,419 @@
+"""
+In-memory MongoDB Stand-in
+Implements the part of the Motor API the server uses (equality/comparison filters, $set/
+$setOnInsert/$inc updates, projections, sorted cursors, bulk replaces) over plain dicts, so
+the app runs without a MongoDB server for benchmarks and load runs.
+
+Usage:
+    MONGODB_URI=memory:// OPENAI_BASE_URL=http://localhost:8099/v1 OPENAI_API_KEY=stub uvicorn server:app
+"""
+
+import copy
+import itertools
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure
+
+from questions import QUESTIONS
+
+MEMORY_URI = "memory://"
+
+_MISSING = object()
+
+
+def _get(doc: Dict[str, Any], path: str) -> Any:
+    for part in path.split("."):
+        if not isinstance(doc, dict) or part not in doc:
+            return _MISSING
+        doc = doc[part]
+    return doc
+
+
+def _set(doc: Dict[str, Any], path: str, value: Any) -> None:
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[last] = value
+
+
+def _compare(value: Any, operator: str, operand: Any) -> bool:
+    if operator == "$ne":
+        return value is _MISSING or value != operand
+    if operator == "$in":
+        return value is not _MISSING and value in operand
+    if operator == "$nin":
+        return value is _MISSING or value not in operand
+    if operator == "$exists":
+        return (value is not _MISSING) == bool(operand)
+    if value is _MISSING or value is None:
+        return False
+    if operator == "$lt":
+        return value < operand
+    if operator == "$lte":
+        return value <= operand
+    if operator == "$gt":
+        return value > operand
+    if operator == "$gte":
+        return value >= operand
+    raise OperationFailure(f"Unsupported query operator {operator}")
+
+
+def matches(doc: Dict[str, Any], query: Optional[Dict[str, Any]]) -> bool:
+    for key, condition in (query or {}).items():
+        if key == "$or":
+            if not any(matches(doc, branch) for branch in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(doc, branch) for branch in condition):
+                return False
+        elif isinstance(condition, dict) and condition and all(op.startswith("$") for op in condition):
+            value = _get(doc, key)
+            if not all(_compare(value, op, operand) for op, operand in condition.items()):
+                return False
+        elif _get(doc, key) is _MISSING:
+            if condition is not None:
+                return False
+        elif _get(doc, key) != condition:
+            return False
+    return True
+
+
+def project(doc: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    doc = copy.deepcopy(doc)
+    if not projection:
+        return doc
+    include_id = projection.get("_id", 1)
+    fields = {key: value for key, value in projection.items() if key != "_id"}
+    if fields and all(fields.values()):
+        projected: Dict[str, Any] = {}
+        for path in fields:
+            value = _get(doc, path)
+            if value is not _MISSING:
+                _set(projected, path, value)
+        if include_id and "_id" in doc:
+            projected["_id"] = doc["_id"]
+        return projected
+    for path in fields:
+        *parents, last = path.split(".")
+        parent = _get(doc, ".".join(parents)) if parents else doc
+        if isinstance(parent, dict):
+            parent.pop(last, None)
+    if not include_id:
+        doc.pop("_id", None)
+    return doc
+
+
+def _sort_key(sort: List[Tuple[str, int]]):
+    def key(doc):
+        # None and missing sort first, as in MongoDB
+        values = []
+        for path, _ in sort:
+            value = _get(doc, path)
+            values.append((0, 0) if value is _MISSING or value is None else (1, value))
+        return values
+    return key
+
+
+def _sorted(docs: List[Dict[str, Any]], sort: Optional[List[Tuple[str, int]]]) -> List[Dict[str, Any]]:
+    for path, direction in reversed(sort or []):
+        docs = sorted(docs, key=_sort_key([(path, direction)]), reverse=direction < 0)
+    return docs
+
+
+def _normalize_sort(key_or_list: Any, direction: int = 1) -> List[Tuple[str, int]]:
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction)]
+    return list(key_or_list)
+
+
+def apply_update(doc: Dict[str, Any], update: Dict[str, Any], inserting: bool) -> None:
+    for operator, fields in update.items():
+        if operator == "$set" or (operator == "$setOnInsert" and inserting):
+            for path, value in fields.items():
+                _set(doc, path, copy.deepcopy(value))
+        elif operator == "$inc":
+            for path, amount in fields.items():
+                current = _get(doc, path)
+                _set(doc, path, (0 if current is _MISSING else current) + amount)
+        elif operator == "$unset":
+            for path in fields:
+                *parents, last = path.split(".")
+                parent = _get(doc, ".".join(parents)) if parents else doc
+                if isinstance(parent, dict):
+                    parent.pop(last, None)
+        elif operator != "$setOnInsert":
+            raise OperationFailure(f"Unsupported update operator {operator}")
+
+
+class InsertOneResult:
+    def __init__(self, inserted_id: Any):
+        self.inserted_id = inserted_id
+
+
+class UpdateResult:
+    def __init__(self, matched_count: int, modified_count: int, upserted_id: Any = None):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_id = upserted_id
+
+
+class BulkWriteResult:
+    def __init__(self):
+        self.inserted_count = 0
+        self.matched_count = 0
+        self.modified_count = 0
+        self.upserted_count = 0
+
+    def add(self, result: UpdateResult) -> None:
+        self.matched_count += result.matched_count
+        self.modified_count += result.modified_count
+        self.upserted_count += result.upserted_id is not None
+
+
+class DeleteResult:
+    def __init__(self, deleted_count: int):
+        self.deleted_count = deleted_count
+
+
+class MemoryCursor:
+    """Lazy, chainable cursor; documents are copied when read."""
+
+    def __init__(self, collection: "MemoryCollection", query: Optional[Dict[str, Any]], projection: Optional[Dict[str, Any]]):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._sort: List[Tuple[str, int]] = []
+        self._skip = 0
+        self._limit = 0
+        self._iterator: Optional[Iterator[Dict[str, Any]]] = None
+
+    def sort(self, key_or_list: Any, direction: int = 1) -> "MemoryCursor":
+        self._sort = _normalize_sort(key_or_list, direction)
+        return self
+
+    def skip(self, count: int) -> "MemoryCursor":
+        self._skip = count
+        return self
+
+    def limit(self, count: int) -> "MemoryCursor":
+        self._limit = count
+        return self
+
+    def batch_size(self, size: int) -> "MemoryCursor":
+        return self
+
+    def _documents(self) -> Iterator[Dict[str, Any]]:
+        docs = _sorted(self._collection._matching(self._query), self._sort)[self._skip:]
+        if self._limit:
+            docs = docs[:self._limit]
+        return (project(doc, self._projection) for doc in docs)
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        docs = self._documents()
+        return list(docs if length is None else itertools.islice(docs, length))
+
+    def __aiter__(self) -> "MemoryCursor":
+        self._iterator = self._documents()
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class MemoryCollection:
+    def __init__(self, name: str):
+        self.name = name
+        self._docs: Dict[Any, Dict[str, Any]] = {}
+        self._ids = itertools.count(1)
+
+    def _matching(self, query: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if query and set(query) == {"_id"} and not isinstance(query["_id"], dict):
+            doc = self._docs.get(query["_id"])
+            return [doc] if doc is not None else []
+        return [doc for doc in self._docs.values() if matches(doc, query)]
+
+    def _first(self, query: Optional[Dict[str, Any]], sort: Optional[List[Tuple[str, int]]] = None) -> Optional[Dict[str, Any]]:
+        docs = _sorted(self._matching(query), sort)
+        return docs[0] if docs else None
+
+    def _insert(self, doc: Dict[str, Any]) -> Any:
+        doc = copy.deepcopy(doc)
+        doc.setdefault("_id", next(self._ids))
+        if doc["_id"] in self._docs:
+            raise OperationFailure(f"E11000 duplicate key error collection: {self.name}", code=11000)
+        self._docs[doc["_id"]] = doc
+        return doc["_id"]
+
+    def _upsert_base(self, query: Dict[str, Any]) -> Dict[str, Any]:
+        # Plain equality fields of the filter seed the new document
+        return {key: value for key, value in query.items()
+                if not key.startswith("$") and not (isinstance(value, dict) and any(op.startswith("$") for op in value))}
+
+    def find(self, filter: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None, **kwargs) -> MemoryCursor:
+        cursor = MemoryCursor(self, filter, projection)
+        if kwargs.get("sort"):
+            cursor.sort(kwargs["sort"])
+        return cursor
+
+    async def find_one(self, filter: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None,
+                       sort: Optional[List[Tuple[str, int]]] = None) -> Optional[Dict[str, Any]]:
+        doc = self._first(filter, sort)
+        return None if doc is None else project(doc, projection)
+
+    async def count_documents(self, filter: Dict[str, Any]) -> int:
+        return len(self._matching(filter))
+
+    async def insert_one(self, document: Dict[str, Any]) -> InsertOneResult:
+        inserted_id = self._insert(document)
+        document.setdefault("_id", inserted_id)  # as pymongo does
+        return InsertOneResult(inserted_id)
+
+    async def insert_many(self, documents: List[Dict[str, Any]], ordered: bool = True) -> List[Any]:
+        return [(await self.insert_one(document)).inserted_id for document in documents]
+
+    def _update(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool, many: bool) -> UpdateResult:
+        docs = self._matching(filter)
+        if not many:
+            docs = docs[:1]
+        for doc in docs:
+            apply_update(doc, update, inserting=False)
+        if docs or not upsert:
+            return UpdateResult(len(docs), len(docs))
+        doc = self._upsert_base(filter)
+        apply_update(doc, update, inserting=True)
+        return UpdateResult(0, 0, self._insert(doc))
+
+    async def update_one(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool = False) -> UpdateResult:
+        return self._update(filter, update, upsert, many=False)
+
+    async def update_many(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool = False) -> UpdateResult:
+        return self._update(filter, update, upsert, many=True)
+
+    def _replace(self, filter: Dict[str, Any], replacement: Dict[str, Any], upsert: bool) -> UpdateResult:
+        doc = self._first(filter)
+        if doc is not None:
+            new = copy.deepcopy(replacement)
+            new["_id"] = doc["_id"]
+            self._docs[doc["_id"]] = new
+            return UpdateResult(1, 1)
+        if not upsert:
+            return UpdateResult(0, 0)
+        return UpdateResult(0, 0, self._insert({**self._upsert_base(filter), **replacement}))
+
+    async def replace_one(self, filter: Dict[str, Any], replacement: Dict[str, Any], upsert: bool = False) -> UpdateResult:
+        return self._replace(filter, replacement, upsert)
+
+    async def find_one_and_update(self, filter: Dict[str, Any], update: Dict[str, Any],
+                                  projection: Optional[Dict[str, Any]] = None,
+                                  sort: Optional[List[Tuple[str, int]]] = None, upsert: bool = False,
+                                  return_document: bool = ReturnDocument.BEFORE) -> Optional[Dict[str, Any]]:
+        doc = self._first(filter, sort)
+        if doc is None:
+            if not upsert:
+                return None
+            doc = self._upsert_base(filter)
+            apply_update(doc, update, inserting=True)
+            doc = self._docs[self._insert(doc)]
+            return project(doc, projection) if return_document == ReturnDocument.AFTER else None
+        before = project(doc, projection)
+        apply_update(doc, update, inserting=False)
+        return project(doc, projection) if return_document == ReturnDocument.AFTER else before
+
+    async def delete_one(self, filter: Dict[str, Any]) -> DeleteResult:
+        doc = self._first(filter)
+        if doc is None:
+            return DeleteResult(0)
+        del self._docs[doc["_id"]]
+        return DeleteResult(1)
+
+    async def delete_many(self, filter: Dict[str, Any]) -> DeleteResult:
+        docs = self._matching(filter)
+        for doc in docs:
+            del self._docs[doc["_id"]]
+        return DeleteResult(len(docs))
+
+    async def bulk_write(self, requests: List[Any], ordered: bool = True) -> BulkWriteResult:
+        # pymongo's write models keep their arguments in private attributes
+        result = BulkWriteResult()
+        for request in requests:
+            kind = type(request).__name__
+            if kind == "ReplaceOne":
+                result.add(self._replace(request._filter, request._doc, request._upsert))
+            elif kind == "UpdateOne":
+                result.add(self._update(request._filter, request._doc, request._upsert, many=False))
+            elif kind == "InsertOne":
+                self._insert(request._doc)
+                result.inserted_count += 1
+            else:
+                raise OperationFailure(f"Unsupported bulk operation {kind}")
+        return result
+
+    async def create_index(self, keys: Any, **kwargs) -> str:
+        return "_".join(f"{key}_{direction}" for key, direction in _normalize_sort(keys))
+
+    def watch(self, *args, **kwargs):
+        raise OperationFailure("The $changeStream stage is only supported on replica sets")
+
+
+class MemoryDatabase:
+    def __init__(self, name: str):
+        self.name = name
+        self._collections: Dict[str, MemoryCollection] = {}
+
+    def get_collection(self, name: str) -> MemoryCollection:
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = MemoryCollection(name)
+        return collection
+
+    __getitem__ = get_collection
+
+    async def command(self, command: str, *args, **kwargs) -> Dict[str, Any]:
+        if command == "ping":
+            return {"ok": 1.0}
+        raise OperationFailure(f"Unsupported command {command}")
+
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self.get_collection(name)
+
+
+class MemoryClient:
+    """Stands in for AsyncIOMotorClient; databases live as long as the client."""
+
+    def __init__(self):
+        self._databases: Dict[str, MemoryDatabase] = {}
+
+    def get_database(self, name: str) -> MemoryDatabase:
+        database = self._databases.get(name)
+        if database is None:
+            database = self._databases[name] = MemoryDatabase(name)
+        return database
+
+    __getitem__ = get_database
+
+    @property
+    def admin(self) -> MemoryDatabase:
+        return self.get_database("admin")
+
+    def close(self) -> None:
+        pass
+
+
+def conversation_questions() -> List[Dict[str, Any]]:
+    """The wizard questions in the shape of the conversational ``questions`` collection."""
+    return [
+        {"id": i, "question": q["label"], "options": [option["label"] for option in q.get("options", [])] or ["Free text"]}
+        for i, q in enumerate(QUESTIONS, start=1)
+    ]
+
+
+def seed(database: MemoryDatabase) -> None:
+    """Documents the server expects to find in a fresh deployment."""
+    for doc in conversation_questions():
+        database.questions._insert(doc)
@@ -0,0 +1,137 @@
+"""
+MongoDB Connection Pool
+A pool listener tracking connections in use and checkout waits (behind /api/health/db and
+/metrics), plus the warm-up run at startup. Every process has its own pool, so under
+gunicorn the cluster sees up to workers x maxPoolSize connections from the app.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, Dict
+
+from pymongo import monitoring
+
+import metrics
+
+CHECKOUT_WAIT_SECONDS = metrics.REGISTRY.register(metrics.Histogram(
+    "kodex_mongo_checkout_wait_seconds", "Time spent waiting for a MongoDB connection from the pool.",
+))
+CHECKOUT_FAILED = metrics.REGISTRY.register(metrics.Counter(
+    "kodex_mongo_checkout_failed_total", "MongoDB connection checkouts that failed, by reason.", ("reason",),
+))
+
+# Share of the pool in use from which the pool counts as saturated
+SATURATED = 0.9
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """
+    Connection counts and checkout waits from PyMongo's pool events (delivered on driver threads).
+    Every checkout is pending between its start and end events, even one served at once; only
+    those beyond the free capacity of a ``max_pool_size`` pool count as waiting.
+    """
+
+    def __init__(self, max_pool_size: int, recent: int = 1000):
+        self._lock = threading.Lock()
+        self.max_pool_size = max_pool_size
+        self.open = 0
+        self.in_use = 0
+        self.pending = 0
+        self.checkouts = 0
+        self.failures: Dict[str, int] = {}
+        self.pool_clears = 0
+        self._waits: deque = deque(maxlen=recent)  # seconds, most recent checkouts
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def connection_created(self, event) -> None:
+        with self._lock:
+            self.open += 1
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def connection_closed(self, event) -> None:
+        with self._lock:
+            self.open -= 1
+
+    @property
+    def waiting(self) -> int:
+        """Pending checkouts that the pool's free connections cannot serve."""
+        return max(0, self.pending - max(0, self.max_pool_size - self.in_use))
+
+    def connection_check_out_started(self, event) -> None:
+        with self._lock:
+            self.pending += 1
+
+    def connection_check_out_failed(self, event) -> None:
+        with self._lock:
+            self.pending -= 1
+            self.failures[event.reason] = self.failures.get(event.reason, 0) + 1
+        CHECKOUT_FAILED.inc(event.reason)
+
+    def connection_checked_out(self, event) -> None:
+        with self._lock:
+            self.pending -= 1
+            self.in_use += 1
+            self.checkouts += 1
+            if event.duration is not None:
+                self._waits.append(event.duration)
+        if event.duration is not None:
+            CHECKOUT_WAIT_SECONDS.observe(event.duration)
+
+    def connection_checked_in(self, event) -> None:
+        with self._lock:
+            self.in_use -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(self._waits)
+            snapshot = {
+                "max_pool_size": self.max_pool_size,
+                "open": self.open,
+                "in_use": self.in_use,
+                "waiting": self.waiting,
+                "checkouts": self.checkouts,
+                "checkout_failures": dict(self.failures),
+                "pool_clears": self.pool_clears,
+            }
+        snapshot["saturation"] = round(snapshot["in_use"] / self.max_pool_size, 3) if self.max_pool_size else 0.0
+        snapshot["checkout_wait_ms"] = {
+            "p50": round(waits[len(waits) // 2] * 1000, 3) if waits else 0.0,
+            "p99": round(waits[min(len(waits) - 1, int(len(waits) * 0.99))] * 1000, 3) if waits else 0.0,
+            "max": round(waits[-1] * 1000, 3) if waits else 0.0,
+            "window": len(waits),
+        }
+        return snapshot
+
+
+async def ping(client: Any) -> float:
+    """Round trip of a ``ping`` command, in seconds."""
+    started = time.perf_counter()
+    await client.admin.command("ping")
+    return time.perf_counter() - started
+
+
+async def warm_up(client: Any, connections: int) -> float:
+    """
+    Open ``connections`` pooled connections before traffic arrives, with concurrent pings
+    (each holds its own connection); returns the first ping's round trip in seconds.
+    """
+    first = await ping(client)
+    if connections > 1:
+        await asyncio.gather(*(ping(client) for _ in range(connections)))
+    return first
@@ -0,0 +1,73 @@
+"""
+Local OpenAI-compatible stub for development, tests and load runs.
+Serves /v1/chat/completions with a fixed latency so the server can be exercised without a real key.
+
+Usage:
+    STUB_OPENAI_LATENCY_MS=300 uvicorn openai_stub:app --port 8099
+    OPENAI_BASE_URL=http://localhost:8099/v1 OPENAI_API_KEY=stub uvicorn server:app
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import List, Optional
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+STUB_LATENCY_MS = float(os.getenv("STUB_OPENAI_LATENCY_MS", "200"))
+
+app = FastAPI()
+
+class StubMessage(BaseModel):
+    role: str
+    content: str
+
+class StubCompletionRequest(BaseModel):
+    model: str
+    messages: List[StubMessage]
+    temperature: Optional[float] = None
+    max_tokens: Optional[int] = None
+    stream: bool = False
+
+def stub_reply(messages: List[StubMessage]) -> str:
+    prompt = messages[-1].content if messages else ""
+    # Answer-mapping prompts expect a single word
+    if "Classify it as" in prompt:
+        return "Yes"
+    return f"(stub) {prompt[-120:]}"
+
+async def stream_reply(request: StubCompletionRequest, completion_id: str, content: str):
+    # Spread the latency over the words so clients see tokens arrive
+    words = content.split(" ")
+    for i, word in enumerate(words):
+        await asyncio.sleep(STUB_LATENCY_MS / 1000 / len(words))
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": request.model,
+            "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}],
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+    yield "data: [DONE]\n\n"
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: StubCompletionRequest):
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    content = stub_reply(request.messages)
+    if request.stream:
+        return StreamingResponse(stream_reply(request, completion_id, content), media_type="text/event-stream")
+
+    await asyncio.sleep(STUB_LATENCY_MS / 1000)
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": len(content.split()), "total_tokens": len(content.split())},
+    }
@@ -0,0 +1,268 @@
+"""
+Request Profiling
+Opt-in capture of stack-sampled profiles for a fraction of requests and for every request
+slower than a threshold. Captures are JSON files in a bounded directory (oldest removed
+first) and are listed and downloaded through the admin endpoints.
+
+While a watched request runs, a background thread samples the stacks of every busy thread
+in the worker. A sample of the event loop thread belongs to a request only while its own task
+is running there. Samples of other threads (the threadpool running sync endpoints, executors)
+cannot be traced to a request, so they count as the request's only while it was the only
+request in flight; otherwise they go to the capture's ``shared_stacks``, which describe the
+whole worker during the request's window.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Innermost (file, function) pairs of a thread that is idle: event loop select, pool queue waits
+IDLE_FRAMES = frozenset({
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+})
+MAX_STACK_DEPTH = 64
+
+CAPTURE_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _idle(frame) -> bool:
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES
+
+
+def folded_stack(frame) -> str:
+    """Root-first "a;b;c" stack, the collapsed format flame graph tools read."""
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class Watch:
+    """Samples collected for one watched request (see the module docstring for the attribution)."""
+
+    __slots__ = ("task", "loop", "thread_id", "stacks", "shared_stacks", "max_in_flight")
+
+    def __init__(self, task: Optional[asyncio.Task], loop: asyncio.AbstractEventLoop):
+        self.task = task
+        self.loop = loop
+        self.thread_id = threading.get_ident()
+        self.stacks: Counter = Counter()
+        self.shared_stacks: Counter = Counter()
+        self.max_in_flight = 0
+
+
+class StackSampler:
+    """Samples all busy threads every ``interval`` seconds while at least one request is watched."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        # HTTP requests running in this worker, watched or not; kept up to date by the middleware
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._active: Dict[int, Watch] = {}
+        self._next_token = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def begin(self) -> int:
+        """Start watching the calling task; call from the event loop."""
+        watch = Watch(asyncio.current_task(), asyncio.get_running_loop())
+        with self._lock:
+            token = self._next_token
+            self._next_token += 1
+            self._active[token] = watch
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+                self._thread.start()
+        return token
+
+    def end(self, token: int) -> Watch:
+        with self._lock:
+            return self._active.pop(token)
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            in_flight = self.in_flight
+            stacks = [
+                (thread_id, folded_stack(frame))
+                for thread_id, frame in sys._current_frames().items()
+                if thread_id != own_id and not _idle(frame)
+            ]
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                for watch in self._active.values():
+                    watch.max_in_flight = max(watch.max_in_flight, in_flight)
+                    for thread_id, stack in stacks:
+                        if thread_id == watch.thread_id:
+                            # The event loop: only while this request's own task runs
+                            if asyncio.current_task(watch.loop) is watch.task:
+                                watch.stacks[stack] += 1
+                        elif in_flight <= 1:
+                            watch.stacks[stack] += 1
+                        else:
+                            watch.shared_stacks[stack] += 1
+
+
+class ProfileStore:
+    """Captures as JSON files in ``directory``, at most ``max_captures`` of them."""
+
+    def __init__(self, directory: str, max_captures: int = 100):
+        self.directory = directory
+        self.max_captures = max_captures
+        self._lock = threading.Lock()
+
+    def save(self, capture: Dict[str, Any]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"{time.time_ns():020d}-{capture['id']}.json"
+        temporary = os.path.join(self.directory, f".{name}.tmp")
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(capture, f, ensure_ascii=False)
+        os.replace(temporary, os.path.join(self.directory, name))
+
+        with self._lock:
+            names = self._names()
+            for old in names[:max(0, len(names) - self.max_captures)]:
+                try:
+                    os.remove(os.path.join(self.directory, old))
+                except FileNotFoundError:
+                    pass
+
+    def _names(self) -> List[str]:
+        try:
+            return sorted(name for name in os.listdir(self.directory) if name.endswith(".json") and not name.startswith("."))
+        except FileNotFoundError:
+            return []
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Summaries of the stored captures, newest first."""
+        summaries = []
+        for name in reversed(self._names()):
+            try:
+                with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                    capture = json.load(f)
+            except (OSError, ValueError):
+                continue  # pruned or half-written meanwhile
+            summaries.append({key: value for key, value in capture.items() if key not in ("stacks", "shared_stacks")})
+        return summaries
+
+    def path(self, capture_id: str) -> Optional[str]:
+        """File of a capture, or None if there is no such capture."""
+        if not CAPTURE_ID.match(capture_id):
+            return None
+        for name in self._names():
+            if name.endswith(f"-{capture_id}.json"):
+                return os.path.join(self.directory, name)
+        return None
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling a ``sample_rate`` fraction of HTTP requests, plus
+    every request taking ``slow_seconds`` or longer when that is set (which
+    means every request is sampled while it runs, and only slow ones are kept).
+    ``context()`` adds fields such as the active rules version to each capture.
+    """
+
+    def __init__(self, app, store: ProfileStore, sample_rate: float = 0.0, slow_seconds: Optional[float] = None,
+                 interval: float = 0.005, context: Optional[Callable[[], Dict[str, Any]]] = None,
+                 exclude_prefixes: tuple = ()):
+        self.app = app
+        self.store = store
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self.context = context
+        self.exclude_prefixes = exclude_prefixes
+        self.sampler = StackSampler(interval)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.exclude_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        self.sampler.in_flight += 1
+        try:
+            await self._watch(scope, receive, send)
+        finally:
+            self.sampler.in_flight -= 1
+
+    async def _watch(self, scope, receive, send):
+        sampled = random.random() < self.sample_rate
+        if not sampled and self.slow_seconds is None:
+            await self.app(scope, receive, send)
+            return
+
+        request_bytes = response_bytes = 0
+        status = 500
+
+        async def counting_receive():
+            nonlocal request_bytes
+            message = await receive()
+            if message["type"] == "http.request":
+                request_bytes += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal status, response_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        token = self.sampler.begin()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            duration = time.perf_counter() - started
+            watch = self.sampler.end(token)
+            slow = self.slow_seconds is not None and duration >= self.slow_seconds
+            if sampled or slow:
+                route = scope.get("route")
+                capture = {
+                    "id": uuid.uuid4().hex,
+                    "captured_at": datetime.now(timezone.utc).isoformat(),
+                    "reason": "slow" if slow else "sampled",
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": getattr(route, "path", None),
+                    "status": status,
+                    "duration_ms": round(duration * 1000, 3),
+                    "request_bytes": request_bytes,
+                    "response_bytes": response_bytes,
+                    **(self.context() if self.context else {}),
+                    "sample_interval_ms": self.sampler.interval * 1000,
+                    "concurrent_requests": watch.max_in_flight,
+                    "samples": sum(watch.stacks.values()),
+                    "shared_samples": sum(watch.shared_stacks.values()),
+                    "stacks": dict(watch.stacks.most_common()),
+                    "shared_stacks": dict(watch.shared_stacks.most_common()),
+                }
+                try:
+                    await asyncio.to_thread(self.store.save, capture)
+                except OSError as e:
+                    logger.warning("Profile capture not saved: %s", e)
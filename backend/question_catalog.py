@@ -0,0 +1,100 @@
+"""
+In-process Question Catalog
+Loads the questions collection once and keeps an immutable, versioned snapshot in memory,
+so request handlers never query MongoDB for it. The snapshot is refreshed from a change
+stream when the server supports one, otherwise by polling.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Any, Callable, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+from metrics import stage
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogSnapshot:
+    """One loaded version of the catalog: parsed models plus the pre-serialized response body."""
+
+    __slots__ = ("version", "questions", "body", "etag")
+
+    def __init__(self, version: int, questions: Tuple[Any, ...], body: bytes):
+        self.version = version
+        self.questions = questions
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+class QuestionCatalog:
+    """Shared question catalog for /api/questions and /api/conversation."""
+
+    def __init__(self, collection: Any, build: Callable[[dict], Any], poll_interval: float = 30.0, limit: int = 100):
+        self.collection = collection
+        self.build = build
+        self.poll_interval = poll_interval
+        self.limit = limit
+        self.snapshot: Optional[CatalogSnapshot] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def refresh(self) -> CatalogSnapshot:
+        """Reload from MongoDB; keeps the current snapshot if nothing changed."""
+        async with self._lock:
+            with stage("question_fetch"):
+                docs = await self.collection.find().sort("id", 1).to_list(length=self.limit)
+            questions = tuple(self.build(doc) for doc in docs)
+            body = json.dumps(jsonable_encoder(questions), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+            current = self.snapshot
+            if current is None or current.body != body:
+                version = current.version + 1 if current else 1
+                self.snapshot = CatalogSnapshot(version, questions, body)
+                logger.info("Question catalog loaded: version %d, %d questions", version, len(questions))
+            return self.snapshot
+
+    async def get(self) -> CatalogSnapshot:
+        """Current snapshot; loads it on first use if startup could not."""
+        snapshot = self.snapshot
+        if snapshot is None:
+            snapshot = await self.refresh()
+        return snapshot
+
+    async def start(self) -> None:
+        """Initial load plus the background refresh task."""
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.warning("Question catalog not loaded at startup: %s", e)
+        self._task = asyncio.create_task(self._follow_changes())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _follow_changes(self) -> None:
+        try:
+            async with self.collection.watch() as stream:
+                async for _ in stream:
+                    await self.refresh()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Standalone servers have no change streams
+            logger.info("Question catalog change stream unavailable (%s); polling every %ss", e, self.poll_interval)
+
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning("Question catalog refresh failed: %s", e)
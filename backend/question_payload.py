@@ -0,0 +1,92 @@
+"""
+Pre-encoded Question Set
+questions.QUESTIONS and WIZARD_STEPS only change with QUESTION_SET_VERSION, so the wizard
+payload is serialized and compressed once at import and served as stored bytes, with an
+ETag clients can revalidate against.
+"""
+
+import gzip
+import hashlib
+import json
+from typing import Dict, Iterable, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip covers every client
+    brotli = None
+
+from questions import QUESTIONS, QUESTION_SET_VERSION, WIZARD_STEPS
+
+# Most compact first; anything else gets the uncompressed body
+ENCODING_PREFERENCE = ("br", "gzip")
+
+
+def not_modified(if_none_match: Optional[str], etags: Iterable[str]) -> bool:
+    """True if If-None-Match names any of ``etags`` (weak comparison, ``*`` matches all)."""
+    if not if_none_match:
+        return False
+    tags = {tag.strip() for tag in if_none_match.split(",")}
+    if "*" in tags:
+        return True
+    tags = {tag[2:] if tag.startswith("W/") else tag for tag in tags}
+    return not tags.isdisjoint(etags)
+
+
+class EncodedPayload:
+    """One JSON body plus its compressed variants, each with its own strong ETag."""
+
+    __slots__ = ("version", "bodies", "etags")
+
+    def __init__(self, version: str, body: bytes):
+        self.version = version
+        self.bodies: Dict[str, bytes] = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.bodies["br"] = brotli.compress(body, quality=11)
+
+        # Strong validators differ per content-coding; all share the version and content hash
+        tag = f"{version}-{hashlib.sha256(body).hexdigest()[:16]}"
+        self.etags = {
+            encoding: f'"{tag}"' if encoding == "identity" else f'"{tag}-{encoding}"'
+            for encoding in self.bodies
+        }
+
+    def negotiate(self, accept_encoding: Optional[str]) -> str:
+        """Best content-coding this payload has for an Accept-Encoding header."""
+        if not accept_encoding:
+            return "identity"
+        weights: Dict[str, float] = {}
+        for item in accept_encoding.split(","):
+            name, _, params = item.strip().partition(";")
+            q = 1.0
+            params = params.strip()
+            if params.startswith("q="):
+                try:
+                    q = float(params[2:])
+                except ValueError:
+                    q = 0.0
+            weights[name.strip().lower()] = q
+
+        for encoding in ENCODING_PREFERENCE:
+            if encoding in self.bodies and weights.get(encoding, weights.get("*", 0.0)) > 0:
+                return encoding
+        return "identity"
+
+    def not_modified(self, if_none_match: Optional[str]) -> bool:
+        """True if If-None-Match names any representation of this payload (weak comparison)."""
+        return not_modified(if_none_match, self.etags.values())
+
+    def select(self, accept_encoding: Optional[str]) -> Tuple[str, bytes, str]:
+        """(content-coding, body, etag) to send."""
+        encoding = self.negotiate(accept_encoding)
+        return encoding, self.bodies[encoding], self.etags[encoding]
+
+
+def build_question_payload() -> EncodedPayload:
+    body = json.dumps(
+        {"version": QUESTION_SET_VERSION, "questions": QUESTIONS, "wizard_steps": WIZARD_STEPS},
+        ensure_ascii=False, separators=(",", ":"),
+    ).encode("utf-8")
+    return EncodedPayload(QUESTION_SET_VERSION, body)
+
+
+question_payload = build_question_payload()
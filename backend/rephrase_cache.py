@@ -0,0 +1,91 @@
+"""
+Rephrased-question Cache
+The "asking" completion is a function of the prompt and model settings only, so its output is
+cached in process and in MongoDB and shared by all users and workers.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def rephrase_key(messages: List[Dict[str, str]], **settings: Any) -> str:
+    """Cache key over the prompt messages (question text, greeting) and model settings."""
+    payload = json.dumps({"messages": messages, "settings": settings}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RephraseCache:
+    """Two-level cache: bounded in-process LRU in front of a MongoDB collection."""
+
+    def __init__(self, collection: Any, max_cached: int = 1000):
+        self.collection = collection
+        self.max_cached = max_cached
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[str]:
+        text = self._memory.get(key)
+        if text is not None:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return text
+
+        try:
+            doc = await self.collection.find_one({"_id": key})
+        except Exception as e:
+            logger.warning("Rephrase cache lookup failed: %s", e)
+            doc = None
+        if doc is None:
+            self.misses += 1
+            return None
+
+        self._remember(key, doc["text"])
+        self.hits += 1
+        return doc["text"]
+
+    async def put(self, key: str, text: str, **fields: Any) -> None:
+        self._remember(key, text)
+        try:
+            await self.collection.update_one(
+                {"_id": key},
+                {"$setOnInsert": {"text": text, "created_at": datetime.now(timezone.utc), **fields}},
+                upsert=True,
+            )
+        except Exception as e:
+            logger.warning("Rephrase cache write failed: %s", e)
+
+    async def get_or_create(self, key: str, produce: Callable[[], Awaitable[str]], **fields: Any) -> str:
+        """Cached text, or ``produce()`` once for all concurrent callers of the same key."""
+        text = await self.get(key)
+        if text is not None:
+            return text
+
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._produce(key, produce, fields))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def _produce(self, key: str, produce: Callable[[], Awaitable[str]], fields: Dict[str, Any]) -> str:
+        text = await produce()
+        await self.put(key, text, **fields)
+        return text
+
+    def _remember(self, key: str, text: str) -> None:
+        self._memory[key] = text
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_cached:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {"cached": len(self._memory), "hits": self.hits, "misses": self.misses}
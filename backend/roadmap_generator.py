@@ -3,7 +3,11 @@ Roadmap Generator for AI Act Compliance
 Generates SMB-executable tasks with concrete deliverables.
 """
 
-from typing import Dict, Any, List
+import heapq
+import itertools
+import sys
+from types import MappingProxyType
+from typing import Dict, Any, FrozenSet, List, Mapping, NamedTuple, Tuple
 
 TASK_TEMPLATES = {
     # GOVERNANCE BASICS
@@ -356,63 +360,184 @@ DEPENDENCIES = {
     "transparency_explainability": ["transparency_disclosure"]
 }
 
+# Context-specific tasks: (question, answers that trigger it, task id)
+CONTEXT_TRIGGERS = [
+    ("q5_data_types", ["personal_nonsensitive", "sensitive"], "data_lawful_basis"),
+    ("q1_company_role", ["integrator"], "vendor_inventory"),
+    ("q9_behavior", ["generates_content"], "transparency_disclosure"),
+]
+
+# Answers that get_applicable_tasks reads besides the bucket
+CONTEXT_QUESTIONS = [question_id for question_id, _, _ in CONTEXT_TRIGGERS]
+
+PRIORITY_ORDER = {"P0": 0, "P1": 1, "P2": 2}
+
+
+class TaskTemplate(NamedTuple):
+    """The fields of a task template that planning reads, in compact form."""
+    id: str
+    theme: str
+    priority: str
+    applicable_buckets: FrozenSet[str]
+
+
+def compact_task(task: Dict) -> TaskTemplate:
+    return TaskTemplate(sys.intern(task["id"]), sys.intern(task["theme"]), sys.intern(task["priority"]),
+                        frozenset(sys.intern(bucket) for bucket in task["applicable_buckets"]))
+
+
+# Planning reads these; TASK_TEMPLATES stays the source of the task dicts callers get
+TASKS = {task_id: compact_task(task) for task_id, task in TASK_TEMPLATES.items()}
+
+# CONTEXT_TRIGGERS with the trigger answers as frozensets
+_TRIGGERS = tuple((question_id, frozenset(values), task_id) for question_id, values, task_id in CONTEXT_TRIGGERS)
+
+
+def _fires(answer: Any, values: FrozenSet[str]) -> bool:
+    try:
+        return answer in values
+    except TypeError:
+        # Unhashable answer (e.g. a list) never equals a trigger value
+        return False
+
+
+def validate_dependencies(templates: Dict[str, Dict], dependencies: Dict[str, List[str]]) -> None:
+    """Raise ValueError unless every dependency names a known task and there are no cycles."""
+    for task_id, required in dependencies.items():
+        for dependency in [task_id] + list(required):
+            if dependency not in templates:
+                raise ValueError(f"Dependency graph references unknown task '{dependency}'")
+
+    visiting, done = set(), set()
+
+    def visit(task_id: str, path: List[str]) -> None:
+        if task_id in done:
+            return
+        if task_id in visiting:
+            cycle = path[path.index(task_id):] + [task_id]
+            raise ValueError(f"Dependency cycle: {' -> '.join(cycle)}")
+        visiting.add(task_id)
+        for dependency in dependencies.get(task_id, []):
+            visit(dependency, path + [task_id])
+        visiting.discard(task_id)
+        done.add(task_id)
+
+    for task_id in dependencies:
+        visit(task_id, [])
+
+
+def build_bucket_index(tasks: Dict[str, TaskTemplate]) -> Dict[str, List[str]]:
+    """Task ids per bucket, in template order."""
+    index: Dict[str, List[str]] = {}
+    for task_id, task in tasks.items():
+        for bucket in task.applicable_buckets:
+            index.setdefault(bucket, []).append(task_id)
+    return index
+
+
+validate_dependencies(TASK_TEMPLATES, DEPENDENCIES)
+BUCKET_TASKS = build_bucket_index(TASKS)
+
 
 def get_applicable_tasks(bucket: str, answers: Dict[str, Any]) -> List[str]:
     """Determine which tasks apply based on classification and answers."""
-    applicable = []
-    
-    for task_id, task in TASK_TEMPLATES.items():
-        if bucket in task["applicable_buckets"]:
-            applicable.append(task_id)
+    applicable = list(BUCKET_TASKS.get(bucket, []))
     
     # Add context-specific tasks
-    if answers.get("q5_data_types") in ["personal_nonsensitive", "sensitive"]:
-        if "data_lawful_basis" not in applicable:
-            applicable.append("data_lawful_basis")
-    
-    if answers.get("q1_company_role") == "integrator":
-        if "vendor_inventory" not in applicable:
-            applicable.append("vendor_inventory")
-    
-    if answers.get("q9_behavior") == "generates_content":
-        if "transparency_disclosure" not in applicable:
-            applicable.append("transparency_disclosure")
+    for question_id, values, task_id in _TRIGGERS:
+        if _fires(answers.get(question_id), values) and task_id not in applicable:
+            applicable.append(task_id)
     
     return applicable
 
 
+def task_sort_key(task: Dict, bucket: str):
+    """Priority of a task within the given bucket (lower comes first)."""
+    template = TASKS.get(task["id"]) or compact_task(task)
+    # High-risk gets documentation tasks prioritized
+    if bucket == "High-risk" and template.theme == "Documentation":
+        return (PRIORITY_ORDER.get(template.priority, 3) - 0.5, template.theme)
+    # Prohibited needs immediate governance
+    if bucket == "Prohibited" and template.theme == "Governance basics":
+        return (PRIORITY_ORDER.get(template.priority, 3) - 1, template.theme)
+    return (PRIORITY_ORDER.get(template.priority, 3), template.theme)
+
+
 def prioritize_tasks(tasks: List[Dict], bucket: str) -> List[Dict]:
-    """Sort tasks by priority and importance for the given bucket."""
-    priority_order = {"P0": 0, "P1": 1, "P2": 2}
+    """
+    Sort tasks by priority and importance for the given bucket.
+    A task never comes before a dependency that is also in the list.
+    """
+    positions = {task["id"]: i for i, task in enumerate(tasks)}
+    keys = [task_sort_key(task, bucket) for task in tasks]
+    waiting_on = [0] * len(tasks)
+    dependents: Dict[int, List[int]] = {}
     
-    def sort_key(task):
-        # High-risk gets documentation tasks prioritized
-        if bucket == "High-risk" and task["theme"] == "Documentation":
-            return (priority_order.get(task["priority"], 3) - 0.5, task["theme"])
-        # Prohibited needs immediate governance
-        if bucket == "Prohibited" and task["theme"] == "Governance basics":
-            return (priority_order.get(task["priority"], 3) - 1, task["theme"])
-        return (priority_order.get(task["priority"], 3), task["theme"])
+    for i, task in enumerate(tasks):
+        for dependency in DEPENDENCIES.get(task["id"], []):
+            if dependency in positions:
+                waiting_on[i] += 1
+                dependents.setdefault(positions[dependency], []).append(i)
     
-    return sorted(tasks, key=sort_key)
+    # Kahn's algorithm, always taking the highest-priority ready task (ties keep input order)
+    ready = [(keys[i], i) for i in range(len(tasks)) if waiting_on[i] == 0]
+    heapq.heapify(ready)
+    ordered = []
+    while ready:
+        _, i = heapq.heappop(ready)
+        ordered.append(tasks[i])
+        for dependent in dependents.get(i, []):
+            waiting_on[dependent] -= 1
+            if waiting_on[dependent] == 0:
+                heapq.heappush(ready, (keys[dependent], dependent))
+    
+    return ordered
 
 
-def generate_roadmap(classification: Dict[str, Any], answers: Dict[str, Any]) -> List[Dict[str, Any]]:
-    """Generate prioritized compliance roadmap based on classification."""
-    bucket = classification.get("bucket", "Minimal risk")
-    
-    # Get applicable task IDs
-    applicable_ids = get_applicable_tasks(bucket, answers)
-    
-    # Build task list with dependencies
+def _freeze(value: Any) -> Any:
+    """Read-only deep copy: dicts become mapping proxies, lists tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    """Mutable deep copy of a _freeze result."""
+    if isinstance(value, Mapping):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+
+class RoadmapPlan:
+    """
+    Immutable, shared roadmap for one bucket and context signature. ``tasks`` are deep-frozen,
+    since every request with the same signature reads them; ``task_dicts()`` gives a caller
+    its own copies.
+    """
+
+    __slots__ = ("bucket", "task_ids", "tasks")
+
+    def __init__(self, bucket: str, task_ids: Tuple[str, ...], tasks: Tuple[Mapping[str, Any], ...]):
+        self.bucket = bucket
+        self.task_ids = task_ids
+        self.tasks = tasks
+
+    def task_dicts(self) -> List[Dict[str, Any]]:
+        return [_thaw(task) for task in self.tasks]
+
+
+def build_plan(bucket: str, answers: Dict[str, Any]) -> RoadmapPlan:
+    """Build the prioritized plan for a bucket and the context answers."""
     tasks = []
-    for task_id in applicable_ids:
-        if task_id in TASK_TEMPLATES:
-            task = TASK_TEMPLATES[task_id].copy()
-            task["dependencies"] = DEPENDENCIES.get(task_id, [])
-            tasks.append(task)
+    for task_id in get_applicable_tasks(bucket, answers):
+        task = TASK_TEMPLATES[task_id].copy()
+        task["dependencies"] = DEPENDENCIES.get(task_id, [])
+        tasks.append(task)
     
-    # Prioritize
     prioritized = prioritize_tasks(tasks, bucket)
     
     # Mark top 5
@@ -420,4 +545,36 @@ def generate_roadmap(classification: Dict[str, Any], answers: Dict[str, Any]) ->
         task["is_top_5"] = i < 5
         task["order"] = i + 1
     
-    return prioritized
+    return RoadmapPlan(bucket, tuple(task["id"] for task in prioritized), tuple(_freeze(task) for task in prioritized))
+
+
+def plan_signature(bucket: str, answers: Dict[str, Any]) -> Tuple:
+    """Everything a plan depends on: the bucket and which context triggers fire."""
+    try:
+        return (bucket,) + tuple(answers.get(question_id) in values for question_id, values, _ in _TRIGGERS)
+    except TypeError:
+        return (bucket,) + tuple(_fires(answers.get(question_id), values) for question_id, values, _ in _TRIGGERS)
+
+
+# Plans for every known bucket and trigger combination, built once at import
+_plans: Dict[Tuple, RoadmapPlan] = {}
+for _bucket in BUCKET_TASKS:
+    for _fired in itertools.product((False, True), repeat=len(CONTEXT_TRIGGERS)):
+        _context = {question_id: values[0] for (question_id, values, _), fired in zip(CONTEXT_TRIGGERS, _fired) if fired}
+        _plans[(_bucket,) + _fired] = build_plan(_bucket, _context)
+
+
+def get_plan(bucket: str, answers: Dict[str, Any]) -> RoadmapPlan:
+    """Shared precomputed plan; buckets without templates are built on demand."""
+    plan = _plans.get(plan_signature(bucket, answers))
+    if plan is None:
+        plan = build_plan(bucket, answers)
+    return plan
+
+
+def generate_roadmap(classification: Dict[str, Any], answers: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Generate prioritized compliance roadmap based on classification."""
+    bucket = classification.get("bucket", "Minimal risk")
+    
+    # Callers get their own task dicts, nested lists included; the plan itself stays shared
+    return get_plan(bucket, answers).task_dicts()
@@ -0,0 +1,290 @@
+"""
+Rule Packs
+Rule sets loaded at runtime from a JSON/YAML file or a MongoDB collection, validated against
+questions.QUESTIONS and swapped into the rules engine without a restart. Requests that already
+hold the previous compiled rule set finish on it.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+try:
+    import yaml
+except ImportError:  # YAML packs are optional
+    yaml = None
+
+from questions import QUESTIONS
+from rules_engine import (
+    RULES, RULES_VERSION, UNCERTAINTY_QUESTIONS, CompiledRules, compile_rules, get_compiled_rules,
+    get_rules_version, install_rules, register_rules,
+)
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = ("Prohibited", "High-risk", "Limited risk", "Minimal risk")
+
+# Rules may only test single-choice questions, against their declared option values
+QUESTION_OPTIONS = {
+    q["id"]: {o["value"] for o in q["options"]}
+    for q in QUESTIONS if q["type"] == "single"
+}
+
+BUILT_IN_PACK = {"version": RULES_VERSION, "rules": RULES, "uncertainty_questions": UNCERTAINTY_QUESTIONS}
+
+
+class RulePackError(ValueError):
+    """A rule pack that cannot be read or does not validate."""
+
+
+def validate_rule_pack(pack: Any) -> Dict[str, Any]:
+    """
+    Check a rule pack and return its normalized form:
+    {"version": str, "rules": [...], "uncertainty_questions": [...]}.
+    Raises RulePackError listing every problem found.
+    """
+    if not isinstance(pack, dict):
+        raise RulePackError("Rule pack must be an object")
+
+    errors: List[str] = []
+    version = pack.get("version")
+    if not isinstance(version, str) or not version:
+        errors.append("'version' must be a non-empty string")
+
+    uncertainty_questions = pack.get("uncertainty_questions", UNCERTAINTY_QUESTIONS)
+    if not isinstance(uncertainty_questions, list):
+        errors.append("'uncertainty_questions' must be a list")
+        uncertainty_questions = []
+    for question_id in uncertainty_questions:
+        if not isinstance(question_id, str) or question_id not in QUESTION_OPTIONS:
+            errors.append(f"Unknown uncertainty question '{question_id}'")
+
+    rules = pack.get("rules")
+    if not isinstance(rules, list) or not rules:
+        errors.append("'rules' must be a non-empty list")
+        rules = []
+
+    seen_ids = set()
+    for position, rule in enumerate(rules):
+        where = f"rules[{position}]"
+        if not isinstance(rule, dict):
+            errors.append(f"{where} must be an object")
+            continue
+        rule_id = rule.get("id")
+        if not isinstance(rule_id, str) or not rule_id:
+            errors.append(f"{where}: 'id' must be a non-empty string")
+        elif rule_id in seen_ids:
+            errors.append(f"{where}: duplicate rule id '{rule_id}'")
+        else:
+            seen_ids.add(rule_id)
+            where = f"rule {rule_id}"
+        priority = rule.get("priority")
+        if not isinstance(priority, int) or isinstance(priority, bool):
+            errors.append(f"{where}: 'priority' must be an integer")
+        for field in ("name", "reason"):
+            if not isinstance(rule.get(field), str):
+                errors.append(f"{where}: '{field}' must be a string")
+        if rule.get("bucket") not in BUCKETS:
+            errors.append(f"{where}: 'bucket' must be one of {', '.join(BUCKETS)}")
+
+        conditions = rule.get("conditions")
+        if not isinstance(conditions, list) or not conditions:
+            errors.append(f"{where}: 'conditions' must be a non-empty list")
+            continue
+        for condition in conditions:
+            if not isinstance(condition, dict):
+                errors.append(f"{where}: every condition must be an object")
+                continue
+            question_id = condition.get("question")
+            if not isinstance(question_id, str) or question_id not in QUESTION_OPTIONS:
+                errors.append(f"{where}: unknown question '{question_id}'")
+                continue
+            values = condition.get("values")
+            if not isinstance(values, list) or not values:
+                errors.append(f"{where}: condition on {question_id} needs a non-empty 'values' list")
+                continue
+            for value in values:
+                if not isinstance(value, str) or value not in QUESTION_OPTIONS[question_id]:
+                    errors.append(f"{where}: '{value}' is not an option of {question_id}")
+
+    if errors:
+        raise RulePackError("; ".join(errors))
+
+    return {
+        "version": version,
+        "rules": [
+            {
+                "id": rule["id"],
+                "priority": rule["priority"],
+                "name": rule["name"],
+                "bucket": rule["bucket"],
+                "conditions": [{"question": c["question"], "values": list(c["values"])} for c in rule["conditions"]],
+                "reason": rule["reason"],
+            }
+            for rule in rules
+        ],
+        "uncertainty_questions": list(uncertainty_questions),
+    }
+
+
+def compile_rule_pack(pack: Any) -> CompiledRules:
+    """Validate and compile a rule pack without installing it."""
+    pack = validate_rule_pack(pack)
+    return compile_rules(pack["rules"], pack["version"], pack["uncertainty_questions"])
+
+
+def read_rule_pack_file(path: str) -> Dict[str, Any]:
+    """Parse a .json, .yaml or .yml rule pack file."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+    except OSError as e:
+        raise RulePackError(f"Cannot read rule pack {path}: {e}")
+
+    if path.endswith((".yaml", ".yml")):
+        if yaml is None:
+            raise RulePackError("YAML rule packs need PyYAML installed")
+        try:
+            return yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            raise RulePackError(f"Cannot parse rule pack {path}: {e}")
+
+    try:
+        return json.loads(text)
+    except ValueError as e:
+        raise RulePackError(f"Cannot parse rule pack {path}: {e}")
+
+
+class RulePackLoader:
+    """
+    Keeps the engine on the newest rule pack.
+
+    Sources, in order of precedence: the active pack in MongoDB
+    (``{"active": true}``, newest ``created_at`` first), then the pack file,
+    then the built-in RULES. A pack is only installed if it compiles to a
+    different rule set; an invalid pack is logged and the current rules stay.
+    """
+
+    def __init__(self, collection: Any = None, path: Optional[str] = None, poll_interval: float = 30.0):
+        self.collection = collection
+        self.path = path
+        self.poll_interval = poll_interval
+        self.source = "built-in"
+        self.loaded_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self._file_mtime: Optional[float] = None
+        self._install_lock = threading.Lock()
+        self._reload_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def install(self, pack: Any, source: str) -> CompiledRules:
+        """Validate, compile and atomically swap in a pack; returns the rule set now in use."""
+        compiled = compile_rule_pack(pack)
+        with self._install_lock:
+            current = get_compiled_rules()
+            if compiled.digest == current.digest:
+                self.source = source
+                return current
+            try:
+                compiled = install_rules(compiled)
+            except ValueError as e:
+                raise RulePackError(str(e))
+            self.source = source
+            self.loaded_at = datetime.now(timezone.utc)
+        logger.info("Rules %s installed from %s (%d rules)", compiled.version, source, len(compiled.rules))
+        return compiled
+
+    async def get_version(self, version: str) -> Optional[CompiledRules]:
+        """
+        A rule set by version: one compiled earlier, or any pack in MongoDB
+        with that version (active or not). Loaded versions are kept for reuse.
+        """
+        compiled = get_rules_version(version)
+        if compiled is None and self.collection is not None:
+            doc = await self.collection.find_one({"version": version}, sort=[("created_at", -1)])
+            if doc is not None:
+                try:
+                    compiled = register_rules(compile_rule_pack(doc))
+                except ValueError as e:
+                    raise RulePackError(str(e))
+        return compiled
+
+    async def _read_pack(self) -> Optional[tuple]:
+        """(pack, source) to install, or None to keep the current rules."""
+        mongo_failed = False
+        if self.collection is not None:
+            try:
+                doc = await self.collection.find_one({"active": True}, sort=[("created_at", -1)])
+            except Exception as e:
+                logger.warning("Rule pack collection unavailable: %s", e)
+                doc, mongo_failed = None, True
+            if doc is not None:
+                return doc, f"mongodb:{doc.get('_id')}"
+            if mongo_failed and self.source.startswith("mongodb:"):
+                # Keep the pack we have rather than falling back while MongoDB is down
+                return None
+
+        if self.path:
+            mtime = os.path.getmtime(self.path)
+            if mtime == self._file_mtime and self.source == f"file:{self.path}":
+                return None
+            pack = await asyncio.to_thread(read_rule_pack_file, self.path)
+            self._file_mtime = mtime
+            return pack, f"file:{self.path}"
+
+        if self.source != "built-in" and not mongo_failed:
+            return BUILT_IN_PACK, "built-in"
+        return None
+
+    async def reload(self) -> CompiledRules:
+        """Check all sources now; raises RulePackError for an invalid pack."""
+        async with self._reload_lock:
+            try:
+                found = await self._read_pack()
+                compiled = get_compiled_rules() if found is None else self.install(*found)
+            except (RulePackError, OSError) as e:
+                self.last_error = str(e)
+                raise
+            self.last_error = None
+            return compiled
+
+    async def start(self) -> None:
+        """Initial load plus the background poll task."""
+        try:
+            await self.reload()
+        except Exception as e:
+            logger.error("Rule pack not loaded at startup, keeping %s: %s", get_compiled_rules().version, e)
+        if self.poll_interval > 0 and (self.collection is not None or self.path):
+            self._task = asyncio.create_task(self._poll_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _poll_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.reload()
+            except Exception as e:
+                logger.warning("Rule pack reload failed: %s", e)
+
+    def status(self) -> Dict[str, Any]:
+        compiled = get_compiled_rules()
+        return {
+            "version": compiled.version,
+            "digest": compiled.digest,
+            "rule_count": len(compiled.rules),
+            "source": self.source,
+            "loaded_at": self.loaded_at,
+            "last_error": self.last_error,
+        }
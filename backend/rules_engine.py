@@ -3,7 +3,14 @@ Deterministic Rules Engine for AI Act Classification
 All rules are transparent, auditable, and conservative.
 """
 
-from typing import Dict, Any, List
+import hashlib
+import json
+import sys
+from typing import Dict, Any, FrozenSet, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from questions import QUESTIONS
 
 RULES_VERSION = "1.0.0"
 
@@ -173,7 +180,6 @@ UNCERTAINTY_QUESTIONS = ["q4_decision_impact", "q5_data_types", "q6_biometric",
 def evaluate_rule(rule: Dict, answers: Dict[str, Any]) -> Dict[str, Any]:
     """Evaluate a single rule against answers."""
     conditions_met = 0
-    conditions_total = len(rule["conditions"])
     uncertain = False
     
     for condition in rule["conditions"]:
@@ -190,6 +196,12 @@ def evaluate_rule(rule: Dict, answers: Dict[str, Any]) -> Dict[str, Any]:
         elif answer == "not_sure":
             uncertain = True
     
+    return evaluate_rule_state(rule, conditions_met, uncertain)
+
+
+def evaluate_rule_state(rule: Dict, conditions_met: int, uncertain: bool) -> Dict[str, Any]:
+    """Build a rule trace entry from the number of met conditions and the uncertainty flag."""
+    conditions_total = len(rule["conditions"])
     fired = conditions_met == conditions_total and not uncertain
     partial = conditions_met > 0 and conditions_met < conditions_total
     
@@ -204,12 +216,510 @@ def evaluate_rule(rule: Dict, answers: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
-def classify_assessment(answers: Dict[str, Any]) -> Dict[str, Any]:
+class Condition(NamedTuple):
+    """Compact, immutable form of a rule condition."""
+    question: str
+    values: FrozenSet[Any]
+
+
+class Rule(NamedTuple):
+    """Compact, immutable form of a rule; the engine reads these instead of the RULES dicts."""
+    id: str
+    priority: int
+    name: str
+    bucket: str
+    conditions: Tuple[Condition, ...]
+    reason: str
+
+
+def compact_rule(rule: Dict) -> Rule:
+    """Rule struct for a rule dict, with interned ids so equal ids share one string."""
+    return Rule(
+        sys.intern(rule["id"]),
+        rule["priority"],
+        rule["name"],
+        sys.intern(rule["bucket"]),
+        tuple(Condition(sys.intern(c["question"]), frozenset(c["values"])) for c in rule["conditions"]),
+        rule["reason"],
+    )
+
+
+# Rules with identical content are shared by every compiled version that uses them,
+# together with their compact form and trace templates: a new version only allocates
+# the rules it changed
+_shared_rules: Dict[str, Tuple[Dict, Rule, Tuple[Dict[str, Any], ...]]] = {}
+
+
+def _rule_key(rule: Dict) -> str:
+    return json.dumps(rule, sort_keys=True, default=str)
+
+
+def share_rule(rule: Dict) -> Dict:
+    """The shared instance of a rule with this content, creating it (and its trace templates) if new."""
+    key = _rule_key(rule)
+    shared = _shared_rules.get(key)
+    if shared is None:
+        # A trace entry only depends on (conditions_met, uncertain), so build
+        # every possible entry up front, indexed by conditions_met * 2 + uncertain
+        templates = tuple(
+            evaluate_rule_state(rule, conditions_met, bool(is_uncertain))
+            for conditions_met in range(len(rule["conditions"]) + 1)
+            for is_uncertain in (0, 1)
+        )
+        shared = _shared_rules.setdefault(key, (rule, compact_rule(rule), templates))
+    return shared[0]
+
+
+class CompiledRules:
+    """
+    Bitmask form of a rule list, built once by ``compile_rules``.
+
+    ``rules`` keeps the rule dicts for callers; ``compact_rules`` holds the
+    same rules, in the same order, as Rule structs for the engine itself.
+
+    Every condition of every rule gets one bit. For each question we keep
+    the bits of all conditions on it and, per accepted value, the bits of the
+    conditions that value satisfies, so evaluating the whole rule set is a
+    handful of ORs per question followed by one AND per rule.
+    """
+
+    __slots__ = ("version", "digest", "rules", "compact_rules", "rule_masks", "condition_counts",
+                 "question_masks", "value_masks", "question_rules",
+                 "uncertainty_questions", "trace_templates", "_batch_tables")
+
+    def __init__(self, rules: List[Dict], version: str, uncertainty_questions: List[str]):
+        # Stable sort keeps declaration order within a priority, as before
+        self.rules = tuple(sorted((share_rule(rule) for rule in rules), key=lambda r: r["priority"]))
+        self.compact_rules = tuple(_shared_rules[_rule_key(rule)][1] for rule in self.rules)
+        self.version = version
+        self.uncertainty_questions = frozenset(uncertainty_questions)
+        # Identifies the rule set itself, whatever its version says
+        self.digest = hashlib.sha256(json.dumps(
+            {"version": version, "rules": self.rules, "uncertainty_questions": sorted(self.uncertainty_questions)},
+            sort_keys=True, default=str,
+        ).encode("utf-8")).hexdigest()
+        self.rule_masks = []
+        self.condition_counts = []
+        self.question_masks: Dict[str, int] = {}
+        self.value_masks: Dict[str, Dict[Any, int]] = {}
+
+        bit = 0
+        for rule in self.compact_rules:
+            mask = 0
+            for condition in rule.conditions:
+                condition_bit = 1 << bit
+                bit += 1
+                mask |= condition_bit
+                question_id = condition.question
+                self.question_masks[question_id] = self.question_masks.get(question_id, 0) | condition_bit
+                per_value = self.value_masks.setdefault(question_id, {})
+                # Sorted so the masks (and batch vocabularies) do not depend on set iteration order
+                for value in sorted(condition.values, key=str):
+                    per_value[value] = per_value.get(value, 0) | condition_bit
+            self.rule_masks.append(mask)
+            self.condition_counts.append(len(rule.conditions))
+
+        self.rule_masks = tuple(self.rule_masks)
+        self.condition_counts = tuple(self.condition_counts)
+
+        # Inverted index: question -> indexes of the rules with a condition on it
+        self.question_rules: Dict[str, Tuple[int, ...]] = {
+            question_id: tuple(i for i, mask in enumerate(self.rule_masks) if mask & question_mask)
+            for question_id, question_mask in self.question_masks.items()
+        }
+        self._batch_tables = None
+
+        self.trace_templates = tuple(_shared_rules[_rule_key(rule)][2] for rule in self.rules)
+
+    def condition_bits(self, answers: Dict[str, Any]) -> Tuple[int, int]:
+        """Return (met, uncertain) condition bitmasks for a set of answers."""
+        met = 0
+        uncertain = 0
+
+        # Inlined form of question_bits: this is the hot path of classify_assessment
+        for question_id, question_mask in self.question_masks.items():
+            answer = answers.get(question_id)
+
+            if answer is None:
+                uncertain |= question_mask
+                continue
+
+            per_value = self.value_masks[question_id]
+            try:
+                hit = per_value.get(answer, 0)
+            except TypeError:
+                # Unhashable answer (e.g. a list): fall back to equality checks
+                hit = 0
+                for value, value_bits in per_value.items():
+                    if answer == value:
+                        hit |= value_bits
+
+            met |= hit
+            if answer == "not_sure":
+                uncertain |= question_mask & ~hit
+
+        return met, uncertain
+
+    def question_bits(self, question_id: str, answer: Any) -> Tuple[int, int]:
+        """(met, uncertain) bits of the conditions on one question; None means unanswered."""
+        question_mask = self.question_masks.get(question_id, 0)
+        if not question_mask:
+            return 0, 0
+        if answer is None:
+            return 0, question_mask
+
+        per_value = self.value_masks[question_id]
+        try:
+            hit = per_value.get(answer, 0)
+        except TypeError:
+            hit = 0
+            for value, value_bits in per_value.items():
+                if answer == value:
+                    hit |= value_bits
+
+        if answer == "not_sure":
+            return hit, question_mask & ~hit
+        return hit, 0
+
+    def rule_state(self, rule_index: int, met: int, uncertain: int) -> int:
+        """Index into ``trace_templates[rule_index]`` for the given condition bits."""
+        mask = self.rule_masks[rule_index]
+        return (met & mask).bit_count() * 2 + bool(uncertain & mask)
+
+    def evaluate(self, answers: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Evaluate every rule in priority order; same entries as ``evaluate_rule``."""
+        met, uncertain = self.condition_bits(answers)
+        return [
+            templates[(met & mask).bit_count() * 2 + bool(uncertain & mask)].copy()
+            for templates, mask in zip(self.trace_templates, self.rule_masks)
+        ]
+
+    def _get_batch_tables(self) -> Dict[str, Any]:
+        """Lookup tables for ``evaluate_many``, built on first use."""
+        if self._batch_tables is not None:
+            return self._batch_tables
+
+        # Answer codes per question: 0 = missing, 1 = unknown value, 2.. = known values
+        option_values = {q["id"]: [o["value"] for o in q.get("options", [])] for q in QUESTIONS}
+        columns = list(self.question_masks)
+        vocabularies = []
+        for question_id in columns:
+            codes = {}
+            for value in option_values.get(question_id, []) + ["not_sure"] + list(self.value_masks[question_id]):
+                codes.setdefault(value, len(codes) + 2)
+            vocabularies.append(codes)
+
+        condition_count = sum(self.condition_counts)
+        width = max(len(codes) for codes in vocabularies) + 2 if vocabularies else 2
+        accepts = np.zeros((condition_count, width), dtype=bool)
+        condition_columns = np.zeros(condition_count, dtype=np.intp)
+        not_sure_codes = np.zeros(condition_count, dtype=np.intp)
+        incidence = np.zeros((condition_count, len(self.rules)), dtype=np.int32)
+
+        bit = 0
+        for rule_index, rule in enumerate(self.compact_rules):
+            for condition in rule.conditions:
+                column = columns.index(condition.question)
+                codes = vocabularies[column]
+                for value in condition.values:
+                    accepts[bit, codes[value]] = True
+                condition_columns[bit] = column
+                not_sure_codes[bit] = codes["not_sure"]
+                incidence[bit, rule_index] = 1
+                bit += 1
+
+        self._batch_tables = {
+            "columns": columns,
+            "vocabularies": vocabularies,
+            "accepts": accepts,
+            "condition_columns": condition_columns,
+            "not_sure_codes": not_sure_codes,
+            "incidence": incidence,
+            "condition_counts": np.array(self.condition_counts, dtype=np.int32),
+        }
+        return self._batch_tables
+
+    def encode_many(self, answers_list: List[Dict[str, Any]]) -> np.ndarray:
+        """Encode answer dicts as a (rows x rule questions) matrix of answer codes."""
+        tables = self._get_batch_tables()
+        lookups = list(zip(tables["columns"], tables["vocabularies"]))
+        rows = []
+
+        for answers in answers_list:
+            row = []
+            for question_id, codes in lookups:
+                answer = answers.get(question_id)
+                if answer is None:
+                    row.append(0)
+                    continue
+                try:
+                    row.append(codes.get(answer, 1))
+                except TypeError:
+                    row.append(1)
+            rows.append(row)
+
+        return np.array(rows, dtype=np.intp).reshape(len(rows), len(lookups))
+
+    def evaluate_states(self, answers_list: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        Vectorized rule evaluation over many answer sets.
+        Returns a (rows x rules) matrix of ``trace_templates`` indexes.
+        """
+        return self.evaluate_codes(self.encode_many(answers_list))
+
+    def evaluate_codes(self, answer_codes: np.ndarray) -> np.ndarray:
+        """``evaluate_states`` on an answer-code matrix from ``encode_many``."""
+        tables = self._get_batch_tables()
+
+        # rows x conditions
+        condition_codes = answer_codes[:, tables["condition_columns"]]
+        met = tables["accepts"][np.arange(len(tables["condition_columns"])), condition_codes]
+        uncertain = (condition_codes == 0) | ((condition_codes == tables["not_sure_codes"]) & ~met)
+
+        # rows x rules
+        met_counts = met.astype(np.int32) @ tables["incidence"]
+        rule_uncertain = (uncertain.astype(np.int32) @ tables["incidence"]) > 0
+        return met_counts * 2 + rule_uncertain
+
+    def rule_outcomes(self, states: np.ndarray) -> Tuple[List[int], List[bool]]:
+        """
+        Per row of an ``evaluate_states`` matrix: the index of the winning rule
+        (the first fired one, rules being in priority order; -1 if none fired)
+        and whether any rule is partial or uncertain without firing.
+        """
+        totals = np.array(self.condition_counts, dtype=np.int64)
+        met, uncertain = states // 2, (states % 2).astype(bool)
+        fired = (met == totals) & ~uncertain
+        partial = ~fired & (((met > 0) & (met < totals)) | uncertain)
+        winning = np.where(fired.any(axis=1), fired.argmax(axis=1), -1)
+        return winning.tolist(), partial.any(axis=1).tolist()
+
+    def evaluate_many(self, answers_list: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Vectorized ``evaluate`` over many answer sets; one trace per input row."""
+        if not answers_list:
+            return []
+
+        templates = self.trace_templates
+        return [
+            [rule_templates[state].copy() for rule_templates, state in zip(templates, row)]
+            for row in self.evaluate_states(answers_list).tolist()
+        ]
+
+
+def compile_rules(rules: List[Dict], version: str = RULES_VERSION,
+                  uncertainty_questions: List[str] = UNCERTAINTY_QUESTIONS) -> CompiledRules:
+    """Compile a rule list into its bitmask form."""
+    return CompiledRules(rules, version, uncertainty_questions)
+
+
+# Every rule set that was compiled for use, by version; older versions stay
+# available for historical re-scoring
+_rule_versions: Dict[str, CompiledRules] = {}
+
+
+def register_rules(compiled: CompiledRules, replace: bool = False) -> CompiledRules:
+    """
+    Keep ``compiled`` available by version. Registering the same version again
+    returns the existing rule set; different rules under a known version raise
+    ValueError unless ``replace`` is set.
+    """
+    existing = _rule_versions.get(compiled.version)
+    if existing is not None and not replace:
+        if existing.digest != compiled.digest:
+            raise ValueError(f"Rules version {compiled.version} is already registered with different rules")
+        return existing
+    _rule_versions[compiled.version] = compiled
+    return compiled
+
+
+def get_rules_version(version: str) -> Optional[CompiledRules]:
+    """A registered rule set by version, or None."""
+    return _rule_versions.get(version)
+
+
+def rules_versions() -> List[str]:
+    """Registered rule versions, in registration order."""
+    return list(_rule_versions)
+
+
+_compiled_rules = register_rules(compile_rules(RULES))
+
+
+def reload_rules() -> CompiledRules:
+    """Recompile the module-level RULES, e.g. after they were edited in place."""
+    return install_rules(register_rules(compile_rules(RULES, RULES_VERSION, UNCERTAINTY_QUESTIONS), replace=True))
+
+
+def install_rules(compiled: CompiledRules) -> CompiledRules:
+    """
+    Make ``compiled`` the rule set used from now on (registering it if needed).
+    The swap is a single reference assignment: calls that already picked up
+    the previous rule set finish on it.
+    """
+    global _compiled_rules
+    compiled = register_rules(compiled)
+    _compiled_rules = compiled
+    return compiled
+
+
+def get_compiled_rules() -> CompiledRules:
+    """Return the rule set currently used by ``classify_assessment``."""
+    return _compiled_rules
+
+
+def classify_assessment(answers: Dict[str, Any], compiled: Optional[CompiledRules] = None) -> Dict[str, Any]:
     """
     Run deterministic classification rules against assessment answers.
     Returns classification with full transparency.
     """
-    rule_trace = []
+    compiled = compiled or _compiled_rules
+    return build_classification(compiled, answers, compiled.evaluate(answers))
+
+
+def classify_many(answers_list: List[Dict[str, Any]], compiled: Optional[CompiledRules] = None) -> List[Dict[str, Any]]:
+    """
+    Classify many assessments at once.
+    Rules are evaluated for all rows together; each result equals classify_assessment(answers).
+    """
+    compiled = compiled or _compiled_rules
+    traces = compiled.evaluate_many(answers_list)
+    return [build_classification(compiled, answers, trace) for answers, trace in zip(answers_list, traces)]
+
+
+def buckets_many(answers_list: List[Dict[str, Any]], compiled: Optional[CompiledRules] = None) -> List[Tuple[str, str]]:
+    """
+    (bucket, confidence) for many assessments, without building the full results.
+    Each pair equals the bucket and confidence of classify_assessment(answers).
+    """
+    compiled = compiled or _compiled_rules
+    if not answers_list:
+        return []
+
+    winning, any_partial = compiled.rule_outcomes(compiled.evaluate_states(answers_list))
+    outcomes = []
+    for answers, rule_index, has_partial in zip(answers_list, winning, any_partial):
+        not_sure = [qid for qid, answer in answers.items() if answer == "not_sure"]
+        critical_count = sum(1 for qid in not_sure if qid in compiled.uncertainty_questions)
+        winning_rule = compiled.compact_rules[rule_index] if rule_index >= 0 else None
+        outcomes.append(decide_bucket(winning_rule, has_partial, critical_count, len(not_sure)))
+    return outcomes
+
+
+class ClassificationState:
+    """
+    A classification together with the condition bits it was computed from,
+    so a single changed answer can be applied without re-evaluating every rule.
+    States are shared and must not be mutated; ``reclassify`` returns a new one.
+    """
+
+    __slots__ = ("compiled", "answers", "met", "uncertain", "rule_states", "result")
+
+    def __init__(self, compiled: CompiledRules, answers: Dict[str, Any], met: int, uncertain: int,
+                 rule_states: Tuple[int, ...], result: Dict[str, Any]):
+        self.compiled = compiled
+        self.answers = answers
+        self.met = met
+        self.uncertain = uncertain
+        self.rule_states = rule_states
+        self.result = result
+
+
+def classify_state(answers: Dict[str, Any]) -> ClassificationState:
+    """classify_assessment, keeping what ``reclassify`` needs."""
+    compiled = _compiled_rules
+    answers = dict(answers)
+    met, uncertain = compiled.condition_bits(answers)
+    rule_states = tuple(compiled.rule_state(i, met, uncertain) for i in range(len(compiled.rules)))
+    rule_trace = [templates[state].copy() for templates, state in zip(compiled.trace_templates, rule_states)]
+    result = build_classification(compiled, answers, rule_trace)
+    return ClassificationState(compiled, answers, met, uncertain, rule_states, result)
+
+
+def reclassify(state: ClassificationState, question_id: str, answer: Any) -> Tuple[ClassificationState, Dict[str, Any]]:
+    """
+    Apply one changed answer (None removes it) to a previous classification.
+    Only the rules that reference ``question_id`` are re-evaluated. Returns the
+    new state and a diff against the previous result; the new result equals
+    classify_assessment on the updated answers.
+    """
+    compiled = state.compiled
+    answers = dict(state.answers)
+    if answer is None:
+        answers.pop(question_id, None)
+    else:
+        answers[question_id] = answer
+
+    old_met, old_uncertain = compiled.question_bits(question_id, state.answers.get(question_id))
+    new_met, new_uncertain = compiled.question_bits(question_id, answer)
+    met = state.met & ~old_met | new_met
+    uncertain = state.uncertain & ~old_uncertain | new_uncertain
+
+    # Unchanged trace entries are shared with the previous result
+    rule_states = list(state.rule_states)
+    rule_trace = list(state.result["rule_trace"])
+    changed_rules = []
+    for i in compiled.question_rules.get(question_id, ()):
+        rule_state = compiled.rule_state(i, met, uncertain)
+        if rule_state != rule_states[i]:
+            rule_states[i] = rule_state
+            rule_trace[i] = compiled.trace_templates[i][rule_state].copy()
+            changed_rules.append(i)
+
+    result = build_classification(compiled, answers, rule_trace)
+    new_state = ClassificationState(compiled, answers, met, uncertain, tuple(rule_states), result)
+    return new_state, classification_diff(state.result, result, changed_rules)
+
+
+def classification_diff(before: Dict[str, Any], after: Dict[str, Any], rule_indexes: List[int]) -> Dict[str, Any]:
+    """What changed between two classification results; ``rule_indexes`` are the rules whose trace changed."""
+    return {
+        "bucket": {"before": before["bucket"], "after": after["bucket"]},
+        "confidence": {"before": before["confidence"], "after": after["confidence"]},
+        "changed_fields": [field for field in after if field != "rule_trace" and after[field] != before.get(field)],
+        "rules": [
+            {"ruleId": after["rule_trace"][i]["ruleId"], "before": before["rule_trace"][i], "after": after["rule_trace"][i]}
+            for i in rule_indexes
+        ],
+    }
+
+
+# Texts used by build_classification and generate_summary
+DOMAIN_ASSUMPTIONS = {
+    "general_productivity": "General productivity domain",
+    "hiring_hr": "HR/Hiring domain",
+    "finance": "Finance domain",
+    "healthcare": "Healthcare domain",
+    "education": "Education domain",
+    "public_sector": "Public sector domain"
+}
+
+ROLE_ASSUMPTIONS = {
+    "developer": "You develop the AI system (provider obligations may apply)",
+    "integrator": "You integrate third-party AI (deployer obligations may apply)",
+    "internal_user": "You use AI internally (user obligations may apply)"
+}
+
+# (label, why it matters, follow-up question) for uncertain answers
+MISSING_INFO_LABELS = {
+    "q4_decision_impact": ("Impact on individuals", "This determines whether high-risk obligations apply", "Does this AI make decisions that significantly affect individuals' lives?"),
+    "q5_data_types": ("Data sensitivity", "Sensitive data triggers additional requirements", "What types of personal data does the system process?"),
+    "q6_biometric": ("Biometric data use", "Biometric processing is heavily regulated", "Does the system identify or categorize people using biometrics?"),
+    "q7_safety_critical": ("Safety-critical context", "Safety-critical use cases are high-risk by default", "Is this AI used in contexts where failure could cause harm?"),
+    "q8_human_oversight": ("Human oversight level", "Lack of oversight increases risk classification", "Is there human review before AI-driven actions take effect?")
+}
+
+SUMMARY_DOMAINS = {
+    "general_productivity": "general productivity",
+    "hiring_hr": "HR and hiring",
+    "finance": "finance",
+    "healthcare": "healthcare",
+    "education": "education",
+    "public_sector": "public sector"
+}
+
+
+def build_classification(compiled: CompiledRules, answers: Dict[str, Any], rule_trace: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Turn an evaluated rule trace into the full classification result."""
     decisive_factors = []
     assumptions = []
     missing_info = []
@@ -222,96 +732,47 @@ def classify_assessment(answers: Dict[str, Any]) -> Dict[str, Any]:
     for qid, answer in answers.items():
         if answer == "not_sure":
             not_sure_count += 1
-            if qid in UNCERTAINTY_QUESTIONS:
+            if qid in compiled.uncertainty_questions:
                 critical_not_sure.append(qid)
     
-    # Evaluate all rules
-    fired_rules = []
-    partial_rules = []
+    # Rules are in priority order, so the first one that fired wins
+    winning_rule = None
+    has_partial = False
     
-    for rule in sorted(RULES, key=lambda r: r["priority"]):
-        result = evaluate_rule(rule, answers)
-        rule_trace.append(result)
-        
+    for rule, result in zip(compiled.compact_rules, rule_trace):
         if result["fired"]:
-            fired_rules.append(rule)
+            if winning_rule is None:
+                winning_rule = rule
         elif result["partial"] or result["uncertain"]:
-            partial_rules.append(rule)
+            has_partial = True
     
-    # Determine bucket based on fired rules (highest priority wins)
-    bucket = "Minimal risk"  # Default
-    confidence = "High"
-    winning_rule = None
-    
-    if fired_rules:
-        winning_rule = min(fired_rules, key=lambda r: r["priority"])
-        bucket = winning_rule["bucket"]
-    
-    # Check if we should demote to "Needs clarification"
-    needs_clarification = False
-    
-    if len(critical_not_sure) >= 2:
-        needs_clarification = True
-    elif len(critical_not_sure) == 1 and bucket in ["High-risk", "Prohibited"]:
-        # If classification is severe but uncertainty exists, flag it
-        confidence = "Low"
-        needs_clarification = True
-    elif partial_rules and not fired_rules:
-        # No clear match, partial matches exist
-        confidence = "Medium"
-        if not_sure_count >= 2:
-            needs_clarification = True
-    
-    if needs_clarification:
-        bucket = "Needs clarification"
-        confidence = "Low"
+    bucket, confidence = decide_bucket(winning_rule, has_partial, len(critical_not_sure), not_sure_count)
     
     # Build decisive factors
     if winning_rule:
-        for condition in winning_rule["conditions"]:
-            qid = condition["question"]
+        for condition in winning_rule.conditions:
+            qid = condition.question
             answer = answers.get(qid, "not provided")
             decisive_factors.append({
                 "questionId": qid,
                 "answer": answer,
-                "reason": f"Answer '{answer}' matched condition for {winning_rule['name']}",
-                "ruleId": winning_rule["id"]
+                "reason": f"Answer '{answer}' matched condition for {winning_rule.name}",
+                "ruleId": winning_rule.id
             })
     
     # Build assumptions
     if answers.get("q3_domain"):
-        domain_labels = {
-            "general_productivity": "General productivity domain",
-            "hiring_hr": "HR/Hiring domain",
-            "finance": "Finance domain",
-            "healthcare": "Healthcare domain",
-            "education": "Education domain",
-            "public_sector": "Public sector domain"
-        }
-        assumptions.append(f"Domain: {domain_labels.get(answers['q3_domain'], answers['q3_domain'])}")
+        assumptions.append(f"Domain: {DOMAIN_ASSUMPTIONS.get(answers['q3_domain'], answers['q3_domain'])}")
     
     if answers.get("q1_company_role"):
-        role_labels = {
-            "developer": "You develop the AI system (provider obligations may apply)",
-            "integrator": "You integrate third-party AI (deployer obligations may apply)",
-            "internal_user": "You use AI internally (user obligations may apply)"
-        }
-        assumptions.append(role_labels.get(answers["q1_company_role"], "Role not specified"))
+        assumptions.append(ROLE_ASSUMPTIONS.get(answers["q1_company_role"], "Role not specified"))
     
     assumptions.append("Classification based on answers provided; actual classification may differ with more context")
     
     # Build missing info
-    question_labels = {
-        "q4_decision_impact": ("Impact on individuals", "This determines whether high-risk obligations apply", "Does this AI make decisions that significantly affect individuals' lives?"),
-        "q5_data_types": ("Data sensitivity", "Sensitive data triggers additional requirements", "What types of personal data does the system process?"),
-        "q6_biometric": ("Biometric data use", "Biometric processing is heavily regulated", "Does the system identify or categorize people using biometrics?"),
-        "q7_safety_critical": ("Safety-critical context", "Safety-critical use cases are high-risk by default", "Is this AI used in contexts where failure could cause harm?"),
-        "q8_human_oversight": ("Human oversight level", "Lack of oversight increases risk classification", "Is there human review before AI-driven actions take effect?")
-    }
-    
     for qid in critical_not_sure:
-        if qid in question_labels:
-            label, why, followup = question_labels[qid]
+        if qid in MISSING_INFO_LABELS:
+            label, why, followup = MISSING_INFO_LABELS[qid]
             missing_info.append({
                 "questionId": qid,
                 "label": label,
@@ -347,19 +808,123 @@ def classify_assessment(answers: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
-def generate_summary(bucket: str, confidence: str, winning_rule: Dict, answers: Dict, uncertain_questions: List) -> str:
+def decide_bucket(winning_rule: Optional[Rule], has_partial: bool, critical_not_sure_count: int, not_sure_count: int) -> Tuple[str, str]:
+    """Bucket and confidence from the winning rule (if any) and the "not sure" counts."""
+    bucket = "Minimal risk"  # Default
+    confidence = "High"
+    
+    if winning_rule:
+        bucket = winning_rule.bucket
+    
+    # Check if we should demote to "Needs clarification"
+    needs_clarification = False
+    
+    if critical_not_sure_count >= 2:
+        needs_clarification = True
+    elif critical_not_sure_count == 1 and bucket in ["High-risk", "Prohibited"]:
+        # If classification is severe but uncertainty exists, flag it
+        confidence = "Low"
+        needs_clarification = True
+    elif has_partial and not winning_rule:
+        # No clear match, partial matches exist
+        confidence = "Medium"
+        if not_sure_count >= 2:
+            needs_clarification = True
+    
+    if needs_clarification:
+        bucket = "Needs clarification"
+        confidence = "Low"
+    
+    return bucket, confidence
+
+
+def sensitivity_many(answers_list: List[Dict[str, Any]], compiled: Optional[CompiledRules] = None) -> List[Dict[str, Any]]:
+    """
+    For each answer set, which alternative option of each single-choice question
+    would change the bucket. All single-answer perturbations of all answer sets
+    are evaluated in one vectorized pass.
+    """
+    compiled = compiled or _compiled_rules
+    alternatives = [
+        (q["id"], [o["value"] for o in q["options"]])
+        for q in QUESTIONS if q["type"] == "single"
+    ]
+
+    # Perturbations of questions no rule reads keep the base row's rule states;
+    # the others become rows of a code matrix derived from the encoded base rows
+    tables = compiled._get_batch_tables()
+    columns = {question_id: i for i, question_id in enumerate(tables["columns"])}
+    base_codes = compiled.encode_many(answers_list)
+    source_rows, changed_columns, changed_codes = [], [], []
+    plans = []
+    for index, answers in enumerate(answers_list):
+        perturbations = []
+        for question_id, values in alternatives:
+            current = answers.get(question_id)
+            column = columns.get(question_id)
+            for value in values:
+                if value == current:
+                    continue
+                row = -1
+                if column is not None:
+                    row = len(source_rows)
+                    source_rows.append(index)
+                    changed_columns.append(column)
+                    changed_codes.append(tables["vocabularies"][column].get(value, 1))
+                perturbations.append((question_id, current, value, row))
+        plans.append((answers, index, perturbations))
+
+    if not plans:
+        return []
+
+    perturbed_codes = base_codes[source_rows]
+    perturbed_codes[np.arange(len(source_rows)), changed_columns] = changed_codes
+    states = compiled.evaluate_codes(np.concatenate([base_codes, perturbed_codes]))
+    offset = len(answers_list)
+
+    winning, any_partial = compiled.rule_outcomes(states)
+
+    def outcome(row: int, critical_count: int, not_sure_count: int) -> Tuple[str, str]:
+        winning_rule = compiled.compact_rules[winning[row]] if winning[row] >= 0 else None
+        return decide_bucket(winning_rule, any_partial[row], critical_count, not_sure_count)
+
+    results = []
+    for answers, base_row, perturbations in plans:
+        not_sure = [qid for qid, answer in answers.items() if answer == "not_sure"]
+        not_sure_count = len(not_sure)
+        critical_count = sum(1 for qid in not_sure if qid in compiled.uncertainty_questions)
+        bucket, confidence = outcome(base_row, critical_count, not_sure_count)
+
+        questions = {}
+        for question_id, current, value, row in perturbations:
+            delta = (value == "not_sure") - (current == "not_sure")
+            critical_delta = delta if question_id in compiled.uncertainty_questions else 0
+            new_bucket, new_confidence = outcome(base_row if row < 0 else offset + row,
+                                                 critical_count + critical_delta, not_sure_count + delta)
+            entry = questions.setdefault(question_id, {"questionId": question_id, "answer": current, "flips": []})
+            if new_bucket != bucket:
+                entry["flips"].append({"value": value, "bucket": new_bucket, "confidence": new_confidence})
+
+        results.append({
+            "bucket": bucket,
+            "confidence": confidence,
+            "perturbations": len(perturbations),
+            "sensitive_questions": [qid for qid, entry in questions.items() if entry["flips"]],
+            "questions": list(questions.values()),
+        })
+    return results
+
+
+def sensitivity(answers: Dict[str, Any], compiled: Optional[CompiledRules] = None) -> Dict[str, Any]:
+    """sensitivity_many for a single answer set."""
+    return sensitivity_many([answers], compiled)[0]
+
+
+def generate_summary(bucket: str, confidence: str, winning_rule: Optional[Rule], answers: Dict, uncertain_questions: List) -> str:
     """Generate a plain-language summary of the classification."""
     
     domain = answers.get("q3_domain", "your domain")
-    domain_labels = {
-        "general_productivity": "general productivity",
-        "hiring_hr": "HR and hiring",
-        "finance": "finance",
-        "healthcare": "healthcare",
-        "education": "education",
-        "public_sector": "public sector"
-    }
-    domain_text = domain_labels.get(domain, domain)
+    domain_text = SUMMARY_DOMAINS.get(domain, domain)
     
     if bucket == "Prohibited":
         return f"Based on your inputs, this AI system may fall under prohibited practices in the EU AI Act. Prohibited systems cannot be placed on the EU market. This classification is driven by the combination of {domain_text} use case and the nature of decisions being made. Consult legal counsel immediately before proceeding."
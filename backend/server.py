@@ -1,13 +1,41 @@
 # --- FINAL, CORRECTED server.py ---
 # --- This version fixes the "NotImplementedError" ---
 
+import asyncio
+import logging
 import os
+import secrets
+import tempfile
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+import httpx
 import motor.motor_asyncio
+from pymongo.errors import ConnectionFailure
 from pydantic import BaseModel
-from typing import List
+from typing import Any, Dict, List, Optional
+
+from rules_engine import CompiledRules, classify_many, get_compiled_rules, rules_versions, sensitivity, sensitivity_many
+from rule_packs import RulePackError, RulePackLoader
+from rescore import rescore_assessments
+from bulk_ingest import BulkIngestion, open_rows
+from jobs import JOB_KINDS, JobFailed, JobRunner, MemoryJobStore, MongoJobStore, assessment_handlers, job_view
+from fast_json import FastJSONResponse
+import fast_json
+import metrics
+from profiling import ProfileStore, ProfilingMiddleware
+from assessment_cache import cache_stats, cached_classify, cached_reclassify
+from classification_table import load_table
+from question_catalog import QuestionCatalog
+from question_payload import not_modified, question_payload
+from conversation_sessions import SessionStore, StaleSessionError
+import answer_mapper
+import memory_db
+import mongo_pool
+from rephrase_cache import RephraseCache, rephrase_key
 
 # --- Pydantic Models (data shapes) ---
 class ChatMessage(BaseModel):
@@ -33,20 +61,243 @@ class ConversationResponse(BaseModel):
     updated_state: ConversationState
     is_complete: bool
 
+class SessionTurnRequest(BaseModel):
+    message: Optional[str] = None
+    revision: int  # last revision the client saw
+
+class SessionTurnResponse(BaseModel):
+    session_id: str
+    revision: int
+    ai_message: str
+    new_answers: List[AnsweredQuestion]
+    current_question_index: int
+    is_complete: bool
+
+class SessionStateResponse(BaseModel):
+    session_id: str
+    revision: int
+    state: ConversationState
+
+class DecisiveFactor(BaseModel):
+    questionId: str
+    answer: Any
+    reason: str
+    ruleId: str
+
+class RuleTraceEntry(BaseModel):
+    ruleId: str
+    fired: bool
+    partial: bool
+    uncertain: bool
+    conditions_met: int
+    conditions_total: int
+    note: str
+
+class MissingInfo(BaseModel):
+    questionId: str
+    label: str
+    whyItMatters: str
+    followUpQuestion: str
+
+class Classification(BaseModel):
+    bucket: str
+    confidence: str
+    decisive_factors: List[DecisiveFactor]
+    assumptions: List[str]
+    missing_info: List[MissingInfo]
+    what_changes_outcome: List[str]
+    plain_language_summary: str
+    rule_trace: List[RuleTraceEntry]
+
+class ClassifyRequest(BaseModel):
+    answers_json: Dict[str, Any]
+    rules_version: Optional[str] = None  # default: the rules currently loaded
+
+class RescoreRequest(BaseModel):
+    rules_version: str
+    baseline_version: Optional[str] = None  # default: compare with the stored classification
+    project_id: Optional[str] = None
+    batch_size: int = 1000
+    include_changes: bool = True
+
+class JobRequest(BaseModel):
+    kind: str
+    params: Dict[str, Any]
+
+class ReclassifyRequest(BaseModel):
+    answers_json: Dict[str, Any]
+    question_id: str
+    answer: Optional[Any] = None
+
+class ReclassifyResponse(BaseModel):
+    classification: Classification
+    diff: Dict[str, Any]
+
+class ClassifyBatchRequest(BaseModel):
+    answers_list: List[Dict[str, Any]]
+
+class ClassifyBatchResponse(BaseModel):
+    rules_version: str
+    count: int
+    results: List[Dict[str, Any]]
+
 # --- Environment and Database Setup ---
 load_dotenv()
-MONGODB_URI = os.getenv("MONGODB_URI")
+MONGODB_URI = os.getenv("MONGODB_URI")  # "memory://" runs on an in-process stand-in
+# Per process: with gunicorn, MongoDB sees up to workers x MONGODB_MAX_POOL_SIZE connections. Motor runs
+# operations on a thread pool (MOTOR_MAX_WORKERS, default 5 per CPU), which also caps connections in use.
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "5"))
+MONGODB_MAX_IDLE_MS = int(os.getenv("MONGODB_MAX_IDLE_MS", "300000"))
+MONGODB_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", "2000"))  # fail fast when the pool is exhausted
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGODB_CONNECT_TIMEOUT_MS = int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "5000"))
+MONGODB_SOCKET_TIMEOUT_MS = int(os.getenv("MONGODB_SOCKET_TIMEOUT_MS", "0")) or None  # 0: no timeout
+MONGODB_WARM_CONNECTIONS = int(os.getenv("MONGODB_WARM_CONNECTIONS", str(MONGODB_MIN_POOL_SIZE)))
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")  # e.g. a local OpenAI-compatible stub
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "200"))
+OPENAI_MAPPING_TIMEOUT = float(os.getenv("OPENAI_MAPPING_TIMEOUT", "10"))
+OPENAI_ASKING_TIMEOUT = float(os.getenv("OPENAI_ASKING_TIMEOUT", "30"))
+CLASSIFY_BATCH_MAX = int(os.getenv("CLASSIFY_BATCH_MAX", "50000"))
+QUESTION_CATALOG_POLL_SECONDS = float(os.getenv("QUESTION_CATALOG_POLL_SECONDS", "30"))
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+SESSION_FLUSH_SECONDS = float(os.getenv("SESSION_FLUSH_SECONDS", "0.5"))
+REPHRASE_CACHE_SIZE = int(os.getenv("REPHRASE_CACHE_SIZE", "1000"))
+QUESTION_SET_MAX_AGE = int(os.getenv("QUESTION_SET_MAX_AGE", "86400"))
+REPHRASE_WARM_ON_STARTUP = os.getenv("REPHRASE_WARM_ON_STARTUP", "").lower() in ("1", "true", "yes")
+RULE_PACK_PATH = os.getenv("RULE_PACK_PATH")  # optional .json/.yaml rule pack
+RULE_PACK_POLL_SECONDS = float(os.getenv("RULE_PACK_POLL_SECONDS", "30"))
+BULK_CHUNK_ROWS = int(os.getenv("BULK_CHUNK_ROWS", "1000"))
+BULK_MAX_BYTES = int(os.getenv("BULK_MAX_BYTES", str(1024 * 1024 * 1024)))
+JOB_STORE = os.getenv("JOB_STORE", "mongo")  # "mongo" or "memory"
+JOB_WORKER_PROCESSES = int(os.getenv("JOB_WORKER_PROCESSES", str(min(4, os.cpu_count() or 1))))
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "2"))
+JOB_CHUNK_SIZE = int(os.getenv("JOB_CHUNK_SIZE", "1000"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")  # enables the admin endpoints (X-Admin-Token header)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # fraction of requests profiled
+PROFILE_SLOW_MS = os.getenv("PROFILE_SLOW_MS")  # also keep a profile of every request at least this slow
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "kodex-profiles"))
+PROFILE_MAX_CAPTURES = int(os.getenv("PROFILE_MAX_CAPTURES", "100"))
+
+logger = logging.getLogger(__name__)
 
 # Initialize clients
-db_client = motor.motor_asyncio.AsyncIOMotorClient(MONGODB_URI)
-db = db_client.get_database("kodexcompliance_db") # Using your correct DB name
+mongo_pool_monitor = mongo_pool.PoolMonitor(MONGODB_MAX_POOL_SIZE)
+if MONGODB_URI == memory_db.MEMORY_URI:
+    # In-process stand-in for benchmarks and load runs; nothing is persisted
+    db_client = memory_db.MemoryClient()
+    db = db_client.get_database("kodexcompliance_db")
+    memory_db.seed(db)
+else:
+    # connect=False: nothing is opened until the lifespan warm-up, so each (forked) worker gets its own pool
+    db_client = motor.motor_asyncio.AsyncIOMotorClient(
+        MONGODB_URI,
+        maxPoolSize=MONGODB_MAX_POOL_SIZE,
+        minPoolSize=MONGODB_MIN_POOL_SIZE,
+        maxIdleTimeMS=MONGODB_MAX_IDLE_MS,
+        waitQueueTimeoutMS=MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+        serverSelectionTimeoutMS=MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        connectTimeoutMS=MONGODB_CONNECT_TIMEOUT_MS,
+        socketTimeoutMS=MONGODB_SOCKET_TIMEOUT_MS,
+        event_listeners=[mongo_pool_monitor],
+        connect=False,
+    )
+    db = db_client.get_database("kodexcompliance_db") # Using your correct DB name
+
+# Questions are read from memory; the catalog follows changes to the collection
+question_catalog = QuestionCatalog(db.questions, lambda doc: Question(**doc), poll_interval=QUESTION_CATALOG_POLL_SECONDS)
+rephrase_cache = RephraseCache(db.rephrased_questions, max_cached=REPHRASE_CACHE_SIZE)
+conversation_sessions = SessionStore(db.conversation_sessions, lambda doc: ConversationState(**doc),
+                                     max_cached=SESSION_CACHE_SIZE, flush_interval=SESSION_FLUSH_SECONDS)
+# Rules can be swapped at runtime from a pack file or the rule_packs collection
+rule_pack_loader = RulePackLoader(db.rule_packs, RULE_PACK_PATH, poll_interval=RULE_PACK_POLL_SECONDS)
+
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+# One pooled async client per worker; calls beyond OPENAI_MAX_CONCURRENCY wait for a slot
+openai_client = AsyncOpenAI(
+    api_key=OPENAI_API_KEY,
+    base_url=OPENAI_BASE_URL,
+    http_client=DefaultAsyncHttpxClient(
+        limits=httpx.Limits(max_connections=OPENAI_MAX_CONNECTIONS, max_keepalive_connections=OPENAI_MAX_CONNECTIONS),
+        timeout=httpx.Timeout(OPENAI_ASKING_TIMEOUT, connect=5.0),
+    ),
+) if OPENAI_API_KEY else None
+openai_semaphore = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+
+async def create_chat_completion(timeout: float, **kwargs):
+    """Chat completion on the shared client, bounded by the concurrency limit."""
+    async with openai_semaphore:
+        completion = await openai_client.chat.completions.create(timeout=timeout, **kwargs)
+    metrics.record_llm_usage(kwargs["model"], completion.usage)
+    return completion
+
+async def stream_chat_completion(timeout: float, **kwargs):
+    """Streamed chat completion yielding text deltas; holds a concurrency slot until done."""
+    async with openai_semaphore:
+        stream = await openai_client.chat.completions.create(
+            timeout=timeout, stream=True, stream_options={"include_usage": True}, **kwargs
+        )
+        try:
+            async for chunk in stream:
+                # The last chunk carries the token usage and no choices
+                if chunk.usage is not None:
+                    metrics.record_llm_usage(kwargs["model"], chunk.usage)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await stream.close()
+
+# Heavy batch work runs as background jobs in a process pool
+async def job_rules(version: Optional[str]) -> CompiledRules:
+    compiled = get_compiled_rules() if version is None else await rule_pack_loader.get_version(version)
+    if compiled is None:
+        raise JobFailed(f"Unknown rules version: {version}")
+    return compiled
 
-from openai import OpenAI
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
+job_store = MemoryJobStore() if JOB_STORE == "memory" else MongoJobStore(db.jobs, db.job_results, db.job_inputs)
+job_runner = JobRunner(job_store, assessment_handlers(db, job_rules, chunk_size=JOB_CHUNK_SIZE),
+                       processes=JOB_WORKER_PROCESSES, concurrency=JOB_CONCURRENCY, lease_seconds=JOB_LEASE_SECONDS,
+                       input_chunk_size=JOB_CHUNK_SIZE)
+
+# Precomputed results for complete answer sets (built by classification_table.py); optional
+classification_table = load_table()
 
 # --- FastAPI App ---
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await connect_database()
+    await rule_pack_loader.start()
+    await question_catalog.start()
+    await conversation_sessions.start()
+    await job_runner.start()
+    warm_task = asyncio.create_task(warm_rephrase_cache()) if REPHRASE_WARM_ON_STARTUP else None
+    yield
+    if warm_task is not None:
+        warm_task.cancel()
+    await job_runner.stop()
+    await conversation_sessions.stop()
+    await question_catalog.stop()
+    await rule_pack_loader.stop()
+    if openai_client is not None:
+        await openai_client.close()
+    # Last, after the session store's final flush
+    db_client.close()
+
+async def connect_database() -> None:
+    """Connect and open MONGODB_WARM_CONNECTIONS pooled connections; the app still starts if MongoDB is down."""
+    try:
+        latency = await mongo_pool.warm_up(db_client, MONGODB_WARM_CONNECTIONS)
+    except Exception as e:
+        logger.warning("MongoDB not reachable at startup: %s", e)
+        return
+    logger.info("MongoDB connected (ping %.1f ms, %d connections warmed)", latency * 1000, MONGODB_WARM_CONNECTIONS)
+
+app = FastAPI(lifespan=lifespan)
 
 # --- CORS Middleware (Allows frontend to talk to backend) ---
 origins = [
@@ -61,23 +312,106 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- Request Profiling (opt-in; captures listed under /api/profiles) ---
+profile_store = ProfileStore(PROFILE_DIR, max_captures=PROFILE_MAX_CAPTURES)
+if PROFILE_SAMPLE_RATE > 0 or PROFILE_SLOW_MS:
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=profile_store,
+        sample_rate=PROFILE_SAMPLE_RATE,
+        slow_seconds=float(PROFILE_SLOW_MS) / 1000 if PROFILE_SLOW_MS else None,
+        interval=PROFILE_INTERVAL_MS / 1000,
+        context=lambda: {"rules_version": get_compiled_rules().version},
+        exclude_prefixes=("/api/profiles", "/metrics"),
+    )
+
+# --- Metrics (Prometheus text format on /metrics) ---
+# Added last, so it is the outermost middleware and times the whole request
+app.add_middleware(metrics.MetricsMiddleware)
+
+def stats_samples():
+    """Existing in-process counters, read when /metrics is scraped."""
+    for cache, stats in cache_stats().items():
+        yield "kodex_cache_hits_total", "counter", "Cache hits.", {"cache": cache}, stats["hits"]
+        yield "kodex_cache_misses_total", "counter", "Cache misses.", {"cache": cache}, stats["misses"]
+        yield "kodex_cache_entries", "gauge", "Entries currently cached.", {"cache": cache}, stats["size"]
+    rephrase = rephrase_cache.stats()
+    yield "kodex_cache_hits_total", "counter", "Cache hits.", {"cache": "rephrase"}, rephrase["hits"]
+    yield "kodex_cache_misses_total", "counter", "Cache misses.", {"cache": "rephrase"}, rephrase["misses"]
+    yield "kodex_cache_entries", "gauge", "Entries currently cached.", {"cache": "rephrase"}, rephrase["cached"]
+    mapping = answer_mapper.stats.snapshot()
+    yield "kodex_answer_mappings_total", "counter", "Conversation replies mapped to an answer.", {"via": "local"}, mapping["resolved_locally"]
+    yield "kodex_answer_mappings_total", "counter", "Conversation replies mapped to an answer.", {"via": "model"}, mapping["sent_to_model"]
+    yield "kodex_sessions_cached", "gauge", "Conversation sessions held in memory.", {}, conversation_sessions.stats()["cached"]
+    pool = mongo_pool_monitor.snapshot()
+    for state in ("open", "in_use", "waiting"):
+        yield "kodex_mongo_connections", "gauge", "MongoDB pool connections (waiting: checkouts queued for a full pool).", {"state": state}, pool[state]
+
+metrics.REGISTRY.add_collector(stats_samples)
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return Response(content=metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
 # --- API Endpoints ---
+@app.get("/api/health/db")
+async def database_health():
+    """MongoDB ping round trip and connection pool usage; 503 when MongoDB does not answer."""
+    pool = mongo_pool_monitor.snapshot()
+    try:
+        latency = await asyncio.wait_for(mongo_pool.ping(db_client), MONGODB_SERVER_SELECTION_TIMEOUT_MS / 1000 + 1)
+    except Exception as e:
+        return JSONResponse(status_code=503, content={"status": "unavailable", "error": str(e) or type(e).__name__, "pool": pool})
+    saturated = pool["saturation"] >= mongo_pool.SATURATED or pool["waiting"] > 0
+    return {
+        "status": "saturated" if saturated else "ok",
+        "backend": "memory" if MONGODB_URI == memory_db.MEMORY_URI else "mongodb",
+        "ping_ms": round(latency * 1000, 3),
+        "pool": pool,
+    }
+
 @app.get("/api/questions", response_model=List[Question])
-async def get_questions():
+async def get_questions(request: Request):
     # THIS IS THE FIX: Using "is None" for the check
     if db is None:
         raise HTTPException(status_code=503, detail="Database connection is not available.")
     try:
-        questions_cursor = db.questions.find().sort("id", 1)
-        questions_list = [Question(**doc) for doc in await questions_cursor.to_list(length=100)]
-        if not questions_list:
-            raise HTTPException(status_code=404, detail="No questions found in the database.")
-        return questions_list
+        catalog = await question_catalog.get()
+    except ConnectionFailure as e:
+        # Pool exhausted (checkout timed out) or MongoDB unreachable: worth retrying, unlike a 500
+        raise HTTPException(status_code=503, detail=f"Database temporarily unavailable: {e}", headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch questions from database: {e}")
+    if not catalog.questions:
+        raise HTTPException(status_code=404, detail="No questions found in the database.")
 
-@app.post("/api/conversation", response_model=ConversationResponse)
-async def handle_conversation(state: ConversationState):
+    headers = {"ETag": catalog.etag, "Cache-Control": "no-cache"}
+    if not_modified(request.headers.get("if-none-match"), (catalog.etag,)):
+        return Response(status_code=304, headers=headers)
+    return Response(content=catalog.body, media_type="application/json", headers=headers)
+
+@app.get("/api/questions/wizard")
+async def get_question_set(request: Request, v: Optional[str] = None):
+    """Wizard question set, pre-serialized and pre-compressed. ``?v=<version>`` URLs never change, so they are cached for good."""
+    payload = question_payload
+    if v is not None and v != payload.version:
+        raise HTTPException(status_code=404, detail=f"Question set {v} not found; current version is {payload.version}")
+
+    encoding, body, etag = payload.select(request.headers.get("accept-encoding"))
+    cache_control = "public, max-age=31536000, immutable" if v is not None else f"public, max-age={QUESTION_SET_MAX_AGE}"
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding", "X-Question-Set-Version": payload.version}
+    if payload.not_modified(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+# --- Conversation turn stages (shared by the plain and streaming endpoints) ---
+COMPLETION_MESSAGE = "Thank you! We have completed the assessment. The final results are now available to review."
+GREETING = "Hello! I'm your Compliance Companion. I'll ask you a series of simple questions. Let's start.\n\n"
+
+async def begin_conversation_turn(state: ConversationState) -> List[Question]:
+    """Check dependencies, load the catalog and record the answer to the previous question."""
     # THIS IS THE FIX: Using "is None" for the checks
     if openai_client is None:
         raise HTTPException(status_code=503, detail="OpenAI client is not initialized. Please check your API key.")
@@ -85,12 +419,11 @@ async def handle_conversation(state: ConversationState):
         raise HTTPException(status_code=503, detail="Database connection is not available.")
 
     try:
-        all_questions_cursor = db.questions.find().sort("id", 1)
-        all_questions = [Question(**doc) for doc in await all_questions_cursor.to_list(length=100)]
-        if not all_questions:
-            raise HTTPException(status_code=404, detail="No questions found to start conversation.")
+        all_questions = (await question_catalog.get()).questions
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database query failed during conversation: {e}")
+    if not all_questions:
+        raise HTTPException(status_code=404, detail="No questions found to start conversation.")
 
     if state.messages and state.messages[-1].role == 'user':
         last_user_message = state.messages[-1].content
@@ -98,42 +431,453 @@ async def handle_conversation(state: ConversationState):
         
         if 0 <= question_to_map_index < len(all_questions):
             question_to_map = all_questions[question_to_map_index]
-            mapping_prompt = f"The user is answering: '{question_to_map.question}'. The user's response was: '{last_user_message}'. Classify it as 'Yes', 'No', or 'Unsure'. Respond with ONLY the word."
-            
-            try:
-                mapping_completion = openai_client.chat.completions.create(
-                    model="gpt-3.5-turbo", messages=[{"role": "system", "content": mapping_prompt}], temperature=0, max_tokens=5
-                )
-                mapped_answer = mapping_completion.choices[0].message.content.strip()
-                if mapped_answer not in ['Yes', 'No', 'Unsure']: mapped_answer = 'Unsure'
-                state.answered_questions.append(AnsweredQuestion(question_text=question_to_map.question, answer=mapped_answer))
-            except Exception:
-                state.answered_questions.append(AnsweredQuestion(question_text=question_to_map.question, answer='Unsure'))
+            # Obvious replies ("yes", "nope", an option label) skip the model round-trip
+            mapped_answer = answer_mapper.map_answer_locally(last_user_message, question_to_map.options)
+            answer_mapper.stats.record(mapped_answer is not None)
+            if mapped_answer is None:
+                mapping_prompt = f"The user is answering: '{question_to_map.question}'. The user's response was: '{last_user_message}'. Classify it as 'Yes', 'No', or 'Unsure'. Respond with ONLY the word."
+                
+                try:
+                    with metrics.stage("llm_mapping"):
+                        mapping_completion = await create_chat_completion(
+                            OPENAI_MAPPING_TIMEOUT,
+                            model="gpt-3.5-turbo", messages=[{"role": "system", "content": mapping_prompt}], temperature=0, max_tokens=5
+                        )
+                    mapped_answer = mapping_completion.choices[0].message.content.strip()
+                    if mapped_answer not in ['Yes', 'No', 'Unsure']: mapped_answer = 'Unsure'
+                except Exception:
+                    mapped_answer = 'Unsure'
 
-    if state.current_question_index >= len(all_questions):
-        completion_message = "Thank you! We have completed the assessment. The final results are now available to review."
-        state.messages.append(ChatMessage(role='assistant', content=completion_message))
-        return ConversationResponse(ai_message=completion_message, updated_state=state, is_complete=True)
+            state.answered_questions.append(AnsweredQuestion(question_text=question_to_map.question, answer=mapped_answer))
 
-    current_question = all_questions[state.current_question_index]
-    greeting = "Hello! I'm your Compliance Companion. I'll ask you a series of simple questions. Let's start.\n\n"
-    
+    return all_questions
+
+def asking_messages(state: ConversationState, current_question: Question) -> List[Dict[str, str]]:
     asking_prompt = f"You are a friendly AI assistant. Your audience is non-technical. Rephrase this technical question in simple terms: '{current_question.question}'. Keep your response short and ask only one question at a time."
     
-    full_prompt_messages = []
     if state.current_question_index == 0:
-        full_prompt_messages.append({"role": "system", "content": greeting + asking_prompt})
-    else:
-        full_prompt_messages.append({"role": "system", "content": asking_prompt})
+        return [{"role": "system", "content": GREETING + asking_prompt}]
+    return [{"role": "system", "content": asking_prompt}]
+
+ASKING_SETTINGS = {"model": "gpt-4o-mini", "temperature": 0.5, "max_tokens": 150}
+
+async def ask_question(messages: List[Dict[str, str]]) -> str:
+    """Rephrased question; the same prompt is only sent to the model once across users and workers."""
+    async def produce() -> str:
+        with metrics.stage("llm_asking"):
+            asking_completion = await create_chat_completion(OPENAI_ASKING_TIMEOUT, messages=messages, **ASKING_SETTINGS)
+        return asking_completion.choices[0].message.content.strip()
 
+    return await rephrase_cache.get_or_create(rephrase_key(messages, **ASKING_SETTINGS), produce, model=ASKING_SETTINGS["model"])
+
+async def warm_rephrase_cache():
+    """Rephrase every catalog question up front (REPHRASE_WARM_ON_STARTUP)."""
     try:
-        asking_completion = openai_client.chat.completions.create(
-            model="gpt-4o-mini", messages=full_prompt_messages, temperature=0.5, max_tokens=150
-        )
-        ai_response_message = asking_completion.choices[0].message.content.strip()
+        catalog = await question_catalog.get()
     except Exception as e:
-        ai_response_message = f"I'm sorry, an error occurred. Please check your OpenAI API key and that you have funds available. Error: {e}"
+        logger.warning("Rephrase cache warm-up skipped: %s", e)
+        return
+    for index, question in enumerate(catalog.questions):
+        state = ConversationState(messages=[], answered_questions=[], current_question_index=index)
+        try:
+            await ask_question(asking_messages(state, question))
+        except Exception as e:
+            logger.warning("Rephrase cache warm-up failed for question %s: %s", question.id, e)
+    logger.info("Rephrase cache warmed for %d questions", len(catalog.questions))
+
+def asking_error_message(error: Exception) -> str:
+    return f"I'm sorry, an error occurred. Please check your OpenAI API key and that you have funds available. Error: {error}"
+
+def complete_conversation(state: ConversationState) -> ConversationResponse:
+    state.messages.append(ChatMessage(role='assistant', content=COMPLETION_MESSAGE))
+    return ConversationResponse(ai_message=COMPLETION_MESSAGE, updated_state=state, is_complete=True)
 
+def advance_conversation(state: ConversationState, ai_response_message: str) -> ConversationResponse:
     state.messages.append(ChatMessage(role='assistant', content=ai_response_message))
     state.current_question_index += 1
     return ConversationResponse(ai_message=ai_response_message, updated_state=state, is_complete=False)
+
+def sse_event(event: str, data: Any) -> bytes:
+    return b"event: " + event.encode("utf-8") + b"\ndata: " + fast_json.dumps(data) + b"\n\n"
+
+@app.post("/api/conversation", response_model=ConversationResponse)
+async def handle_conversation(state: ConversationState):
+    all_questions = await begin_conversation_turn(state)
+
+    if state.current_question_index >= len(all_questions):
+        return complete_conversation(state)
+
+    messages = asking_messages(state, all_questions[state.current_question_index])
+    try:
+        ai_response_message = await ask_question(messages)
+    except Exception as e:
+        ai_response_message = asking_error_message(e)
+
+    return advance_conversation(state, ai_response_message)
+
+@app.get("/api/conversation/stats")
+async def get_conversation_stats():
+    return {"answer_mapping": answer_mapper.stats.snapshot(), "rephrase_cache": rephrase_cache.stats()}
+
+@app.post("/api/conversation/stream")
+async def stream_conversation(state: ConversationState):
+    """
+    Same turn as /api/conversation, sent as Server-Sent Events:
+    "token" events carry {"delta": ...} as the model produces text, and a final
+    "done" event carries the ConversationResponse.
+    """
+    # Errors before the first byte still surface as regular HTTP errors
+    all_questions = await begin_conversation_turn(state)
+
+    async def events():
+        if state.current_question_index >= len(all_questions):
+            response = complete_conversation(state)
+            yield sse_event("token", {"delta": response.ai_message})
+            yield sse_event("done", response)
+            return
+
+        messages = asking_messages(state, all_questions[state.current_question_index])
+        key = rephrase_key(messages, **ASKING_SETTINGS)
+        ai_response_message = await rephrase_cache.get(key)
+
+        if ai_response_message is not None:
+            yield sse_event("token", {"delta": ai_response_message})
+        else:
+            parts = []
+            try:
+                with metrics.stage("llm_asking"):
+                    async for delta in stream_chat_completion(OPENAI_ASKING_TIMEOUT, messages=messages, **ASKING_SETTINGS):
+                        parts.append(delta)
+                        yield sse_event("token", {"delta": delta})
+                ai_response_message = "".join(parts).strip()
+                await rephrase_cache.put(key, ai_response_message, model=ASKING_SETTINGS["model"])
+            except Exception as e:
+                if not parts:
+                    parts.append(asking_error_message(e))
+                    yield sse_event("token", {"delta": parts[0]})
+                ai_response_message = "".join(parts).strip()
+
+        response = advance_conversation(state, ai_response_message)
+        yield sse_event("done", response)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# --- Server-side Conversation Sessions ---
+# The session holds the ConversationState; clients send only the new message and get the delta.
+async def run_session_turn(session_id: str, turn: SessionTurnRequest) -> SessionTurnResponse:
+    try:
+        entry = await conversation_sessions.get(session_id, turn.revision)
+    except StaleSessionError:
+        raise HTTPException(status_code=409, detail="Session was updated by another request; retry shortly.")
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Session not found.")
+
+    async with entry.lock:
+        if turn.revision != entry.revision:
+            raise HTTPException(status_code=409, detail="Session was updated by another request.")
+
+        state = entry.state
+        messages_before = len(state.messages)
+        answers_before = len(state.answered_questions)
+        if turn.message is not None:
+            state.messages.append(ChatMessage(role='user', content=turn.message))
+
+        try:
+            response = await handle_conversation(state)
+        except Exception:
+            del state.messages[messages_before:]
+            del state.answered_questions[answers_before:]
+            raise
+        conversation_sessions.mark_dirty(entry)
+
+        return SessionTurnResponse(
+            session_id=session_id,
+            revision=entry.revision,
+            ai_message=response.ai_message,
+            new_answers=state.answered_questions[answers_before:],
+            current_question_index=state.current_question_index,
+            is_complete=response.is_complete,
+        )
+
+@app.post("/api/sessions", response_model=SessionTurnResponse)
+async def create_session():
+    """
+    Start a conversation; the response already carries the first question.
+    The session is stored only once that first turn succeeded, so a failed start leaves nothing behind.
+    """
+    state = ConversationState(messages=[], answered_questions=[])
+    response = await handle_conversation(state)
+    # Revision 1: the first turn is already applied, as for any later turn
+    session_id = await conversation_sessions.create(state, revision=1)
+    return SessionTurnResponse(
+        session_id=session_id,
+        revision=1,
+        ai_message=response.ai_message,
+        new_answers=state.answered_questions,
+        current_question_index=state.current_question_index,
+        is_complete=response.is_complete,
+    )
+
+@app.post("/api/sessions/{session_id}/turn", response_model=SessionTurnResponse)
+async def session_turn(session_id: str, turn: SessionTurnRequest):
+    return await run_session_turn(session_id, turn)
+
+@app.get("/api/sessions/{session_id}", response_model=SessionStateResponse)
+async def get_session(session_id: str):
+    """Full state, e.g. to resume a conversation after a page reload."""
+    entry = await conversation_sessions.get(session_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Session not found.")
+    return SessionStateResponse(session_id=session_id, revision=entry.revision, state=entry.state)
+
+
+# --- Classification Endpoints ---
+# Plain "def" (or run_in_threadpool) so the CPU-bound work runs in the threadpool instead of on the event loop.
+# Results are returned as FastJSONResponse, so FastAPI does not walk them with jsonable_encoder;
+# the response models only document the shapes.
+async def resolve_rules_version(version: Optional[str]) -> Optional[CompiledRules]:
+    """The requested rule set (None for the live one); 404 if the version is unknown."""
+    if version is None:
+        return None
+    try:
+        compiled = await rule_pack_loader.get_version(version)
+    except RulePackError as e:
+        raise HTTPException(status_code=422, detail=f"Rules version {version} is invalid: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to load rules version {version}: {e}")
+    if compiled is None:
+        raise HTTPException(status_code=404, detail=f"Unknown rules version: {version}")
+    return compiled
+
+def classify_answers(answers: Dict[str, Any], compiled: Optional[CompiledRules]):
+    with metrics.stage("classify"):
+        if classification_table is not None and (compiled is None or compiled is get_compiled_rules()):
+            index = classification_table.find(answers)
+            if index is not None:
+                metrics.record_rule_fires(classification_table.fired_rule_ids(index))
+                return Response(content=classification_table.classification_at(index), media_type="application/json")
+        result = cached_classify(answers, compiled)
+    metrics.record_rule_fires(metrics.fired_rule_ids(result))
+    return FastJSONResponse(result)
+
+@app.post("/api/classify", response_model=Classification)
+async def classify(request: ClassifyRequest):
+    compiled = await resolve_rules_version(request.rules_version)
+    return await run_in_threadpool(classify_answers, request.answers_json, compiled)
+
+@app.post("/api/classify/what-if", response_model=ReclassifyResponse)
+def classify_what_if(request: ReclassifyRequest):
+    """Classification after changing one answer (null removes it), plus what changed."""
+    with metrics.stage("reclassify"):
+        state, diff = cached_reclassify(request.answers_json, request.question_id, request.answer)
+    metrics.record_rule_fires(metrics.fired_rule_ids(state.result))
+    return FastJSONResponse({"classification": state.result, "diff": diff})
+
+@app.post("/api/classify/batch", response_model=ClassifyBatchResponse)
+def classify_batch(request: ClassifyBatchRequest):
+    if len(request.answers_list) > CLASSIFY_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"Batch too large: at most {CLASSIFY_BATCH_MAX} answer sets per request.")
+    compiled = get_compiled_rules()
+    with metrics.stage("classify"):
+        results = classify_many(request.answers_list, compiled)
+    for result in results:
+        metrics.record_rule_fires(metrics.fired_rule_ids(result))
+    return FastJSONResponse({"rules_version": compiled.version, "count": len(results), "results": results})
+
+@app.post("/api/classify/sensitivity")
+async def classify_sensitivity(request: ClassifyRequest):
+    """For each question, the alternative answers that would change the bucket."""
+    compiled = await resolve_rules_version(request.rules_version)
+    with metrics.stage("sensitivity"):
+        result = await run_in_threadpool(sensitivity, request.answers_json, compiled)
+    return FastJSONResponse(result)
+
+@app.post("/api/classify/sensitivity/batch", response_model=ClassifyBatchResponse)
+def classify_sensitivity_batch(request: ClassifyBatchRequest):
+    if len(request.answers_list) > CLASSIFY_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"Batch too large: at most {CLASSIFY_BATCH_MAX} answer sets per request.")
+    compiled = get_compiled_rules()
+    with metrics.stage("sensitivity"):
+        results = sensitivity_many(request.answers_list, compiled)
+    return FastJSONResponse({"rules_version": compiled.version, "count": len(results), "results": results})
+
+@app.post("/api/classify/bulk")
+async def classify_bulk(request: Request, format: Optional[str] = None, roadmap: bool = True,
+                        rules_version: Optional[str] = None):
+    """
+    Classify an uploaded inventory: NDJSON objects or CSV rows keyed by question ids,
+    plus optional "id"/"name" columns. Streams one NDJSON line per row (result or
+    validation error) and a final summary line.
+    """
+    content_type = request.headers.get("content-type", "")
+    fmt = format or ("csv" if "csv" in content_type else "ndjson")
+    if fmt not in ("csv", "ndjson"):
+        raise HTTPException(status_code=422, detail="format must be 'csv' or 'ndjson'.")
+    compiled = await resolve_rules_version(rules_version) or get_compiled_rules()
+
+    # The upload goes to a temporary file rather than RAM; rows are then read back one chunk at a time
+    upload = tempfile.TemporaryFile()
+    try:
+        size = 0
+        async for data in request.stream():
+            size += len(data)
+            if size > BULK_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"Upload too large: at most {BULK_MAX_BYTES} bytes.")
+            upload.write(data)
+        upload.seek(0)
+    except BaseException:
+        upload.close()
+        raise
+
+    ingestion = BulkIngestion(open_rows(upload, fmt), compiled, chunk_rows=BULK_CHUNK_ROWS, include_roadmap=roadmap)
+
+    async def lines():
+        try:
+            while True:
+                chunk = await run_in_threadpool(ingestion.next_chunk)
+                if chunk is None:
+                    break
+                yield chunk
+            yield ingestion.summary()
+        finally:
+            upload.close()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    return cache_stats()
+
+
+# --- Job Endpoints ---
+@app.post("/api/jobs", status_code=202)
+async def submit_job(request: JobRequest, x_admin_token: Optional[str] = Header(None)):
+    """Queue batch classification ("classify"), classification plus roadmaps ("roadmap") or a project export ("export")."""
+    params = dict(request.params)
+    answers_list = None
+    if request.kind not in JOB_KINDS:
+        raise HTTPException(status_code=422, detail=f"kind must be one of {', '.join(JOB_KINDS)}.")
+    if request.kind == "export":
+        # Exports read stored project data
+        require_admin(x_admin_token)
+        if not isinstance(params.get("project_id"), str):
+            raise HTTPException(status_code=422, detail="Export jobs need a 'project_id'.")
+    else:
+        answers_list = params.pop("answers_list", None)
+        if not isinstance(answers_list, list) or not all(isinstance(answers, dict) for answers in answers_list):
+            raise HTTPException(status_code=422, detail="'answers_list' must be a list of answer objects.")
+        if len(answers_list) > CLASSIFY_BATCH_MAX:
+            raise HTTPException(status_code=413, detail=f"Batch too large: at most {CLASSIFY_BATCH_MAX} answer sets per job.")
+
+    # Pin the rules version so retries classify the same way
+    compiled = await resolve_rules_version(params.get("rules_version")) or get_compiled_rules()
+    params["rules_version"] = compiled.version
+    job = await job_runner.submit(request.kind, params, max_attempts=JOB_MAX_ATTEMPTS, inputs=answers_list)
+    return job_view(job)
+
+async def get_job_or_404(job_id: str) -> Dict[str, Any]:
+    job = await job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    return job_view(await get_job_or_404(job_id))
+
+@app.get("/api/jobs/{job_id}/result")
+async def get_job_result(job_id: str, x_admin_token: Optional[str] = Header(None)):
+    """Results of a completed job as NDJSON, one line per item in input order."""
+    job = await get_job_or_404(job_id)
+    if job["kind"] == "export":
+        require_admin(x_admin_token)
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}.")
+
+    async def lines():
+        async for items in job_store.iter_results(job_id, job["attempts"]):
+            yield b"".join(fast_json.dumps(item) + b"\n" for item in items)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    job = await job_store.request_cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job_view(job)
+
+
+# --- Admin Endpoints ---
+def require_admin(token: Optional[str]) -> None:
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled.")
+    if token is None or not secrets.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token.")
+
+@app.get("/api/rules")
+async def get_rules_status():
+    return rule_pack_loader.status()
+
+@app.get("/api/rules/versions")
+async def get_rules_versions():
+    return {"current": get_compiled_rules().version, "loaded": rules_versions()}
+
+@app.post("/api/rules/rescore")
+async def rescore(request: RescoreRequest, x_admin_token: Optional[str] = Header(None)):
+    """
+    Re-score stored assessments under a rule version, streamed as NDJSON:
+    one line per batch with the bucket changes, then a summary line.
+    """
+    require_admin(x_admin_token)
+    if not 1 <= request.batch_size <= CLASSIFY_BATCH_MAX:
+        raise HTTPException(status_code=422, detail=f"batch_size must be between 1 and {CLASSIFY_BATCH_MAX}.")
+    compiled = await resolve_rules_version(request.rules_version)
+    baseline = await resolve_rules_version(request.baseline_version)
+    query = {"project_id": request.project_id} if request.project_id else {}
+
+    async def lines():
+        try:
+            async for event in rescore_assessments(db.assessments, compiled, baseline, query,
+                                                   request.batch_size, request.include_changes):
+                yield fast_json.dumps(event) + b"\n"
+        except Exception as e:
+            logger.error("Re-scoring failed: %s", e)
+            yield fast_json.dumps({"type": "error", "detail": str(e)}) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.post("/api/rules/reload")
+async def reload_rules(x_admin_token: Optional[str] = Header(None)):
+    """Check the rule pack sources now instead of waiting for the next poll."""
+    require_admin(x_admin_token)
+    try:
+        await rule_pack_loader.reload()
+    except RulePackError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except OSError as e:
+        raise HTTPException(status_code=500, detail=f"Failed to read rule pack: {e}")
+    return rule_pack_loader.status()
+
+@app.get("/api/profiles")
+async def list_profiles(x_admin_token: Optional[str] = Header(None)):
+    """Stored request profiles, newest first (without their stacks)."""
+    require_admin(x_admin_token)
+    return {"profiles": await run_in_threadpool(profile_store.list)}
+
+@app.get("/api/profiles/{capture_id}")
+async def download_profile(capture_id: str, x_admin_token: Optional[str] = Header(None)):
+    """
+    One capture as JSON; ``stacks`` maps the request's folded stacks to sample counts (flame graph
+    input), ``shared_stacks`` the worker's other threads while concurrent requests ran.
+    """
+    require_admin(x_admin_token)
+    path = profile_store.path(capture_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    return FileResponse(path, media_type="application/json", filename=f"profile-{capture_id}.json")
@@ -2,13 +2,57 @@
 """
 KODEX Backend API Test Suite
 Tests all API endpoints for the EU AI Act compliance tool
+
+With --load, replays the same flows concurrently and reports per-endpoint
+throughput, latency percentiles and error rates (see load_main).
 """
 
+import asyncio
+import contextvars
+import httpx
+import os
+import random
 import requests
+import subprocess
 import sys
 import json
+import time
+import uuid
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from bench_support import free_port, percentile
+
+SAMPLE_ANSWERS = {
+    "q1_company_role": "developer",
+    "q2_deployment": "external",
+    "q3_domain": "hiring_hr",
+    "q4_decision_impact": "significant_impact",
+    "q5_data_types": "personal_nonsensitive",
+    "q6_biometric": "no",
+    "q7_safety_critical": "no",
+    "q8_human_oversight": "human_reviews",
+    "q9_behavior": "scores_ranks",
+    "q10_logging": "partial_logging"
+}
+
+# Flows replayed by the load mode (method names on KODEXAPITester)
+LOAD_FLOWS = {
+    "auth": "load_flow_auth",
+    "projects": "load_flow_projects",
+    "assessments": "load_flow_assessments",
+    "classify": "load_flow_classify",
+    "estimate": "load_flow_estimate",
+    "export": "load_flow_export",
+}
+# Scheduled start of the flow arrival running in this task (rate mode); its first request is
+# timed from there, so time spent queued behind the concurrency limit counts as latency
+SCHEDULED_ARRIVAL: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("scheduled_arrival", default=None)
+# Flows that need no account
+PUBLIC_FLOWS = {"classify"}
+# Flows backend/server.py serves; auth, projects, assessments, estimate and export live in the hosted API
+LOCAL_FLOWS = ["classify"]
 
 class KODEXAPITester:
     def __init__(self, base_url: str = "https://https://ai-compliance-made-easy.onrender.com/"):
@@ -93,6 +137,18 @@ class KODEXAPITester:
         # Health check
         self.run_test("Health Check", "GET", "health", 200)
 
+    def test_database_health_endpoint(self):
+        """Test database ping and connection pool report (public)"""
+        print("\n🔍 Testing Database Health Endpoint...")
+        
+        success, data = self.run_test("Database Health", "GET", "health/db", 200)
+        
+        if success and data:
+            pool = data.get('pool', {})
+            has_pool = all(field in pool for field in ['max_pool_size', 'in_use', 'saturation', 'checkout_wait_ms'])
+            self.log_test("Database Pool Report Valid", has_pool,
+                          f"Status: {data.get('status')}, Ping: {data.get('ping_ms')} ms, Saturation: {pool.get('saturation')}")
+
     def test_questions_endpoint(self):
         """Test questions endpoint (public)"""
         print("\n🔍 Testing Questions Endpoint...")
@@ -112,6 +168,29 @@ class KODEXAPITester:
             else:
                 self.log_test("Questions Structure Valid", False, "Missing 'questions' or 'version' field")
 
+    def test_question_set_endpoint(self):
+        """Test pre-compressed wizard question set and conditional GET (public)"""
+        print("\n🔍 Testing Question Set Endpoint...")
+        
+        url = f"{self.base_url}/api/questions/wizard"
+        try:
+            response = requests.get(url, headers={"Accept-Encoding": "gzip"}, timeout=30)
+            data = response.json()
+            success = response.status_code == 200 and 'wizard_steps' in data and 'version' in data
+            self.log_test("Get Question Set", success, f"Status: {response.status_code}, Encoding: {response.headers.get('Content-Encoding')}, ETag: {response.headers.get('ETag')}")
+            if not success:
+                return
+            
+            etag = response.headers.get('ETag')
+            response = requests.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": etag}, timeout=30)
+            self.log_test("Question Set Not Modified", response.status_code == 304, f"Status: {response.status_code} (expected 304)")
+            
+            response = requests.get(url, params={"v": data['version']}, timeout=30)
+            immutable = 'immutable' in response.headers.get('Cache-Control', '')
+            self.log_test("Versioned Question Set Cached", response.status_code == 200 and immutable, f"Cache-Control: {response.headers.get('Cache-Control')}")
+        except Exception as e:
+            self.log_test("Get Question Set", False, f"Error: {str(e)}")
+
     def test_classification_endpoint(self):
         """Test classification endpoint (public)"""
         print("\n🔍 Testing Classification Endpoint...")
@@ -137,6 +216,163 @@ class KODEXAPITester:
             has_all_fields = all(field in data for field in required_fields)
             self.log_test("Classification Response Valid", has_all_fields, f"Bucket: {data.get('bucket')}, Confidence: {data.get('confidence')}")
 
+    def test_classification_batch_endpoint(self):
+        """Test batch classification endpoint (public)"""
+        print("\n🔍 Testing Batch Classification Endpoint...")
+        
+        answers_list = [
+            {
+                "q1_company_role": "developer",
+                "q2_deployment": "external",
+                "q3_domain": "hiring_hr",
+                "q4_decision_impact": "significant_impact",
+                "q9_behavior": "scores_ranks"
+            },
+            {
+                "q1_company_role": "internal_user",
+                "q2_deployment": "internal",
+                "q3_domain": "general_productivity",
+                "q4_decision_impact": "no_impact",
+                "q8_human_oversight": "advisory"
+            }
+        ]
+        
+        success, data = self.run_test("Classify Batch", "POST", "classify/batch", 200, {"answers_list": answers_list})
+        
+        if success and data:
+            results = data.get('results', [])
+            buckets = [r.get('bucket') for r in results]
+            self.log_test("Batch Classification Response Valid", len(results) == len(answers_list), f"Buckets: {buckets}, Rules version: {data.get('rules_version')}")
+
+    def test_classification_what_if_endpoint(self):
+        """Test incremental what-if classification endpoint (public)"""
+        print("\n🔍 Testing What-if Classification Endpoint...")
+        
+        answers = {
+            "q1_company_role": "developer",
+            "q2_deployment": "external",
+            "q3_domain": "hiring_hr",
+            "q4_decision_impact": "significant_impact",
+            "q9_behavior": "scores_ranks"
+        }
+        
+        success, data = self.run_test("Classify What-if", "POST", "classify/what-if", 200, {"answers_json": answers, "question_id": "q4_decision_impact", "answer": "no_impact"})
+        
+        if success and data:
+            diff = data.get('diff', {})
+            bucket = diff.get('bucket', {})
+            self.log_test("What-if Response Valid", 'classification' in data and 'rules' in diff, f"Bucket: {bucket.get('before')} -> {bucket.get('after')}, Rules changed: {len(diff.get('rules', []))}")
+
+    def test_classification_sensitivity_endpoint(self):
+        """Test what-if sensitivity endpoint (public)"""
+        print("\n🔍 Testing Sensitivity Endpoint...")
+        
+        answers = {
+            "q1_company_role": "developer",
+            "q2_deployment": "external",
+            "q3_domain": "hiring_hr",
+            "q4_decision_impact": "significant_impact",
+            "q9_behavior": "scores_ranks"
+        }
+        
+        success, data = self.run_test("Classify Sensitivity", "POST", "classify/sensitivity", 200, {"answers_json": answers})
+        
+        if success and data:
+            has_fields = all(field in data for field in ['bucket', 'sensitive_questions', 'questions'])
+            self.log_test("Sensitivity Response Valid", has_fields, f"Bucket: {data.get('bucket')}, Sensitive questions: {data.get('sensitive_questions')}")
+
+    def test_rules_versions_endpoint(self):
+        """Test rule version listing and classification under an explicit version (public)"""
+        print("\n🔍 Testing Rules Versions Endpoint...")
+        
+        success, data = self.run_test("List Rules Versions", "GET", "rules/versions", 200)
+        
+        if success and data:
+            current = data.get('current')
+            self.log_test("Rules Versions Response Valid", current in data.get('loaded', []), f"Current: {current}, Loaded: {data.get('loaded')}")
+            
+            answers = {"q3_domain": "hiring_hr", "q4_decision_impact": "significant_impact"}
+            self.run_test("Classify Under Current Version", "POST", "classify", 200, {"answers_json": answers, "rules_version": current})
+            self.run_test("Classify Under Unknown Version", "POST", "classify", 404, {"answers_json": answers, "rules_version": "0.0.0-unknown"})
+
+    def test_classification_bulk_endpoint(self):
+        """Test bulk NDJSON/CSV classification endpoint (public)"""
+        print("\n🔍 Testing Bulk Classification Endpoint...")
+        
+        ndjson_rows = "\n".join([
+            json.dumps({"id": "sys-1", "q2_deployment": "external", "q3_domain": "hiring_hr", "q4_decision_impact": "significant_impact"}),
+            json.dumps({"id": "sys-2", "q6_biometric": "perhaps"}),
+        ])
+        csv_rows = "id,q2_deployment,q3_domain,q4_decision_impact\nsys-3,internal,general_productivity,no_impact\n"
+        
+        for name, body, content_type in [("NDJSON", ndjson_rows, "application/x-ndjson"), ("CSV", csv_rows, "text/csv")]:
+            try:
+                response = requests.post(f"{self.base_url}/api/classify/bulk", data=body.encode("utf-8"),
+                                         headers={"Content-Type": content_type}, timeout=30)
+                lines = [json.loads(line) for line in response.text.splitlines() if line.strip()]
+                summary = lines[-1] if lines else {}
+                success = response.status_code == 200 and summary.get("type") == "summary"
+                self.log_test(f"Bulk Classification ({name})", success, f"Status: {response.status_code}, Summary: {summary}")
+            except Exception as e:
+                self.log_test(f"Bulk Classification ({name})", False, f"Error: {str(e)}")
+
+    def test_jobs_endpoint(self):
+        """Test background classification job lifecycle (public)"""
+        print("\n🔍 Testing Background Jobs...")
+        
+        answers_list = [
+            {"q2_deployment": "external", "q3_domain": "hiring_hr", "q4_decision_impact": "significant_impact"},
+            {"q2_deployment": "internal", "q3_domain": "general_productivity", "q4_decision_impact": "no_impact"}
+        ]
+        
+        success, job = self.run_test("Submit Classification Job", "POST", "jobs", 202, {"kind": "classify", "params": {"answers_list": answers_list}})
+        if not success or not job.get('id'):
+            return False
+        
+        status = job
+        for _ in range(30):
+            status = requests.get(f"{self.base_url}/api/jobs/{job['id']}", timeout=30).json()
+            if status.get('status') in ('completed', 'failed', 'cancelled'):
+                break
+            time.sleep(1)
+        self.log_test("Classification Job Completed", status.get('status') == 'completed', f"Status: {status.get('status')}, Progress: {status.get('progress')}")
+        
+        if status.get('status') == 'completed':
+            response = requests.get(f"{self.base_url}/api/jobs/{job['id']}/result", timeout=30)
+            results = [json.loads(line) for line in response.text.splitlines() if line.strip()]
+            self.log_test("Classification Job Results", len(results) == len(answers_list), f"Buckets: {[r.get('bucket') for r in results]}")
+
+    def test_metrics_endpoint(self):
+        """Test Prometheus metrics exposition (public)"""
+        print("\n🔍 Testing Metrics Endpoint...")
+        
+        try:
+            response = requests.get(f"{self.base_url}/metrics", timeout=30)
+            text = response.text
+            success = response.status_code == 200 and "kodex_http_request_duration_seconds" in text
+            self.log_test("Get Metrics", success, f"Status: {response.status_code}, Content-Type: {response.headers.get('Content-Type')}")
+            
+            # Earlier tests classified assessments, so their stages and rules must show up
+            has_stages = 'stage="classify"' in text and "kodex_rule_fired_total{" in text
+            self.log_test("Metrics Include Classification Stages", has_stages, f"{len(text.splitlines())} lines")
+        except Exception as e:
+            self.log_test("Get Metrics", False, f"Error: {str(e)}")
+
+    def test_profiles_endpoint(self):
+        """Test that request profile captures are admin-only"""
+        print("\n🔍 Testing Profiles Endpoint...")
+        
+        try:
+            response = requests.get(f"{self.base_url}/api/profiles", timeout=30)
+            # 403 when the server has no ADMIN_TOKEN, 401 when it has one and none was sent
+            success = response.status_code in (401, 403)
+            self.log_test("Profiles Require Admin Token", success, f"Status: {response.status_code}")
+            
+            response = requests.get(f"{self.base_url}/api/profiles/{'0' * 32}", timeout=30)
+            self.log_test("Profile Download Requires Admin Token", response.status_code in (401, 403), f"Status: {response.status_code}")
+        except Exception as e:
+            self.log_test("Profiles Require Admin Token", False, f"Error: {str(e)}")
+
     def test_auth_flow(self):
         """Test authentication flow"""
         print("\n🔍 Testing Authentication Flow...")
@@ -345,6 +581,193 @@ class KODEXAPITester:
             has_required = all(field in data for field in required_fields)
             self.log_test("Export Response Valid", has_required, "Export data structure correct")
 
+    # --- Load mode: the same flows, replayed concurrently ---
+    async def load_request(self, client: httpx.AsyncClient, stats: Optional[Dict], label: str, method: str,
+                           endpoint: str, expected_status: int, data: Optional[Dict] = None,
+                           token: Optional[str] = None) -> Optional[Dict]:
+        """One request of a flow; records its latency under ``label`` and returns the JSON body, or None on failure"""
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        started = SCHEDULED_ARRIVAL.get()
+        if started is None:
+            started = time.perf_counter()
+        else:
+            SCHEDULED_ARRIVAL.set(None)
+        try:
+            response = await client.request(method, f"{self.base_url}/api/{endpoint}", json=data, headers=headers)
+            success = response.status_code == expected_status
+            body = response.json() if success and response.content else {}
+        except Exception:
+            success, body = False, None
+        
+        if stats is not None:
+            entry = stats.setdefault(label, {"latencies": [], "errors": 0})
+            entry["latencies"].append(time.perf_counter() - started)
+            entry["errors"] += not success
+        return body if success else None
+
+    async def load_register(self, client: httpx.AsyncClient, stats: Optional[Dict]) -> Optional[str]:
+        """Register a fresh user and return its token"""
+        credentials = {"email": f"load_{uuid.uuid4().hex}@kodex-test.com", "password": "TestPassword123!"}
+        data = await self.load_request(client, stats, "POST /api/auth/register", "POST", "auth/register", 200, credentials)
+        if data is None:
+            return None
+        data = await self.load_request(client, stats, "POST /api/auth/login", "POST", "auth/login", 200, credentials)
+        return data.get('token') if data else None
+
+    async def load_create_project(self, client: httpx.AsyncClient, stats: Dict, token: Optional[str]) -> Optional[str]:
+        data = await self.load_request(client, stats, "POST /api/projects", "POST", "projects", 200,
+                                       {"name": "Load Test AI System", "org_name": "Load Test Organization"}, token)
+        return data.get('id') if data else None
+
+    async def load_create_assessment(self, client: httpx.AsyncClient, stats: Dict, token: Optional[str],
+                                     project_id: str) -> Optional[str]:
+        data = await self.load_request(client, stats, "POST /api/assessments", "POST", "assessments", 200,
+                                       {"project_id": project_id, "answers_json": SAMPLE_ANSWERS}, token)
+        return data.get('id') if data else None
+
+    async def load_flow_auth(self, client: httpx.AsyncClient, stats: Dict, token: Optional[str]):
+        token = await self.load_register(client, stats)
+        if token:
+            await self.load_request(client, stats, "GET /api/auth/me", "GET", "auth/me", 200, token=token)
+
+    async def load_flow_projects(self, client: httpx.AsyncClient, stats: Dict, token: Optional[str]):
+        project_id = await self.load_create_project(client, stats, token)
+        if not project_id:
+            return
+        await self.load_request(client, stats, "GET /api/projects", "GET", "projects", 200, token=token)
+        await self.load_request(client, stats, "GET /api/projects/{id}", "GET", f"projects/{project_id}", 200, token=token)
+        await self.load_request(client, stats, "PUT /api/projects/{id}", "PUT", f"projects/{project_id}", 200,
+                                {"name": "Updated Load Test AI System"}, token)
+        await self.load_request(client, stats, "DELETE /api/projects/{id}", "DELETE", f"projects/{project_id}", 200, token=token)
+
+    async def load_flow_assessments(self, client: httpx.AsyncClient, stats: Dict, token: Optional[str]):
+        project_id = await self.load_create_project(client, stats, token)
+        if not project_id:
+            return
+        assessment_id = await self.load_create_assessment(client, stats, token, project_id)
+        if assessment_id:
+            await self.load_request(client, stats, "GET /api/assessments/{id}", "GET", f"assessments/{assessment_id}", 200, token=token)
+            await self.load_request(client, stats, "GET /api/projects/{id}/assessments", "GET", f"projects/{project_id}/assessments", 200, token=token)
+        await self.load_request(client, stats, "DELETE /api/projects/{id}", "DELETE", f"projects/{project_id}", 200, token=token)
+
+    async def load_flow_classify(self, client: httpx.AsyncClient, stats: Dict, token: Optional[str]):
+        await self.load_request(client, stats, "POST /api/classify", "POST", "classify", 200, {"answers_json": SAMPLE_ANSWERS})
+
+    async def load_flow_estimate(self, client: httpx.AsyncClient, stats: Dict, token: Optional[str]):
+        await self.load_request(client, stats, "POST /api/estimate", "POST", "estimate", 200, {
+            "classification_bucket": "High-risk",
+            "turnover": 5000000,
+            "currency": "EUR",
+            "tier_parameters": {
+                "A": {"min_percent": 0.5, "max_percent": 3},
+                "B": {"min_percent": 1.5, "max_percent": 7},
+                "C": {"min_percent": 2, "max_percent": 6, "fixed_max": 35000000}
+            }
+        }, token)
+
+    async def load_flow_export(self, client: httpx.AsyncClient, stats: Dict, token: Optional[str]):
+        project_id = await self.load_create_project(client, stats, token)
+        if not project_id:
+            return
+        assessment_id = await self.load_create_assessment(client, stats, token, project_id)
+        if assessment_id:
+            await self.load_request(client, stats, "GET /api/export/{id}", "GET", f"export/{assessment_id}", 200, token=token)
+        await self.load_request(client, stats, "DELETE /api/projects/{id}", "DELETE", f"projects/{project_id}", 200, token=token)
+
+    async def run_load(self, flows: List[str], concurrency: int, duration: float, rate: Optional[float] = None,
+                       users: int = 10, seed: int = 0) -> Dict[str, Any]:
+        """
+        Replay ``flows`` (picked at random) for ``duration`` seconds. Without ``rate``, ``concurrency``
+        virtual users start a new flow as soon as the previous one ends; with it, flows arrive at
+        ``rate`` per second (Poisson), at most ``concurrency`` in flight. An arrival's first request
+        is timed from when it was scheduled to arrive, not from when a slot freed up, and arrivals
+        that had to wait for a slot are counted as ``queued_arrivals``. Authenticated flows share
+        ``users`` accounts registered before the clock starts.
+        """
+        rng = random.Random(seed)
+        stats: Dict[str, Dict] = {}
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(timeout=30, limits=limits) as client:
+            needs_users = bool(set(flows) - PUBLIC_FLOWS)
+            tokens = [await self.load_register(client, None) for _ in range(users)] if needs_users else [None]
+            
+            async def run_flow():
+                await getattr(self, LOAD_FLOWS[rng.choice(flows)])(client, stats, rng.choice(tokens))
+            
+            started = time.perf_counter()
+            deadline = started + duration
+            arrivals = queued = 0
+            if rate is None:
+                async def virtual_user():
+                    while time.perf_counter() < deadline:
+                        await run_flow()
+                await asyncio.gather(*(virtual_user() for _ in range(concurrency)))
+            else:
+                in_flight = asyncio.Semaphore(concurrency)
+                async def arrival(scheduled: float):
+                    nonlocal queued
+                    queued += in_flight.locked()
+                    async with in_flight:
+                        SCHEDULED_ARRIVAL.set(scheduled)
+                        await run_flow()
+                tasks = []
+                # Arrivals follow the schedule even when this loop falls behind it
+                scheduled = started
+                while scheduled < deadline:
+                    await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+                    tasks.append(asyncio.create_task(arrival(scheduled)))
+                    arrivals += 1
+                    scheduled += rng.expovariate(rate)
+                await asyncio.gather(*tasks)
+            elapsed = time.perf_counter() - started
+        
+        endpoints = {}
+        for label, entry in sorted(stats.items()):
+            latencies = sorted(entry["latencies"])
+            endpoints[label] = {
+                "requests": len(latencies),
+                "throughput_rps": round(len(latencies) / elapsed, 2),
+                "error_rate": round(entry["errors"] / len(latencies), 4),
+                "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+                "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            }
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "base_url": self.base_url,
+            "flows": flows,
+            "concurrency": concurrency,
+            "rate": rate,
+            "arrivals": arrivals,
+            "queued_arrivals": queued,
+            "duration_seconds": round(elapsed, 2),
+            "registered_users": sum(token is not None for token in tokens),
+            "endpoints": endpoints,
+        }
+
+    def run_load_test(self, flows: Optional[List[str]] = None, concurrency: int = 20, duration: float = 30.0,
+                      rate: Optional[float] = None, users: int = 10) -> Dict[str, Any]:
+        """Run the load mode and print per-endpoint throughput, latency and error rates"""
+        flows = flows or list(LOAD_FLOWS)
+        print("🚀 Starting KODEX Backend Load Test")
+        print(f"Testing against: {self.base_url}")
+        print(f"Flows: {', '.join(flows)} | Concurrency: {concurrency} | "
+              f"Arrivals: {f'{rate}/s' if rate else 'closed loop'} | Duration: {duration}s")
+        print("=" * 100)
+        
+        report = asyncio.run(self.run_load(flows, concurrency, duration, rate, users))
+        
+        print(f"{'endpoint':<38}{'requests':>10}{'req/s':>10}{'errors':>9}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}")
+        for label, row in report["endpoints"].items():
+            print(f"{label:<38}{row['requests']:>10}{row['throughput_rps']:>10.1f}{row['error_rate'] * 100:>8.1f}%"
+                  f"{row['p50_ms']:>11.1f}{row['p95_ms']:>11.1f}{row['p99_ms']:>11.1f}")
+        if report["queued_arrivals"]:
+            print(f"\n⚠️ {report['queued_arrivals']} of {report['arrivals']} arrivals waited for one of the "
+                  f"{concurrency} slots; their wait is included in the latencies")
+        if report["registered_users"] == 0 and set(flows) - PUBLIC_FLOWS:
+            print("\n⚠️ No user could be registered; authenticated flows ran without a token")
+        return report
+
     def cleanup_test_data(self):
         """Clean up test data"""
         print("\n🧹 Cleaning up test data...")
@@ -362,8 +785,18 @@ class KODEXAPITester:
         try:
             # Test public endpoints first
             self.test_health_endpoints()
+            self.test_database_health_endpoint()
             self.test_questions_endpoint()
+            self.test_question_set_endpoint()
             self.test_classification_endpoint()
+            self.test_classification_batch_endpoint()
+            self.test_classification_what_if_endpoint()
+            self.test_classification_sensitivity_endpoint()
+            self.test_rules_versions_endpoint()
+            self.test_classification_bulk_endpoint()
+            self.test_jobs_endpoint()
+            self.test_metrics_endpoint()
+            self.test_profiles_endpoint()
             
             # Test authentication
             if self.test_auth_flow():
@@ -400,8 +833,75 @@ class KODEXAPITester:
         
         return self.tests_passed == self.tests_run
 
+def start_local_server(port: int, workers: int = 1) -> List[subprocess.Popen]:
+    """Start backend/server.py on the in-memory database with the OpenAI stub; returns both processes"""
+    backend = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+    stub_port = free_port()
+    env = dict(os.environ, MONGODB_URI="memory://", JOB_STORE="memory", OPENAI_API_KEY="stub",
+               OPENAI_BASE_URL=f"http://127.0.0.1:{stub_port}/v1")
+    uvicorn = [sys.executable, "-m", "uvicorn", "--host", "127.0.0.1", "--log-level", "warning"]
+    processes = [
+        subprocess.Popen(uvicorn + ["openai_stub:app", "--port", str(stub_port)], cwd=backend, env=env),
+        subprocess.Popen(uvicorn + ["server:app", "--port", str(port), "--workers", str(workers)], cwd=backend, env=env),
+    ]
+    for _ in range(300):
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/api/questions/wizard", timeout=1).status_code == 200:
+                return processes
+        except requests.RequestException:
+            pass
+        time.sleep(0.1)
+    for process in processes:
+        process.terminate()
+    raise RuntimeError("Local server did not start")
+
+def option(argv: List[str], name: str, default: Any, cast=str) -> Any:
+    return cast(argv[argv.index(name) + 1]) if name in argv else default
+
+def load_main(argv: List[str]) -> int:
+    """
+    Load mode:
+        python backend_test.py --load [--url URL | --local [--workers N]] [--flows auth,classify,...]
+                                      [--concurrency N] [--rate FLOWS_PER_SECOND] [--duration SECONDS]
+                                      [--users N] [--out results.json]
+    --local runs only the LOCAL_FLOWS, the ones the local server can answer.
+    """
+    flows = option(argv, "--flows", None, lambda value: value.split(","))
+    available = LOCAL_FLOWS if "--local" in argv else list(LOAD_FLOWS)
+    unknown = set(flows or []) - set(available)
+    if unknown:
+        print(f"Unknown flows: {', '.join(sorted(unknown))} (choose from {', '.join(available)})")
+        return 2
+    flows = flows or available
+    
+    processes = []
+    if "--local" in argv:
+        port = free_port()
+        processes = start_local_server(port, option(argv, "--workers", 1, int))
+        base_url = f"http://127.0.0.1:{port}"
+    else:
+        base_url = option(argv, "--url", None)
+    
+    try:
+        tester = KODEXAPITester(base_url) if base_url else KODEXAPITester()
+        report = tester.run_load_test(flows, concurrency=option(argv, "--concurrency", 20, int),
+                                      duration=option(argv, "--duration", 30.0, float),
+                                      rate=option(argv, "--rate", None, float), users=option(argv, "--users", 10, int))
+    finally:
+        for process in processes:
+            process.terminate()
+    
+    out = option(argv, "--out", None)
+    if out:
+        with open(out, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
 def main():
     """Main test runner"""
+    if "--load" in sys.argv:
+        return load_main(sys.argv[1:])
+    
     tester = KODEXAPITester()
     success = tester.run_all_tests()
     
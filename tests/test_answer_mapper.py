@@ -0,0 +1,29 @@
+import pytest
+
+from answer_mapper import map_answer_locally
+
+OPTIONS = ["Yes", "No", "Not sure"]
+
+
+@pytest.mark.parametrize("reply, expected", [
+    ("Yes", "Yes"),
+    ("yep, definitely", "Yes"),
+    ("No", "No"),
+    ("Nope.", "No"),
+    ("No, not at all", "No"),
+    ("nope we don't", "No"),
+    ("I'm not sure", "Unsure"),
+])
+def test_obvious_replies_are_mapped(reply, expected):
+    assert map_answer_locally(reply, OPTIONS) == expected
+
+
+@pytest.mark.parametrize("reply", [
+    "no problem",
+    "No problem at all!",
+    "no doubt",
+    "No, it only ranks internal tickets",
+    "Yes, but only for some customers",
+])
+def test_idioms_and_qualified_replies_go_to_the_model(reply):
+    assert map_answer_locally(reply, OPTIONS) is None
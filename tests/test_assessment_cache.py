@@ -0,0 +1,44 @@
+import random
+
+from assessment_cache import cached_reclassify, clear_caches
+from questions import QUESTIONS
+from rules_engine import classify_assessment
+
+SINGLE_CHOICE = [q for q in QUESTIONS if q["type"] == "single"]
+
+
+def random_answers(rng):
+    answers = {q["id"]: rng.choice(q["options"])["value"] for q in SINGLE_CHOICE if rng.random() < 0.8}
+    if rng.random() < 0.5:
+        answers["q11_use_case"] = rng.choice(["Ranks applicants", "Summarizes tickets"])
+    return answers
+
+
+def reordered(answers, rng):
+    items = list(answers.items())
+    rng.shuffle(items)
+    return dict(items)
+
+
+def test_what_if_matches_classify_assessment_whatever_the_cached_key_order():
+    rng = random.Random(7)
+    clear_caches()
+    for _ in range(300):
+        answers = random_answers(rng)
+        question = rng.choice(SINGLE_CHOICE)
+        answer = rng.choice([None] + [option["value"] for option in question["options"]])
+
+        # Another request with the same key (but its own order) fills the cache first
+        cached_reclassify(reordered(answers, rng), question["id"], answer)
+
+        request = reordered(answers, rng)
+        state, _ = cached_reclassify(request, question["id"], answer)
+
+        expected_answers = dict(request)
+        if answer is None:
+            expected_answers.pop(question["id"], None)
+        else:
+            expected_answers[question["id"]] = answer
+        assert state.answers == expected_answers
+        assert list(state.answers) == list(expected_answers)
+        assert state.result == classify_assessment(expected_answers)
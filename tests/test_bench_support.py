@@ -0,0 +1,21 @@
+import pytest
+
+from bench_support import percentile
+
+
+@pytest.mark.parametrize("size, q, expected", [
+    (10, 95, 10),
+    (20, 95, 19),
+    (100, 99, 99),
+    (100, 50, 50),
+    (2, 50, 1),
+    (1, 99, 1),
+    (3, 0, 1),
+    (7, 100, 7),
+])
+def test_nearest_rank(size, q, expected):
+    assert percentile(list(range(1, size + 1)), q) == expected
+
+
+def test_empty():
+    assert percentile([], 99) == 0.0
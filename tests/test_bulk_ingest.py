@@ -0,0 +1,35 @@
+import io
+import json
+
+import pytest
+
+from bulk_ingest import BulkIngestion, open_rows, validate_row
+from questions import QUESTIONS
+from rules_engine import get_compiled_rules
+
+SINGLE_CHOICE = [q for q in QUESTIONS if q["type"] == "single"]
+GOOD_ROW = {q["id"]: q["options"][0]["value"] for q in SINGLE_CHOICE}
+
+
+@pytest.mark.parametrize("value", [["Yes"], {"value": "Yes"}, 1, True])
+def test_non_string_single_choice_value_is_a_row_error(value):
+    question_id = SINGLE_CHOICE[0]["id"]
+    _, answers, errors = validate_row({question_id: value})
+    assert question_id not in answers
+    assert errors == [f"'{value}' is not an option of {question_id}"]
+
+
+def test_bad_row_does_not_stop_the_following_rows():
+    bad_row = dict(GOOD_ROW, **{SINGLE_CHOICE[0]["id"]: ["unhashable"]})
+    rows = [dict(GOOD_ROW, id="a"), dict(bad_row, id="b"), dict(GOOD_ROW, id="c"), dict(GOOD_ROW, id="d")]
+    upload = io.BytesIO("".join(json.dumps(row) + "\n" for row in rows).encode())
+
+    ingestion = BulkIngestion(open_rows(upload, "ndjson"), get_compiled_rules(), chunk_rows=2)
+    lines = []
+    while (chunk := ingestion.next_chunk()) is not None:
+        lines.extend(json.loads(line) for line in chunk.splitlines())
+
+    assert [(line["type"], line["id"]) for line in lines] == [
+        ("result", "a"), ("error", "b"), ("result", "c"), ("result", "d"),
+    ]
+    assert ingestion.total == 4 and ingestion.errors == 1
@@ -0,0 +1,63 @@
+import copy
+import json
+
+import pytest
+
+import classification_table
+from classification_table import ClassificationTable, answer_layout, build_table
+from rules_engine import RULES, UNCERTAINTY_QUESTIONS, classify_assessment, compile_rules, get_compiled_rules, install_rules
+
+# Two options per question, plus "not_sure" for the uncertainty questions; the full
+# answer space takes too long to build in a unit test
+SUBSPACE = [
+    (qid, values[:2] + ["not_sure"] if qid in UNCERTAINTY_QUESTIONS and "not_sure" in values else values[:2])
+    for qid, values in answer_layout()
+]
+
+
+@pytest.fixture
+def table(tmp_path, monkeypatch):
+    monkeypatch.setattr(classification_table, "answer_layout", lambda: SUBSPACE)
+    path = str(tmp_path / "table.bin")
+    build_table(path)
+    table = ClassificationTable(path)
+    table.check()
+    yield table
+    table.close()
+
+
+def test_every_record_matches_classify_assessment(table):
+    for index in range(table.header["record_count"]):
+        answers = table.decode_index(index)
+        assert table.find(answers) == index
+        assert json.loads(table.classification_at(index)) == classify_assessment(answers)
+
+
+def test_answers_the_table_cannot_serve_fall_back(table):
+    answers = table.decode_index(0)
+    partial = dict(answers)
+    partial.pop(SUBSPACE[0][0])
+    assert table.find(partial) is None
+
+    # "not_sure" answers out of catalog order change missing_info order, so they bypass the table
+    not_sure = [qid for qid, values in SUBSPACE if "not_sure" in values]
+    assert len(not_sure) >= 2
+    in_order = {**answers, **{qid: "not_sure" for qid in not_sure}}
+    out_of_order = {qid: answer for qid, answer in in_order.items() if qid != not_sure[0]}
+    out_of_order[not_sure[0]] = "not_sure"
+    assert table.find(in_order) is not None
+    assert table.find(out_of_order) is None
+
+
+def test_table_is_not_used_once_other_rules_are_installed(table):
+    original = get_compiled_rules()
+    rules = copy.deepcopy(RULES)
+    rules[0]["reason"] += " (revised)"
+    try:
+        install_rules(compile_rules(rules, "table-test-revised", sorted(original.uncertainty_questions)))
+        assert not table.is_current()
+        assert table.find(table.decode_index(0)) is None
+    finally:
+        install_rules(original)
+    assert table.is_current()
+    assert table.find(table.decode_index(0)) == 0
@@ -0,0 +1,101 @@
+import asyncio
+import os
+
+from conversation_sessions import SessionStore, StaleSessionError
+from memory_db import MemoryCollection
+
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+os.environ.setdefault("MONGODB_URI", "memory://")
+os.environ.setdefault("JOB_STORE", "memory")
+
+
+def workers(count):
+    """Session stores of ``count`` workers sharing one collection."""
+    collection = MemoryCollection("conversation_sessions")
+    return collection, [SessionStore(collection, parse=dict) for _ in range(count)]
+
+
+async def turn(store, entry, message):
+    async with entry.lock:
+        entry.state["messages"].append(message)
+        store.mark_dirty(entry)
+
+
+def test_stale_worker_does_not_overwrite_a_newer_revision():
+    collection, (a, b) = workers(2)
+
+    async def run():
+        session_id = await a.create({"messages": ["hello"]}, revision=1)
+        assert await a.flush() == 1
+        entry_b = await b.get(session_id, 1)
+
+        await turn(a, await a.get(session_id, 1), "from a")
+        assert await a.flush() == 1
+        # b's copy is still at revision 1; its turn builds on that old state
+        await turn(b, entry_b, "from b")
+        assert await b.flush() == 0
+        assert b.stats()["cached"] == 0
+
+        stored = await collection.find_one({"_id": session_id})
+        reloaded = await b.get(session_id, 2)
+        return stored, reloaded
+
+    stored, reloaded = asyncio.run(run())
+    assert (stored["revision"], stored["state"]["messages"]) == (2, ["hello", "from a"])
+    assert reloaded.state["messages"] == ["hello", "from a"]
+
+
+def test_flush_writes_the_last_completed_turn_not_one_in_progress():
+    collection, (store,) = workers(1)
+
+    async def run():
+        session_id = await store.create({"messages": ["hello"]}, revision=1)
+        entry = await store.get(session_id)
+        await turn(store, entry, "done")
+        async with entry.lock:
+            entry.state["messages"].append("half-finished")  # reply still awaited
+            await store.flush()
+        return await collection.find_one({"_id": session_id})
+
+    stored = asyncio.run(run())
+    assert (stored["revision"], stored["state"]["messages"]) == (2, ["hello", "done"])
+
+
+def test_client_ahead_of_every_copy_is_stale():
+    _, (a, b) = workers(2)
+
+    async def run():
+        session_id = await a.create({"messages": []}, revision=1)
+        await a.flush()
+        await b.get(session_id, 1)
+        await turn(a, await a.get(session_id), "unflushed")
+        try:
+            await b.get(session_id, 2)
+        except StaleSessionError:
+            return True
+        return False
+
+    assert asyncio.run(run())
+
+
+def test_turn_needs_the_current_revision():
+    from fastapi.testclient import TestClient
+
+    import server
+
+    state = server.ConversationState(messages=[], answered_questions=[])
+
+    async def create():
+        session_id = await server.conversation_sessions.create(state, revision=3)
+        await server.conversation_sessions.flush()
+        return session_id
+
+    session_id = asyncio.run(create())
+    client = TestClient(server.app)
+    url = f"/api/sessions/{session_id}/turn"
+
+    assert client.post(url, json={"message": "hi"}).status_code == 422
+    assert client.post(url, json={"message": "hi", "revision": 2}).status_code == 409
+    # Newer than any copy this worker or MongoDB has
+    assert client.post(url, json={"message": "hi", "revision": 4}).status_code == 409
+    assert state.messages == []
@@ -0,0 +1,68 @@
+import json
+import os
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+
+import fast_json
+from questions import QUESTIONS
+from rules_engine import classify_assessment, get_compiled_rules
+
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+os.environ.setdefault("MONGODB_URI", "memory://")
+os.environ.setdefault("JOB_STORE", "memory")
+
+ANSWERS = {
+    "q1_company_role": "developer",
+    "q2_deployment": "external",
+    "q3_domain": "hiring_hr",
+    "q4_decision_impact": "significant_impact",
+    "q5_data_types": "personal_nonsensitive",
+    "q6_biometric": "no",
+    "q7_safety_critical": "no",
+    "q8_human_oversight": "human_reviews",
+    "q9_behavior": "scores_ranks",
+    "q10_logging": "partial_logging",
+}
+
+
+def uncertain_answers():
+    """Every uncertainty question answered not_sure, so the result carries missing_info."""
+    uncertain = get_compiled_rules().uncertainty_questions
+    return {qid: "not_sure" if qid in uncertain else answer for qid, answer in ANSWERS.items()}
+
+
+def all_not_sure():
+    return {q["id"]: "not_sure" for q in QUESTIONS if q["type"] == "single"}
+
+
+@pytest.mark.parametrize("answers, missing", [
+    (uncertain_answers(), True),
+    (all_not_sure(), True),
+    (ANSWERS, False),
+])
+def test_classify_body_matches_the_response_model(answers, missing):
+    import server
+
+    result = classify_assessment(answers)
+    assert bool(result["missing_info"]) is missing
+    body = fast_json.dumps(result)
+
+    # What FastAPI would have sent had the dict gone through response_model=Classification
+    expected = jsonable_encoder(server.Classification.model_validate(result))
+    assert server.Classification.model_validate_json(body) == server.Classification.model_validate(result)
+    assert json.loads(body) == expected == jsonable_encoder(result)
+
+
+def test_classify_endpoint_returns_missing_info():
+    from fastapi.testclient import TestClient
+
+    import server
+
+    answers = uncertain_answers()
+    response = TestClient(server.app).post("/api/classify", json={"answers_json": answers})
+    assert response.status_code == 200
+
+    expected = jsonable_encoder(server.Classification.model_validate(classify_assessment(answers)))
+    assert response.json() == expected
+    assert expected["missing_info"]
@@ -0,0 +1,118 @@
+import asyncio
+import random
+from datetime import timedelta
+
+import bson
+
+from jobs import JobContext, JobRunner, MemoryJobStore, assessment_handlers, new_job
+from questions import QUESTIONS
+from rules_engine import classify_many, get_compiled_rules
+
+BSON_MAX_SIZE = 16 * 1024 * 1024
+
+
+def answer_sets(count, seed=3):
+    rng = random.Random(seed)
+    return [
+        {
+            q["id"]: rng.choice(q["options"])["value"] if q["type"] == "single" else f"Free text answer {n}"
+            for q in QUESTIONS
+        }
+        for n in range(count)
+    ]
+
+
+async def current_rules(version):
+    return get_compiled_rules()
+
+
+def runner(store, **kwargs):
+    return JobRunner(store, assessment_handlers(None, current_rules), processes=0, **kwargs)
+
+
+def test_largest_batch_job_fits_in_mongo_documents():
+    answers_list = answer_sets(50_000)
+    # The whole batch would not fit in the job document itself
+    assert len(bson.encode(new_job("classify", {"answers_list": answers_list}, 3))) > BSON_MAX_SIZE
+
+    store = MemoryJobStore()
+    job = asyncio.run(runner(store).submit("classify", {"rules_version": "v"}, inputs=answers_list))
+
+    assert len(bson.encode(job)) < 4096
+    assert job["params"]["input_count"] == 50_000
+    sizes = [len(bson.encode({"job_id": job["id"], "chunk": chunk, "items": items}))
+             for chunk, items in store._inputs[job["id"]].items()]
+    assert len(sizes) == 50 and max(sizes) < BSON_MAX_SIZE
+
+
+def test_classify_job_reads_its_chunked_inputs():
+    answers_list = answer_sets(25)
+    store = MemoryJobStore()
+
+    async def run():
+        job_runner = runner(store, input_chunk_size=10)
+        job = await job_runner.submit("classify", {}, inputs=answers_list)
+        await job_runner._run(await store.claim(60))
+        job = await store.get(job["id"])
+        return job, [item async for chunk in store.iter_results(job["id"], job["attempts"]) for item in chunk]
+
+    job, results = asyncio.run(run())
+    assert job["status"] == "completed"
+    assert job["progress"] == {"done": 25, "total": 25}
+    assert results == classify_many(answers_list, get_compiled_rules())
+    assert job["id"] not in store._inputs  # dropped once the job finished
+
+
+class NoProjects:
+    class projects:
+        @staticmethod
+        async def find_one(query, projection=None):
+            return None
+
+
+def test_export_of_a_missing_project_fails_without_retrying():
+    store = MemoryJobStore()
+
+    async def run():
+        job_runner = JobRunner(store, assessment_handlers(NoProjects, current_rules), processes=0)
+        job = await job_runner.submit("export", {"project_id": "gone"}, max_attempts=3)
+        await job_runner._run(await store.claim(60))
+        return await store.get(job["id"]), await store.claim(60)
+
+    job, next_claim = asyncio.run(run())
+    assert (job["status"], job["attempts"], job["error"]) == ("failed", 1, "Project gone not found")
+    assert next_claim is None
+
+
+def test_runner_that_lost_its_lease_cannot_touch_the_new_run():
+    store = MemoryJobStore()
+    overtaken = asyncio.Event()
+
+    async def handler(ctx: JobContext, params):
+        await ctx.emit([f"attempt {ctx.job['attempts']} chunk 0"])
+        if ctx.job["attempts"] == 1:
+            # Stalls past its lease; another runner claims the job and finishes it meanwhile
+            store._jobs[ctx.job["id"]]["lease_expires_at"] -= timedelta(hours=1)
+            overtaken.set()
+            await second.wait()
+            await ctx.emit(["attempt 1 chunk 1"])
+        await ctx.progress(1, 1)
+        return {"attempt": ctx.job["attempts"]}
+
+    first_runner = JobRunner(store, {"classify": handler}, processes=0)
+    second_runner = JobRunner(store, {"classify": handler}, processes=0)
+    second = asyncio.Event()
+
+    async def run():
+        job = await first_runner.submit("classify", {})
+        first = asyncio.create_task(first_runner._run(await store.claim(60)))
+        await overtaken.wait()
+        await second_runner._run(await store.claim(60))
+        second.set()
+        await first
+        job = await store.get(job["id"])
+        return job, [item async for chunk in store.iter_results(job["id"], job["attempts"]) for item in chunk]
+
+    job, results = asyncio.run(run())
+    assert (job["status"], job["attempts"], job["summary"]) == ("completed", 2, {"attempt": 2})
+    assert results == ["attempt 2 chunk 0"]
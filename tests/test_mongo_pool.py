@@ -0,0 +1,37 @@
+from types import SimpleNamespace
+
+from mongo_pool import PoolMonitor
+
+CHECKED_OUT = SimpleNamespace(duration=0.001)
+
+
+def check_out(monitor, count):
+    for _ in range(count):
+        monitor.connection_check_out_started(None)
+
+
+def test_checkouts_a_free_pool_can_serve_are_not_waiting():
+    monitor = PoolMonitor(max_pool_size=4)
+    check_out(monitor, 3)
+    assert monitor.snapshot()["waiting"] == 0
+
+    for _ in range(3):
+        monitor.connection_checked_out(CHECKED_OUT)
+    snapshot = monitor.snapshot()
+    assert (snapshot["in_use"], snapshot["waiting"], snapshot["saturation"]) == (3, 0, 0.75)
+
+
+def test_checkouts_beyond_a_full_pool_are_waiting():
+    monitor = PoolMonitor(max_pool_size=2)
+    check_out(monitor, 2)
+    for _ in range(2):
+        monitor.connection_checked_out(CHECKED_OUT)
+    check_out(monitor, 3)
+    assert monitor.snapshot()["waiting"] == 3
+
+    monitor.connection_checked_in(None)
+    assert monitor.snapshot()["waiting"] == 2
+    monitor.connection_checked_out(CHECKED_OUT)
+    monitor.connection_check_out_failed(SimpleNamespace(reason="timeout"))
+    snapshot = monitor.snapshot()
+    assert (snapshot["in_use"], snapshot["waiting"], snapshot["checkout_failures"]) == (2, 1, {"timeout": 1})
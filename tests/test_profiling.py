@@ -0,0 +1,90 @@
+import asyncio
+import threading
+import time
+
+from profiling import StackSampler
+
+
+# Blocking work that releases the GIL in short steps, so the sampler gets to run meanwhile
+def spin_a(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        time.sleep(0.0002)
+
+
+def spin_b(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        time.sleep(0.0002)
+
+
+def spin_thread(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        time.sleep(0.0002)
+
+
+def functions(stacks):
+    return {frame.split(" (")[0] for stack in stacks for frame in stack.split(";")}
+
+
+async def watched(sampler, spin, rounds=20):
+    token = sampler.begin()
+    for _ in range(rounds):
+        spin(0.005)
+        await asyncio.sleep(0)  # let the other request's task run
+    return token, sampler.end(token)
+
+
+def test_concurrent_requests_on_one_loop_keep_their_own_samples():
+    sampler = StackSampler(interval=0.001)
+    sampler.in_flight = 2
+
+    async def main():
+        return await asyncio.gather(watched(sampler, spin_a), watched(sampler, spin_b))
+
+    (token_a, watch_a), (token_b, watch_b) = asyncio.run(main())
+
+    assert token_a != token_b
+    assert watch_a is not watch_b
+    assert watch_a.stacks and watch_b.stacks
+    assert "spin_a" in functions(watch_a.stacks) and "spin_b" not in functions(watch_a.stacks)
+    assert "spin_b" in functions(watch_b.stacks) and "spin_a" not in functions(watch_b.stacks)
+    assert watch_a.max_in_flight == 2
+
+
+def test_other_threads_are_shared_while_requests_overlap():
+    def run(in_flight):
+        sampler = StackSampler(interval=0.001)
+        sampler.in_flight = in_flight
+        worker = threading.Thread(target=spin_thread, args=(0.15,))
+
+        async def request():
+            token = sampler.begin()
+            worker.start()
+            await asyncio.sleep(0.1)
+            return sampler.end(token)
+
+        watch = asyncio.run(request())
+        worker.join()
+        return watch
+
+    alone = run(1)
+    assert "spin_thread" in functions(alone.stacks)
+    assert not alone.shared_stacks
+
+    overlapping = run(2)
+    assert "spin_thread" not in functions(overlapping.stacks)
+    assert "spin_thread" in functions(overlapping.shared_stacks)
+
+
+def test_sampler_stops_once_nothing_is_watched():
+    sampler = StackSampler(interval=0.001)
+
+    async def main():
+        return await watched(sampler, spin_a, rounds=2)
+
+    asyncio.run(main())
+    time.sleep(0.05)
+    assert sampler._thread is None
+    assert not sampler._active
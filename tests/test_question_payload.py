@@ -0,0 +1,46 @@
+import asyncio
+import os
+
+import pytest
+
+from question_payload import not_modified
+
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+os.environ.setdefault("MONGODB_URI", "memory://")
+os.environ.setdefault("JOB_STORE", "memory")
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, False),
+    ("", False),
+    ('"a"', True),
+    ('W/"a"', True),
+    ('"b", "a"', True),
+    ('"b",W/"a"', True),
+    ("*", True),
+    ('"b"', False),
+    ('"a-gzip"', False),
+])
+def test_not_modified(header, expected):
+    assert not_modified(header, ['"a"']) is expected
+
+
+def test_question_endpoints_revalidate_alike():
+    from fastapi.testclient import TestClient
+
+    import server
+
+    async def seed():
+        await server.db.questions.insert_one({"id": 1, "question": "Role?", "options": ["developer", "deployer"]})
+        await server.question_catalog.refresh()
+
+    asyncio.run(seed())
+    client = TestClient(server.app)
+
+    for url in ("/api/questions", "/api/questions/wizard"):
+        etag = client.get(url).headers["etag"]
+        for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+            response = client.get(url, headers={"If-None-Match": header})
+            assert response.status_code == 304, (url, header)
+            assert response.headers["etag"] == etag
+        assert client.get(url, headers={"If-None-Match": '"other"'}).status_code == 200
@@ -0,0 +1,126 @@
+import itertools
+
+import pytest
+
+import roadmap_generator
+from roadmap_generator import (CONTEXT_TRIGGERS, DEPENDENCIES, TASK_TEMPLATES, build_plan, generate_roadmap, get_plan,
+                               plan_signature, prioritize_tasks, task_sort_key, validate_dependencies)
+
+TEMPLATES = {task_id: {"id": task_id} for task_id in "abcd"}
+
+
+@pytest.mark.parametrize("dependencies, cycle", [
+    ({"a": ["a"]}, "a -> a"),
+    ({"a": ["b"], "b": ["a"]}, "a -> b -> a"),
+    ({"a": ["b"], "b": ["c"], "c": ["a"]}, "a -> b -> c -> a"),
+    ({"d": ["a"], "a": ["b"], "b": ["c"], "c": ["b"]}, "b -> c -> b"),
+])
+def test_validate_dependencies_rejects_cycles(dependencies, cycle):
+    with pytest.raises(ValueError, match=f"Dependency cycle: {cycle}$"):
+        validate_dependencies(TEMPLATES, dependencies)
+
+
+def test_validate_dependencies_accepts_a_dag():
+    validate_dependencies(TEMPLATES, {"a": ["b", "c"], "b": ["d"], "c": ["d"]})
+    validate_dependencies(TASK_TEMPLATES, DEPENDENCIES)
+
+
+@pytest.mark.parametrize("dependencies", [{"a": ["x"]}, {"x": ["a"]}])
+def test_validate_dependencies_rejects_unknown_tasks(dependencies):
+    with pytest.raises(ValueError, match="unknown task 'x'"):
+        validate_dependencies(TEMPLATES, dependencies)
+
+
+def reference_order(tasks, bucket):
+    """Kahn's algorithm, rescanning for the best ready task (lowest key, then input position) each step."""
+    remaining = list(range(len(tasks)))
+    ids = {task["id"] for task in tasks}
+    placed, ordered = set(), []
+    while remaining:
+        ready = [i for i in remaining
+                 if all(dependency in placed or dependency not in ids for dependency in DEPENDENCIES.get(tasks[i]["id"], []))]
+        best = min(ready, key=lambda i: (task_sort_key(tasks[i], bucket), i))
+        remaining.remove(best)
+        placed.add(tasks[best]["id"])
+        ordered.append(tasks[best]["id"])
+    return ordered
+
+
+def signatures():
+    """Every bucket with every combination of context triggers firing, as answers."""
+    for bucket in roadmap_generator.BUCKET_TASKS:
+        for fired in itertools.product((False, True), repeat=len(CONTEXT_TRIGGERS)):
+            answers = {question_id: values[-1] for (question_id, values, _), on in zip(CONTEXT_TRIGGERS, fired) if on}
+            yield bucket, fired, answers
+
+
+@pytest.mark.parametrize("bucket, fired, answers", list(signatures()))
+def test_plan_keeps_dependency_order_per_signature(bucket, fired, answers):
+    plan = get_plan(bucket, answers)
+    assert plan_signature(bucket, answers) == (bucket,) + fired
+    assert plan.bucket == bucket
+
+    # Each trigger adds its task exactly when it fires (unless the bucket already has it)
+    for (_, _, task_id), on in zip(CONTEXT_TRIGGERS, fired):
+        if on or task_id in roadmap_generator.BUCKET_TASKS[bucket]:
+            assert task_id in plan.task_ids
+        else:
+            assert task_id not in plan.task_ids
+
+    position = {task_id: i for i, task_id in enumerate(plan.task_ids)}
+    for task_id in plan.task_ids:
+        for dependency in DEPENDENCIES.get(task_id, []):
+            if dependency in position:
+                assert position[dependency] < position[task_id], (bucket, task_id, dependency)
+
+    unsorted = [dict(TASK_TEMPLATES[task_id], dependencies=DEPENDENCIES.get(task_id, []))
+                for task_id in roadmap_generator.get_applicable_tasks(bucket, answers)]
+    assert list(plan.task_ids) == reference_order(unsorted, bucket)
+    assert plan.task_dicts() == build_plan(bucket, answers).task_dicts()
+    assert [task["order"] for task in plan.tasks] == list(range(1, len(plan.tasks) + 1))
+
+
+def test_unmatched_and_unhashable_answers_do_not_fire_triggers():
+    answers = {question_id: ["list"] for question_id, _, _ in CONTEXT_TRIGGERS}
+    answers[CONTEXT_TRIGGERS[0][0]] = "something_else"
+    assert plan_signature("High-risk", answers) == ("High-risk",) + (False,) * len(CONTEXT_TRIGGERS)
+    assert get_plan("High-risk", answers) is get_plan("High-risk", {})
+
+
+def test_dependency_outranks_priority(monkeypatch):
+    # gov_register (P0) now waits on transparency_explainability (P2), which waits on transparency_disclosure
+    monkeypatch.setitem(DEPENDENCIES, "gov_register", ["transparency_explainability"])
+    tasks = [dict(TASK_TEMPLATES[task_id]) for task_id in
+             ("gov_register", "transparency_explainability", "monitor_logging", "transparency_disclosure")]
+    ordered = [task["id"] for task in prioritize_tasks(tasks, "High-risk")]
+    assert ordered == reference_order(tasks, "High-risk")
+    assert ordered.index("transparency_disclosure") < ordered.index("transparency_explainability") \
+        < ordered.index("gov_register") < ordered.index("monitor_logging")
+
+
+def test_shared_plan_cannot_be_mutated():
+    plan = get_plan("High-risk", {})
+    task = plan.tasks[0]
+    with pytest.raises(TypeError):
+        task["title"] = "changed"
+    with pytest.raises(AttributeError):
+        task["checklist"].append("extra step")
+    with pytest.raises(AttributeError):
+        task["dependencies"].append("gov_register")
+
+
+def test_roadmap_copies_are_independent():
+    classification = {"bucket": "High-risk"}
+    expected = generate_roadmap(classification, {})
+    dependencies = {task_id: list(required) for task_id, required in DEPENDENCIES.items()}
+
+    roadmap = generate_roadmap(classification, {})
+    for task in roadmap:
+        task["title"] = "changed"
+        task["checklist"].append("extra step")
+        task["dependencies"].append("gov_register")
+        task["applicable_buckets"].clear()
+
+    assert generate_roadmap(classification, {}) == expected
+    assert DEPENDENCIES == dependencies
+    assert all(task["applicable_buckets"] for task in TASK_TEMPLATES.values())
@@ -0,0 +1,21 @@
+import copy
+
+import pytest
+
+from rule_packs import BUILT_IN_PACK, RulePackError, validate_rule_pack
+
+
+def test_built_in_pack_validates():
+    assert validate_rule_pack(copy.deepcopy(BUILT_IN_PACK))["version"] == BUILT_IN_PACK["version"]
+
+
+@pytest.mark.parametrize("question_id", [["q1_company_role"], {"id": "q1_company_role"}, None, 7])
+def test_non_string_question_ids_are_validation_errors(question_id):
+    pack = copy.deepcopy(BUILT_IN_PACK)
+    pack["uncertainty_questions"] = [question_id]
+    pack["rules"][0]["conditions"][0]["question"] = question_id
+
+    with pytest.raises(RulePackError) as error:
+        validate_rule_pack(pack)
+    assert "Unknown uncertainty question" in str(error.value)
+    assert "unknown question" in str(error.value)
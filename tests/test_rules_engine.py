@@ -0,0 +1,111 @@
+import random
+
+import pytest
+
+from questions import QUESTIONS
+from rules_engine import (
+    MISSING_INFO_LABELS, RULES, UNCERTAINTY_QUESTIONS, buckets_many, classify_assessment, classify_many,
+    compile_rules, evaluate_rule,
+)
+
+SINGLE_CHOICE = [q for q in QUESTIONS if q["type"] == "single"]
+
+# Priority ties (declaration order decides), several conditions on one question
+# (overlapping and contradictory), and uncertainty questions of their own
+TIE_RULES = [
+    {"id": "T1", "priority": 1, "name": "Overlap", "bucket": "High-risk", "reason": "Overlapping conditions",
+     "conditions": [{"question": "q3_domain", "values": ["hiring_hr"]},
+                    {"question": "q3_domain", "values": ["hiring_hr", "finance"]}]},
+    {"id": "T2", "priority": 1, "name": "Tie", "bucket": "Limited risk", "reason": "Same priority as T1",
+     "conditions": [{"question": "q6_biometric", "values": ["yes"]}]},
+    {"id": "T3", "priority": 0, "name": "First", "bucket": "Prohibited", "reason": "Lowest priority value",
+     "conditions": [{"question": "q8_human_oversight", "values": ["fully_automated"]},
+                    {"question": "q5_data_types", "values": ["sensitive_special", "personal_nonsensitive"]}]},
+    {"id": "T4", "priority": 2, "name": "Contradiction", "bucket": "High-risk", "reason": "Never fires",
+     "conditions": [{"question": "q4_decision_impact", "values": ["significant_impact"]},
+                    {"question": "q4_decision_impact", "values": ["low_impact"]}]},
+    {"id": "T5", "priority": 1, "name": "Tie too", "bucket": "Minimal risk", "reason": "Third at priority 1",
+     "conditions": [{"question": "q2_deployment", "values": ["external"]}]},
+]
+TIE_UNCERTAINTY = ["q4_decision_impact", "q6_biometric", "q2_deployment"]
+
+RULE_SETS = {
+    "built-in": (RULES, UNCERTAINTY_QUESTIONS),
+    "ties": (TIE_RULES, TIE_UNCERTAINTY),
+}
+
+
+def reference(rules, uncertainty_questions, answers):
+    """The original evaluator: every rule in priority order through evaluate_rule."""
+    ordered = sorted(rules, key=lambda r: r["priority"])
+    trace = [evaluate_rule(rule, answers) for rule in ordered]
+    not_sure = [qid for qid, answer in answers.items() if answer == "not_sure"]
+    critical = [qid for qid in not_sure if qid in uncertainty_questions]
+    fired = [rule for rule, entry in zip(ordered, trace) if entry["fired"]]
+    partial = [rule for rule, entry in zip(ordered, trace) if not entry["fired"] and (entry["partial"] or entry["uncertain"])]
+
+    bucket, confidence, winner = "Minimal risk", "High", None
+    if fired:
+        winner = min(fired, key=lambda r: r["priority"])
+        bucket = winner["bucket"]
+    needs_clarification = False
+    if len(critical) >= 2:
+        needs_clarification = True
+    elif len(critical) == 1 and bucket in ["High-risk", "Prohibited"]:
+        needs_clarification = True
+    elif partial and not fired:
+        confidence = "Medium"
+        needs_clarification = len(not_sure) >= 2
+    if needs_clarification:
+        bucket, confidence = "Needs clarification", "Low"
+    return trace, bucket, confidence, winner, critical
+
+
+def random_answers(rng):
+    """Options, "not_sure", missing answers, explicit nulls and unknown values, in random key order."""
+    answers = {}
+    for q in rng.sample(SINGLE_CHOICE, len(SINGLE_CHOICE)):
+        roll = rng.random()
+        if roll < 0.15:
+            continue
+        if roll < 0.3:
+            answers[q["id"]] = "not_sure"
+        elif roll < 0.33:
+            answers[q["id"]] = None
+        elif roll < 0.36:
+            answers[q["id"]] = "something else"
+        else:
+            answers[q["id"]] = rng.choice(q["options"])["value"]
+    return answers
+
+
+@pytest.mark.parametrize("rule_set", list(RULE_SETS))
+def test_compiled_rules_match_the_original_evaluator(rule_set):
+    rules, uncertainty_questions = RULE_SETS[rule_set]
+    compiled = compile_rules(rules, f"equivalence-{rule_set}", uncertainty_questions)
+    rng = random.Random(rule_set)
+    answers_list = [random_answers(rng) for _ in range(2000)] + [{}]
+
+    batch = classify_many(answers_list, compiled)
+    batch_traces = compiled.evaluate_many(answers_list)
+    pairs = buckets_many(answers_list, compiled)
+    for answers, from_batch, batch_trace, pair in zip(answers_list, batch, batch_traces, pairs):
+        trace, bucket, confidence, winner, critical = reference(rules, uncertainty_questions, answers)
+        result = classify_assessment(answers, compiled)
+
+        assert compiled.evaluate(answers) == trace, answers
+        assert batch_trace == trace, answers
+        assert result["rule_trace"] == trace
+        assert (result["bucket"], result["confidence"]) == (bucket, confidence) == pair, answers
+        assert {f["ruleId"] for f in result["decisive_factors"]} == ({winner["id"]} if winner else set())
+        assert [m["questionId"] for m in result["missing_info"]] == [q for q in critical if q in MISSING_INFO_LABELS]
+        assert from_batch == result
+
+
+def test_priority_ties_keep_declaration_order():
+    compiled = compile_rules(TIE_RULES, "equivalence-order", TIE_UNCERTAINTY)
+    assert [rule["id"] for rule in compiled.rules] == ["T3", "T1", "T2", "T5", "T4"]
+
+    # T1, T2 and T5 all fire; the first declared wins
+    answers = {"q3_domain": "hiring_hr", "q6_biometric": "yes", "q2_deployment": "external"}
+    assert classify_assessment(answers, compiled)["decisive_factors"][0]["ruleId"] == "T1"